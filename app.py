@@ -1,18 +1,60 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
+import json
+import multiprocessing
 import os
-import importlib.util
 import sys
 from datetime import datetime
 import traceback
+import uuid
 from dotenv import load_dotenv
 
+from function_registry import FunctionNotFound, load_registry
+from module_cache import module_cache
+from pipeline import Processor, find_artifact, maybe_sweep_temp_files, sweep_artifacts, sweep_temp_files
+from pipeline.jobs import JobExists, JobQueueFull, get_job, job_manager, sweep_jobs
+from pipeline.layouts import layout_cache, merge_stats
+from pipeline.progress import (FINAL_EVENT, TooManySubscribers, UnknownJob, open_channel, progress_callback,
+                               progress_subscribers, subscribe, valid_job_id)
+from pipeline.result_cache import is_success, result_cache, sweep_result_cache
+from pipeline.singleflight import single_flight
+from pipeline.uploads import HashingSpool, upload_digest
+from worker_pool import call_function, encode_result, process_pool
+
 # Cargar variables de entorno
 load_dotenv()
 
+
+class UploadRequest(Request):
+    """Request que calcula la huella de los archivos mientras los recibe (caché de resultados)"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingSpool()
+
+
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)  # Permitir CORS para todas las rutas
 
+# Registro de funciones: se carga, valida y precarga una sola vez al iniciar
+registry = load_registry()
+
+# Limpiar archivos temporales huérfanos, descargas y trabajos expirados de ejecuciones anteriores
+sweep_temp_files()
+sweep_artifacts()
+sweep_jobs()
+sweep_result_cache()
+
+# Pool de procesos para los procesadores; los hijos (spawn) importan este
+# módulo al iniciar y no deben levantar su propio pool
+if multiprocessing.parent_process() is None:
+    process_pool.start(entry.path for entry in registry.entries())
+
+# Segundos que el frontend puede reutilizar el listado de /functions
+FUNCTIONS_MAX_AGE = int(os.getenv('FUNCTIONS_MAX_AGE', '300'))
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -24,37 +66,168 @@ def health_check():
     })
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Endpoint con métricas internas del proceso (cachés, tiempos de carga)"""
+    return jsonify({
+        "success": True,
+        "pid": os.getpid(),
+        "module_cache": module_cache.stats(),
+        "jobs": job_manager.stats(),
+        "process_pool": process_pool.stats(),
+        "layout_cache": merge_stats([layout_cache.stats(), *process_pool.layout_stats()]),
+        "result_cache": result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "progress": progress_subscribers.stats()
+    })
+
+
 @app.route('/execute-function', methods=['POST'])
 def execute_function():
     """Endpoint principal para ejecutar funciones Python"""
     try:
-        # Obtener datos del request
-        function_id = request.form.get('functionId')
-        file = request.files.get('file')
-        user_id = request.form.get('userId')  # RECIBIR EL USER_ID
+        params, error = read_upload_form()
+        if error is not None:
+            return error
+        function_id, file, user_id, output_format, batch_size, job_id = params
+        if job_id:
+            # Nueva ejecución: /progress/<jobId> solo ve sus eventos
+            open_channel(job_id)
 
-        if not function_id:
-            return jsonify({
+        # Modo streaming: una línea JSON por parte del resultado
+        if request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+            return stream_user_function(function_id, file, user_id, output_format, batch_size,
+                                        progress_callback(job_id))
+
+        # Ejecutar la función específica CON EL USER_ID (o reutilizar el
+        # resultado si el mismo archivo ya se procesó)
+        body = execute_user_function(function_id, file, user_id, output_format, batch_size, job_id,
+                                     upload_digest(file))
+
+        # Janitor de temporales huérfanos (a lo más una vez por intervalo)
+        maybe_sweep_temp_files()
+
+        return json_response(body)
+
+    except Exception as e:
+        error_message = f"Error interno del servidor: {str(e)}"
+        print(f"❌ {error_message}")
+        print(traceback.format_exc())
+
+        return jsonify({
+            "success": False,
+            "error": error_message
+        }), 500
+
+
+def read_upload_form():
+    """
+    Lee y valida los campos del formulario de carga (/execute-function, /jobs)
+
+    Returns:
+        tuple: ((functionId, file, userId, format, batchSize, jobId), None) o
+            (None, respuesta de error 400)
+    """
+    function_id = request.form.get('functionId')
+    file = request.files.get('file')
+    user_id = request.form.get('userId')  # RECIBIR EL USER_ID
+    output_format = request.form.get('format') or 'sql'
+    batch_size = request.form.get('batchSize')
+    job_id = request.form.get('jobId')  # Opcional: progreso por /progress/<jobId>
+
+    if not function_id:
+        return None, (jsonify({
+            "success": False,
+            "error": "functionId es requerido"
+        }), 400)
+
+    if not file:
+        return None, (jsonify({
+            "success": False,
+            "error": "Archivo es requerido"
+        }), 400)
+
+    if not user_id:
+        return None, (jsonify({
+            "success": False,
+            "error": "userId es requerido"
+        }), 400)
+
+    if batch_size is not None:
+        try:
+            batch_size = int(batch_size)
+        except ValueError:
+            batch_size = 0
+        if batch_size <= 0:
+            return None, (jsonify({
                 "success": False,
-                "error": "functionId es requerido"
-            }), 400
+                "error": "batchSize debe ser un entero positivo"
+            }), 400)
 
-        if not file:
+    if job_id and not valid_job_id(job_id):
+        return None, (jsonify({
+            "success": False,
+            "error": "jobId solo admite letras, números, '-' y '_' (máximo 64)"
+        }), 400)
+
+    return (function_id, file, user_id, output_format, batch_size, job_id), None
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Encola el procesamiento de un archivo y responde de inmediato (202) con
+    el id del trabajo; el resultado se consulta en /jobs/<id>
+
+    Recibe los mismos campos que /execute-function. Si no trae ``jobId`` se
+    genera uno; los eventos de progreso quedan en /progress/<id> desde el inicio.
+    """
+    try:
+        params, error = read_upload_form()
+        if error is not None:
+            return error
+        function_id, file, user_id, output_format, batch_size, job_id = params
+
+        try:
+            entry = registry.resolve(user_id, function_id)
+        except FunctionNotFound as e:
             return jsonify({
                 "success": False,
-                "error": "Archivo es requerido"
-            }), 400
+                "error": str(e)
+            }), 404
+
+        job_id = job_id or uuid.uuid4().hex
 
-        if not user_id:
+        def task(source):
+            return json.loads(execute_user_function(entry.function_id, source, user_id,
+                                                    output_format, batch_size, job_id))
+
+        try:
+            state = job_manager.submit(task, file, job_id=job_id, function_id=entry.function_id,
+                                       user_id=user_id, format=output_format)
+        except JobExists as e:
             return jsonify({
                 "success": False,
-                "error": "userId es requerido"
-            }), 400
+                "error": str(e)
+            }), 409
+        except JobQueueFull as e:
+            response = jsonify({
+                "success": False,
+                "error": f"Servidor ocupado: {e}"
+            })
+            response.headers['Retry-After'] = '5'
+            return response, 503
 
-        # Ejecutar la función específica CON EL USER_ID
-        result = execute_user_function(function_id, file, user_id)
+        print(f"📥 Trabajo {job_id} encolado: función {entry.function_id}, usuario {user_id}")
+        maybe_sweep_temp_files()
 
-        return jsonify(result)
+        return jsonify({
+            "success": True,
+            "job_id": job_id,
+            "status": state["status"],
+            "status_url": f"/jobs/{job_id}",
+            "progress_url": f"/progress/{job_id}",
+        }), 202
 
     except Exception as e:
         error_message = f"Error interno del servidor: {str(e)}"
@@ -67,141 +240,189 @@ def execute_function():
         }), 500
 
 
-def execute_user_function(function_id, file, user_id):
-    """Ejecuta la función Python específica basada en el ID CON EL USER_ID"""
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """Estado de un trabajo de /jobs; trae ``result`` cuando terminó"""
+    state = get_job(job_id) if valid_job_id(job_id) else None
+    if state is None:
+        return jsonify({
+            "success": False,
+            "error": "Trabajo no encontrado o expirado"
+        }), 404
+
+    return jsonify({"success": True, **state})
+
+
+@app.route('/artifacts/<artifact_id>', methods=['GET'])
+def download_artifact(artifact_id):
+    """Descarga un archivo Arrow/Parquet generado por /execute-function"""
+    found = find_artifact(artifact_id)
+    if found is None:
+        return jsonify({
+            "success": False,
+            "error": "Archivo no encontrado o expirado"
+        }), 404
+
+    path, download_name, mimetype = found
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+
+@app.route('/progress/<job_id>', methods=['GET'])
+def job_progress(job_id):
+    """
+    Eventos de progreso (Server-Sent Events) de un trabajo enviado con el
+    mismo ``jobId`` a /execute-function
+
+    Entrega los eventos de la ejecución en curso desde su inicio. Si la carga
+    todavía no llega, espera hasta ``PROGRESS_CHANNEL_WAIT`` segundos antes
+    de responder 404.
+    """
+    if not valid_job_id(job_id):
+        return jsonify({
+            "success": False,
+            "error": "jobId inválido"
+        }), 400
+
+    try:
+        events = subscribe(job_id)
+    except UnknownJob as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 404
+    except TooManySubscribers as e:
+        response = jsonify({
+            "success": False,
+            "error": f"Servidor ocupado: {e}"
+        })
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    return Response(stream_with_context(events), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def stream_user_function(function_id, file, user_id, output_format='sql', batch_size=None, progress=None):
+    """
+    Ejecuta la función y transmite el resultado como NDJSON a medida que se
+    procesa cada hoja; la última línea (``"type": "summary"``) trae los
+    conteos y errores
+    """
+    try:
+        entry = registry.resolve(user_id, function_id)
+    except FunctionNotFound as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 404
+
+    processor = getattr(entry.module, 'PROCESSOR', None)
+    if not isinstance(processor, Processor):
+        return jsonify({
+            "success": False,
+            "error": f"La función {entry.function_id} no soporta streaming"
+        }), 406
+    try:
+        processor.check_format(output_format, streaming=True)
+    except ValueError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 406
+
+    print(f"🔍 Ejecutando función {entry.function_id} para usuario {user_id} (streaming)")
+
+    def generate():
+        try:
+            for part in processor.process_stream(file, user_id, output_format, batch_size, progress):
+                yield app.json.dumps(part) + "\n"
+        finally:
+            maybe_sweep_temp_files()
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def execute_user_function(function_id, file, user_id, output_format='sql', batch_size=None, job_id=None,
+                          digest=None):
+    """
+    Ejecuta la función Python específica basada en el ID CON EL USER_ID
+
+    Con el pool de procesos activo la función corre en un proceso hijo; si
+    no, en el thread del request. Con ``digest`` (SHA-256 del archivo) el
+    resultado se busca y se guarda en la caché de resultados, y las cargas
+    idénticas simultáneas esperan a la primera (``pipeline.singleflight``).
+
+    Returns:
+        bytes: Resultado serializado en JSON (ver ``worker_pool.encode_result``)
+    """
     try:
         print(f"🔍 Ejecutando función {function_id} para usuario {user_id}")
 
-        # Mapeo específico para usuarios con funciones personalizadas
-        user_function_mappings = {
-            '496f6470-2f4d-40c6-9426-bb5421116a3d': {
-                # Mapeo específico por función ID para este usuario
-                '1': f"functions/{user_id}/process_recepciones.py",
-                '3': f"functions/{user_id}/process_venta_astilla_masisa.py",
-                '4': f"functions/{user_id}/process_ventas_masisa.py",
-                '5': f"functions/{user_id}/process_ventas_arauco.py",
-                # Función por defecto para IDs no especificados
-                'default': f"functions/{user_id}/process_recepciones.py"
-            },
-            'ae6a5783-4da9-49d2-b415-af7384362b7c': {
-                '6': f"functions/{user_id}/process_recepciones.py",
-                '7': f"functions/{user_id}/process_consumos.py",
-                '8': f"functions/{user_id}/process_ventas.py",
-                '9': f"functions/{user_id}/process_produccion.py",
-                '10': f"functions/{user_id}/process_consumo.py",
-                'default': f"functions/{user_id}/process_recepciones.py"
-            }
-        }
-
-        # Verificar si el usuario tiene funciones personalizadas
-        if user_id in user_function_mappings:
-            user_mappings = user_function_mappings[user_id]
-
-            # Buscar función específica por ID, sino usar default
-            user_function_file = user_mappings.get(
-                str(function_id), user_mappings.get('default'))
-
-            print(
-                f"🔍 Usuario con funciones personalizadas detectado: {user_id}")
-            print(f"📁 Función ID: {function_id}")
-            print(f"📁 Buscando función personalizada en: {user_function_file}")
-            print(
-                f"📁 ¿Existe el archivo? {os.path.exists(user_function_file)}")
-
-            if os.path.exists(user_function_file):
-                print(
-                    f"✅ Usando función personalizada del usuario: {user_function_file}")
-                function_file = user_function_file
-            else:
-                return {
-                    "success": False,
-                    "error": f"Archivo de función personalizada no encontrado: {user_function_file}"
-                }
-        else:
-            # Mapeo de function_id a archivo Python genérico para otros usuarios
-            function_files = {
-                '1': 'functions/process_ingresos.py',
-                '2': 'functions/process_ventas.py',
-                '3': 'functions/process_inventario.py',
-                # Agregar más funciones aquí según sea necesario
-            }
-
-            function_file = function_files.get(str(function_id))
-            print(
-                f"📋 Usando función genérica para ID {function_id}: {function_file}")
-
-            if not function_file:
-                return {
-                    "success": False,
-                    "error": f"No hay implementación para la función ID {function_id}"
-                }
-
-        # Verificar que el archivo existe
-        if not os.path.exists(function_file):
-            return {
+        try:
+            entry = registry.resolve(user_id, function_id)
+        except FunctionNotFound as e:
+            return encode_result({
                 "success": False,
-                "error": f"Archivo de función no encontrado: {function_file}"
-            }
-
-        # Cargar y ejecutar el módulo dinámicamente
-        spec = importlib.util.spec_from_file_location(
-            "user_function", function_file)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-
-        # Ejecutar la función principal del módulo CON EL USER_ID
-        if hasattr(module, 'process_file'):
-            # PASAR EL USER_ID A LA FUNCIÓN
-            return module.process_file(file, user_id)
+                "error": str(e)
+            })
+
+        print(f"📁 Función {entry.function_id}: {entry.file}")
+
+        def compute():
+            if process_pool.enabled:
+                body = process_pool.execute(entry, file, user_id, output_format, batch_size, job_id)
+            else:
+                # Obtener el módulo desde la caché (solo se compila si el archivo cambió)
+                result = call_function(entry.module, entry.function_id, file, user_id, output_format,
+                                       batch_size, progress_callback(job_id))
+                body = encode_result(result)
+            if cache_key is not None:
+                result_cache.put(cache_key, body)
+            return body
+
+        cache_key = result_cache.key_for(entry, digest, user_id, output_format, batch_size)
+        if cache_key is None:
+            return compute()
+
+        body = result_cache.get(cache_key)
+        if body is not None:
+            print(f"⚡ Archivo ya procesado por la función {entry.function_id}: se reutiliza el resultado")
         else:
-            return {
-                "success": False,
-                "error": "La función no tiene un método 'process_file' implementado"
-            }
+            body, shared = single_flight.do(cache_key, compute, lambda: result_cache.get(cache_key))
+            if not shared:
+                return body
+            print(f"🔗 Mismo archivo en proceso para la función {entry.function_id}: se comparte el resultado")
+
+        progress = progress_callback(job_id)
+        if progress is not None:
+            progress(FINAL_EVENT, success=is_success(body), cached=True)
+        return body
 
     except Exception as e:
-        return {
+        return encode_result({
             "success": False,
             "error": f"Error ejecutando la función: {str(e)}"
-        }
+        })
+
+
+def json_response(body, status=200):
+    """Respuesta con un JSON ya serializado (mismo formato que ``jsonify``)"""
+    return Response(body + b"\n", status=status, mimetype=app.json.mimetype)
 
 
 @app.route('/functions', methods=['GET'])
 def list_functions():
-    """Endpoint para listar todas las funciones disponibles"""
+    """Endpoint para listar las funciones disponibles para un usuario"""
     try:
-        # Lista estática de funciones disponibles
-        functions = [
-            {
-                "id": 1,
-                "function_name": "Procesador de Reportes de Ingreso",
-                "function_description": "Procesa archivos Excel de reportes de ingreso de planta y genera INSERT statements para la tabla recepciones",
-                "is_active": True
-            },
-            {
-                "id": 2,
-                "function_name": "Procesador de Ventas",
-                "function_description": "Procesa archivos Excel de reportes de ventas y genera INSERT statements para la tabla ventas",
-                "is_active": True
-            },
-            {
-                "id": 3,
-                "function_name": "Procesador de Inventario",
-                "function_description": "Procesa archivos Excel de inventario y genera INSERT statements para la tabla inventario",
-                "is_active": True
-            },
-            {
-                "id": 5,
-                "function_name": "Procesador de Proforma ARAUCO",
-                "function_description": "Procesa archivos Excel de proforma ARAUCO y genera INSERT statements para la tabla ventas",
-                "is_active": True
-            }
-        ]
+        body, etag = registry.listing(request.args.get('userId'))
 
-        return jsonify({
-            "success": True,
-            "functions": functions
-        })
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = f"private, max-age={FUNCTIONS_MAX_AGE}"
+        # Responde 304 si el frontend ya tiene el listado (If-None-Match)
+        return response.make_conditional(request)
 
     except Exception as e:
         return jsonify({
@@ -212,11 +433,9 @@ def list_functions():
 
 if __name__ == '__main__':
     print("🚀 Iniciando Python API Flask...")
-    print("🔧 Funciones disponibles:")
-    print("   - ID 1: Procesador de Reportes de Ingreso")
-    print("   - ID 2: Procesador de Ventas")
-    print("   - ID 3: Procesador de Inventario")
-    print("   - ID 5: Procesador de Proforma ARAUCO")
+    print("🔧 Funciones genéricas disponibles:")
+    for entry in registry.generic.values():
+        print(f"   - ID {entry.function_id}: {entry.name}")
     print("🌐 API corriendo en http://localhost:5000")
 
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compara el tiempo de los procesadores con su versión fila por fila
+
+Genera los libros de ``tests/workbooks.py`` con ``--rows`` filas, los procesa
+con el procesador actual y con su copia en ``tests/legacy`` y muestra el
+tiempo de cada uno, si las sentencias coinciden y la aceleración.
+
+Uso:
+    python bench_processors.py [--rows 20000] [--repeat 3] [caso ...]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from tests.conftest import ROOT
+from tests.test_processor_equivalence import LEGACY, load
+from tests.workbooks import CASES
+
+
+def best_time(module, path, repeat):
+    """Mejor tiempo de ``repeat`` ejecuciones y el último resultado"""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = module.process_excel_file(path, "user-1")
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("cases", nargs="*", help=f"Casos a medir (por defecto todos: {', '.join(CASES)})")
+    parser.add_argument("--rows", type=int, default=20000, help="Filas por hoja")
+    parser.add_argument("--repeat", type=int, default=3, help="Ejecuciones por versión (se informa la mejor)")
+    args = parser.parse_args()
+
+    unknown = [case for case in args.cases if case not in CASES]
+    if unknown:
+        parser.error(f"casos desconocidos: {unknown}")
+
+    identical = True
+    with tempfile.TemporaryDirectory(prefix="bench_processors_") as directory:
+        print(f"{'caso':16s} {'registros':>9s} {'anterior':>10s} {'actual':>10s} {'x':>7s}  iguales")
+        for case in args.cases or CASES:
+            relative, build = CASES[case]
+            path = os.path.join(directory, f"{case}.xlsx")
+            build(path, args.rows)
+
+            legacy_time, legacy = best_time(load(os.path.join(LEGACY, relative), f"legacy_{case}"), path, args.repeat)
+            current_time, current = best_time(load(os.path.join(ROOT, relative), f"current_{case}"), path,
+                                              args.repeat)
+
+            same = all(current.get(key) == value for key, value in legacy.items())
+            identical = identical and same
+            print(f"{case:16s} {len(current['insert_statements']):9d} {legacy_time:9.3f}s {current_time:9.3f}s "
+                  f"{legacy_time / current_time:6.1f}x  {'sí' if same else 'NO'}")
+
+    return 0 if identical else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
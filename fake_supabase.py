@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Cliente de Supabase falso, en memoria
+
+Implementa el subconjunto del query builder de supabase-py que usan las
+funciones de ``functions/`` (select/eq/in_/insert/update/upsert/execute) sobre
+tablas guardadas en listas de dicts. Cuenta las llamadas a ``execute`` y puede
+simular la latencia de red de cada una, para comparar los modos de
+``process_inventario`` sin conexión:
+
+    python fake_supabase.py [productos] [latencia_ms] [tamaño_lote]
+"""
+
+import io
+import sys
+import time
+
+
+class FakeResponse:
+    """Respuesta de ``execute``: mismas propiedades que la de supabase-py"""
+
+    def __init__(self, data):
+        self.data = data
+        self.error = None
+        self.count = len(data)
+
+
+class FakeQuery:
+    """Consulta sobre una tabla; se ejecuta al llamar ``execute``"""
+
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+        self.action = 'select'
+        self.columns = None
+        self.payload = None
+        self.on_conflict = None
+        self.filters = []
+
+    def select(self, columns="*"):
+        self.action = 'select'
+        self.columns = None if columns == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def insert(self, payload):
+        self.action = 'insert'
+        self.payload = payload
+        return self
+
+    def update(self, payload):
+        self.action = 'update'
+        self.payload = payload
+        return self
+
+    def upsert(self, payload, on_conflict=None):
+        self.action = 'upsert'
+        self.payload = payload
+        self.on_conflict = on_conflict
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def execute(self):
+        self.client.requests += 1
+        if self.client.latency:
+            time.sleep(self.client.latency)
+
+        rows = self.client.tables.setdefault(self.name, [])
+        matches = [row for row in rows if all(f(row) for f in self.filters)]
+
+        if self.action == 'select':
+            if self.columns is None:
+                return FakeResponse([dict(row) for row in matches])
+            return FakeResponse([{c: row.get(c) for c in self.columns} for row in matches])
+
+        if self.action == 'update':
+            for row in matches:
+                row.update(self.payload)
+            return FakeResponse([dict(row) for row in matches])
+
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        if self.action == 'insert':
+            return FakeResponse([self.client.add(self.name, record) for record in payload])
+
+        # upsert: actualiza la fila con la misma clave o inserta una nueva
+        key = self.on_conflict or 'id'
+        if len({record[key] for record in payload}) != len(payload):
+            raise ValueError("ON CONFLICT DO UPDATE command cannot affect row a second time")
+        by_key = {row.get(key): row for row in rows}
+        written = []
+        for record in payload:
+            existing = by_key.get(record[key])
+            if existing is None:
+                written.append(self.client.add(self.name, record))
+            else:
+                existing.update(record)
+                written.append(dict(existing))
+        return FakeResponse(written)
+
+
+class FakeSupabase:
+    """
+    Cliente en memoria con la interfaz ``supabase.table(nombre)``
+
+    Args:
+        latency: Segundos de espera por cada ``execute`` (simula la red)
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tables = {}
+        self.requests = 0
+        self._next_id = 1
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def add(self, name, record):
+        row = {"id": self._next_id, **record}
+        self._next_id += 1
+        self.tables.setdefault(name, []).append(row)
+        return dict(row)
+
+
+def _inventory_workbook(products):
+    """Archivo Excel de inventario con ``products`` productos (en memoria)"""
+    import pandas as pd
+
+    df = pd.DataFrame({
+        "PRODUCTO_CODIGO": [f"P-{i:05d}" for i in range(products)],
+        "DESCRIPCION": [f"Producto {i}" for i in range(products)],
+        "STOCK_ACTUAL": [float(i % 97) for i in range(products)],
+        "STOCK_MINIMO": [float(i % 13) for i in range(products)],
+        "UBICACION": [f"Bodega {i % 4}" for i in range(products)],
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer
+
+
+def main():
+    """Compara los modos de process_inventario contra el cliente falso"""
+    import contextlib
+
+    from functions.process_inventario import process_file
+
+    products = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    chunk_size = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+
+    print(f"🧪 Inventario de {products} productos, {latency_ms} ms por llamada")
+    workbook = _inventory_workbook(products)
+
+    for mode in ('filas', 'bulk'):
+        client = FakeSupabase(latency=latency_ms / 1000)
+        # La mitad de los productos ya existe en la tabla
+        for i in range(0, products, 2):
+            client.add("inventario", {"producto_codigo": f"P-{i:05d}"})
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = process_file(workbook, client, mode=mode, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start
+
+        print(f"   {mode:5s}: {result.get('records_processed')} registros, "
+              f"{client.requests} llamadas, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
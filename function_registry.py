@@ -0,0 +1,195 @@
+"""
+Registro declarativo de funciones
+
+Reemplaza los diccionarios de mapeo que antes se reconstruían en cada request.
+El registro se carga y valida una sola vez al iniciar la API desde
+``functions/registry.json`` y resuelve (user_id, function_id) con búsquedas
+O(1) en diccionarios.
+"""
+
+import hashlib
+import json
+import os
+
+from module_cache import module_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REGISTRY_PATH = os.path.join(BASE_DIR, 'functions', 'registry.json')
+
+
+class RegistryError(Exception):
+    """Error de configuración del registro de funciones"""
+
+
+class FunctionNotFound(Exception):
+    """No existe una función para la combinación usuario / ID solicitada"""
+
+
+class FunctionEntry:
+    """Una función registrada (genérica o de un tenant)"""
+
+    __slots__ = ('function_id', 'name', 'description', 'file', 'path',
+                 'is_active', 'tenant')
+
+    def __init__(self, function_id, config, tenant=None):
+        self.function_id = str(function_id)
+        self.name = config['name']
+        self.description = config.get('description', '')
+        self.file = config['file']
+        self.path = os.path.join(BASE_DIR, self.file)
+        self.is_active = bool(config.get('is_active', True))
+        self.tenant = tenant
+
+    @property
+    def module(self):
+        """Módulo del procesador (precargado; se recarga si el archivo cambió)"""
+        return module_cache.get(self.path)
+
+    def to_dict(self):
+        return {
+            "id": int(self.function_id) if self.function_id.isdigit() else self.function_id,
+            "function_name": self.name,
+            "function_description": self.description,
+            "is_active": self.is_active
+        }
+
+
+class FunctionRegistry:
+    """
+    Registro de funciones cargado desde un archivo JSON
+
+    Estructura del archivo:
+        functions: funciones genéricas disponibles para cualquier usuario
+        tenants:   por user_id, sus funciones personalizadas y la función
+                   ``default`` usada para IDs no registrados
+    """
+
+    def __init__(self, config, source='<dict>'):
+        self.source = source
+        self.generic = {}
+        self.tenants = {}
+        self.tenant_defaults = {}
+        self._listings = {}
+
+        if not isinstance(config, dict) or 'functions' not in config:
+            raise RegistryError(f"{source}: falta la sección 'functions'")
+
+        for function_id, entry_config in config['functions'].items():
+            self.generic[str(function_id)] = self._build_entry(function_id, entry_config)
+
+        for tenant, tenant_config in config.get('tenants', {}).items():
+            functions = tenant_config.get('functions') or {}
+            if not functions:
+                raise RegistryError(f"{source}: el tenant {tenant} no tiene funciones")
+            self.tenants[tenant] = {
+                str(function_id): self._build_entry(function_id, entry_config, tenant)
+                for function_id, entry_config in functions.items()
+            }
+
+            default_id = tenant_config.get('default')
+            if default_id is not None:
+                default_id = str(default_id)
+                if default_id not in self.tenants[tenant]:
+                    raise RegistryError(
+                        f"{source}: la función por defecto {default_id} del tenant {tenant} no existe")
+                self.tenant_defaults[tenant] = self.tenants[tenant][default_id]
+
+        # Los listados no cambian mientras viva el proceso: se serializan una vez
+        self._listings[None] = self._build_listing(self.generic)
+        for tenant, functions in self.tenants.items():
+            self._listings[tenant] = self._build_listing(functions)
+
+    def _build_entry(self, function_id, entry_config, tenant=None):
+        for key in ('name', 'file'):
+            if not entry_config.get(key):
+                raise RegistryError(
+                    f"{self.source}: la función {function_id} no define '{key}'")
+        entry = FunctionEntry(function_id, entry_config, tenant)
+        if not os.path.isfile(entry.path):
+            raise RegistryError(
+                f"{self.source}: archivo de función no encontrado: {entry.file}")
+        return entry
+
+    @staticmethod
+    def _build_listing(functions):
+        items = [entry.to_dict() for entry in functions.values()]
+        body = json.dumps({"success": True, "functions": items},
+                          ensure_ascii=False, sort_keys=True).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        return body, etag
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_REGISTRY_PATH):
+        """Carga y valida el registro desde un archivo JSON"""
+        try:
+            with open(path, encoding='utf-8') as registry_file:
+                config = json.load(registry_file)
+        except (OSError, ValueError) as e:
+            raise RegistryError(f"No se pudo leer el registro {path}: {e}")
+        return cls(config, source=path)
+
+    def entries(self):
+        """Todas las funciones registradas (genéricas y de tenants)"""
+        yield from self.generic.values()
+        for functions in self.tenants.values():
+            yield from functions.values()
+
+    def preload(self):
+        """Carga todos los procesadores en la caché de módulos"""
+        loaded = 0
+        for entry in self.entries():
+            try:
+                entry.module
+                loaded += 1
+            except Exception as e:
+                # Se reintentará en el primer request que lo use
+                print(f"⚠️ No se pudo precargar {entry.file}: {e}")
+        return loaded
+
+    def resolve(self, user_id, function_id):
+        """
+        Resuelve la función a ejecutar para un usuario
+
+        Args:
+            user_id: ID del usuario autenticado
+            function_id: ID de la función solicitada
+
+        Returns:
+            FunctionEntry: Función registrada
+
+        Raises:
+            FunctionNotFound: Si no hay implementación para la combinación
+        """
+        function_id = str(function_id)
+        tenant_functions = self.tenants.get(user_id)
+
+        if tenant_functions is not None:
+            entry = tenant_functions.get(function_id) or self.tenant_defaults.get(user_id)
+        else:
+            entry = self.generic.get(function_id)
+
+        if entry is None:
+            raise FunctionNotFound(f"No hay implementación para la función ID {function_id}")
+        if not entry.is_active:
+            raise FunctionNotFound(f"La función ID {function_id} no está activa")
+        return entry
+
+    def listing(self, user_id=None):
+        """
+        Listado serializado de funciones visibles para un usuario
+
+        Returns:
+            tuple: (cuerpo JSON en bytes, ETag)
+        """
+        if user_id in self._listings:
+            return self._listings[user_id]
+        return self._listings[None]
+
+
+def load_registry():
+    """Carga el registro configurado por FUNCTION_REGISTRY_PATH (o el por defecto)"""
+    path = os.getenv('FUNCTION_REGISTRY_PATH', DEFAULT_REGISTRY_PATH)
+    registry = FunctionRegistry.from_file(path)
+    loaded = registry.preload()
+    print(f"📚 Registro de funciones cargado: {loaded} procesadores desde {path}")
+    return registry
@@ -1,8 +1,10 @@
 # process_ventas_arauco.py - Procesador para proforma ARAUCO (archivos XLSX)
-import os
-import pandas as pd
-from datetime import datetime
-import tempfile
+import numpy as np
+
+from pipeline import Column, HeaderMatcher, Processor, Rule, TableSpec
+from pipeline.transforms import (
+    clean_text, coerce_dates, date_parse_errors, int_text, per_unique, rejection_codes, to_float,
+)
 
 
 def process_file(file, user_id):
@@ -17,34 +19,122 @@ def process_file(file, user_id):
         dict: Resultado del procesamiento con INSERT statements
     """
 
-    if not file:
-        return {
-            "success": False,
-            "error": "No se proporcionó ningún archivo"
-        }
-
-    try:
-        # Guardar archivo temporalmente
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-
-        try:
-            # Ejecutar el procesamiento principal CON EL USER_ID
-            result = process_excel_file(temp_path, user_id)
-            return result
-
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-
-    except Exception as e:
-        return {
-            "success": False,
-            "error": f"Error general: {str(e)}",
-            "records_processed": 0
-        }
+    return PROCESSOR.process_file(file, user_id)
+
+
+# ————————————————
+# 1) CONFIGURACIÓN
+# ————————————————
+
+# Cliente fijo para todas las ventas ARAUCO
+CLIENTE = "ARAUCO"
+
+# Certificación por defecto
+CERTIFICACION_DEFAULT = "Material Controlado"
+
+# Mapeo de códigos adicionales a productos
+CODIGO_PRODUCTO_MAPPING = {
+    "ASCM": "W3.2",  # Aserrín
+    "ASTI": "W3.1"   # Astillas
+}
+
+# Motivos por los que se omite una fila
+RECHAZO_FECHA = 1
+RECHAZO_FACTURA = 2
+RECHAZO_VOLUMEN = 3
+
+MOTIVOS_RECHAZO = {
+    RECHAZO_FECHA: "fecha vacía o inválida",
+    RECHAZO_FACTURA: "sin número de factura",
+    RECHAZO_VOLUMEN: "volumen vacío, inválido o <= 0",
+}
+
+VENTAS = TableSpec("ventas", [
+    Column("fecha_venta", "timestamp"),
+    Column("producto_codigo"),
+    Column("cliente"),
+    Column("num_factura"),
+    Column("volumen_m3", "number"),
+    Column("certificacion"),
+    Column("precio_unitario", "number"),
+    Column("user_id"),
+])
+
+
+# Columnas a buscar, sin distinguir mayúsculas ni separadores (FCH_RECEPCION = FCHRECEPCION)
+COLUMNAS = HeaderMatcher({
+    'fecha_venta': Rule('FCHRECEPCION', compact=True),
+    'num_factura': Rule('NUMGUIASERIEC', compact=True),
+    'volumen_m3': Rule('VOLUMENM3RECEPCION', compact=True),
+    'cod_adicional': Rule('CODADICIONAL', compact=True),
+})
+
+
+class VentasAraucoProcessor(Processor):
+    """Proforma ARAUCO: producto según COD_ADICIONAL (ASCM/ASTI)"""
+
+    name = "proforma ARAUCO"
+    table = VENTAS
+    engine = 'openpyxl'
+    engine_fallback = True
+    report_row_errors = True
+    success_message = "¡Procesamiento de proforma ARAUCO completado! {records} registros procesados de {sheets} hojas."
+
+    def resolve_columns(self, columns, sheet):
+        # Mapear las columnas requeridas (buscar variaciones)
+        column_mapping = COLUMNAS.resolve(columns)
+        print(f"📋 Mapeo de columnas: {column_mapping}")
+
+        # Verificar que se encontraron las columnas requeridas
+        required_fields = ['fecha_venta', 'num_factura', 'volumen_m3', 'cod_adicional']
+        missing_fields = [field for field in required_fields if field not in column_mapping]
+        if missing_fields:
+            sheet.error(f"No se encontraron las columnas requeridas en la hoja «{sheet.name}»: {missing_fields}")
+            return None
+        return column_mapping
+
+    def transform(self, df, column_mapping, sheet):
+        # Fecha de venta (requerida): se descartan las celdas que pandas no puede convertir
+        valores_fecha = df[column_mapping['fecha_venta']]
+        fecha_venta = coerce_dates(valores_fecha)
+        sin_fecha = valores_fecha.isna() | date_parse_errors(valores_fecha, fecha_venta)
+
+        # Número de factura (requerido): entero si es numérico, si no el texto
+        valores_factura = df[column_mapping['num_factura']]
+        texto_factura = clean_text(valores_factura, None)
+        numeros_factura = to_float(texto_factura, np.nan)
+        num_factura = int_text(numeros_factura).fillna(texto_factura)
+
+        # int() de un infinito lanza OverflowError: la fila se omite como sin factura
+        infinitos = np.isinf(numeros_factura)
+
+        # Volumen (requerido y > 0); lo que no es número queda en -1 y se descarta
+        volumen = to_float(df[column_mapping['volumen_m3']], -1.0)
+
+        # Código de producto según COD_ADICIONAL (W3.2 por defecto)
+        cod_adicional = per_unique(clean_text(df[column_mapping['cod_adicional']]), lambda unique: unique.str.upper())
+        producto_codigo = cod_adicional.map(CODIGO_PRODUCTO_MAPPING).fillna("W3.2").astype(object)
+
+        codes = rejection_codes(df.index, [
+            (RECHAZO_FECHA, sin_fecha),
+            (RECHAZO_FACTURA, valores_factura.isna() | infinitos),
+            (RECHAZO_VOLUMEN, volumen <= 0),
+            (RECHAZO_FACTURA, num_factura.isin(["nan", "None", ""])),
+        ])
+        keep = self.reject(sheet, codes, MOTIVOS_RECHAZO)
+        return self.collect(sheet, keep, {
+            "fecha_venta": fecha_venta,
+            "producto_codigo": producto_codigo,
+            "cliente": CLIENTE,
+            "num_factura": num_factura,
+            "volumen_m3": volumen,
+            "certificacion": CERTIFICACION_DEFAULT,
+            "precio_unitario": None,
+            "user_id": sheet.user_id
+        })
+
+
+PROCESSOR = VentasAraucoProcessor()
 
 
 def process_excel_file(file_path, user_id):
@@ -55,240 +145,4 @@ def process_excel_file(file_path, user_id):
         file_path: Ruta del archivo Excel a procesar
         user_id: ID del usuario autenticado
     """
-    
-    print("🔥🔥🔥 EJECUTANDO SCRIPT DE PROFORMA ARAUCO 🔥🔥🔥")
-    print(f"🎯 Archivo: {file_path}")
-    print(f"👤 Usuario: {user_id}")
-    print("🔥🔥🔥 ESTE ES EL SCRIPT PARA PROFORMA ARAUCO 🔥🔥🔥")
-
-    # ————————————————
-    # 1) CONFIGURACIÓN
-    # ————————————————
-
-    # Cliente fijo para todas las ventas ARAUCO
-    CLIENTE = "ARAUCO"
-
-    # Certificación por defecto
-    CERTIFICACION_DEFAULT = "Material Controlado"
-
-    # Mapeo de códigos adicionales a productos
-    CODIGO_PRODUCTO_MAPPING = {
-        "ASCM": "W3.2",  # Aserrín
-        "ASTI": "W3.1"   # Astillas
-    }
-
-    total_records = 0
-    processed_sheets = 0
-    errors = []
-    insert_statements = []
-
-    try:
-        print(f"📁 Procesando archivo XLSX: {file_path}")
-        
-        # ————————————————
-        # 2) CARGAR TODO EL EXCEL
-        # ————————————————
-        # Leer archivo XLSX usando openpyxl
-        try:
-            print("🔧 Usando engine 'openpyxl' para archivo .xlsx")
-            xf = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
-        except Exception as read_error:
-            print(f"❌ Error leyendo archivo Excel: {read_error}")
-            # Intentar con engine automático como fallback
-            print("🔄 Intentando con engine automático...")
-            xf = pd.read_excel(file_path, sheet_name=None)
-
-        # ————————————————
-        # 3) PROCESAR CADA HOJA
-        # ————————————————
-        for sheet_name, df in xf.items():
-            print(f"📊 Procesando hoja: {sheet_name} con {len(df)} filas")
-
-            # Limpieza de nombres de columna (quita espacios al inicio/fin)
-            df.columns = df.columns.str.strip()
-
-            print(f"📋 Columnas encontradas: {list(df.columns)}")
-
-            # Mapear las columnas requeridas (buscar variaciones)
-            column_mapping = {}
-
-            # Buscar FCH_RECEPCION (fecha de venta)
-            for col in df.columns:
-                col_clean = str(col).upper().replace('_', '').replace(' ', '')
-                if 'FCHRECEPCION' in col_clean or 'FCH_RECEPCION' in col.upper():
-                    column_mapping['fecha_venta'] = col
-                    print(f"📅 Columna de fecha recepción encontrada: {col}")
-                    break
-
-            # Buscar NUM_GUIA_SERIE_C (número de factura)
-            for col in df.columns:
-                col_clean = str(col).upper().replace('_', '').replace(' ', '')
-                if 'NUMGUIASERIEC' in col_clean or 'NUM_GUIA_SERIE_C' in col.upper():
-                    column_mapping['num_factura'] = col
-                    print(f"📄 Columna de número guía encontrada: {col}")
-                    break
-
-            # Buscar VOLUMEN_M3_RECEPCION (volumen)
-            for col in df.columns:
-                col_clean = str(col).upper().replace('_', '').replace(' ', '')
-                if 'VOLUMENM3RECEPCION' in col_clean or 'VOLUMEN_M3_RECEPCION' in col.upper():
-                    column_mapping['volumen_m3'] = col
-                    print(f"📦 Columna de volumen encontrada: {col}")
-                    break
-
-            # Buscar COD_ADICIONAL (para determinar producto)
-            for col in df.columns:
-                col_clean = str(col).upper().replace('_', '').replace(' ', '')
-                if 'CODADICIONAL' in col_clean or 'COD_ADICIONAL' in col.upper():
-                    column_mapping['cod_adicional'] = col
-                    print(f"🏷️ Columna de código adicional encontrada: {col}")
-                    break
-
-            print(f"📋 Mapeo de columnas: {column_mapping}")
-
-            # Verificar que se encontraron las columnas requeridas
-            required_fields = ['fecha_venta', 'num_factura', 'volumen_m3', 'cod_adicional']
-            missing_fields = [
-                field for field in required_fields if field not in column_mapping]
-
-            if missing_fields:
-                error_msg = f"No se encontraron las columnas requeridas en la hoja «{sheet_name}»: {missing_fields}"
-                errors.append(error_msg)
-                print(f"❌ {error_msg}")
-                continue
-
-            sheet_records = 0
-
-            # Itera sobre cada fila de la hoja
-            for index, row in df.iterrows():
-                try:
-                    # Obtener fecha de venta (requerido)
-                    if pd.notna(row[column_mapping['fecha_venta']]):
-                        try:
-                            fecha_venta = pd.to_datetime(row[column_mapping['fecha_venta']])
-                            print(f"📅 Fila {index}: Fecha procesada: {fecha_venta}")
-                        except Exception as date_error:
-                            print(f"⚠️ Saltando fila {index}: error al procesar fecha - {date_error}")
-                            continue
-                    else:
-                        print(f"⚠️ Saltando fila {index}: fecha venta vacía")
-                        continue
-
-                    # Cliente fijo ARAUCO
-                    cliente = CLIENTE
-                    print(f"👤 Fila {index}: Cliente fijo: {cliente}")
-
-                    # Obtener número de factura (requerido)
-                    if pd.notna(row[column_mapping['num_factura']]):
-                        try:
-                            # Convertir a string y limpiar
-                            num_factura = str(row[column_mapping['num_factura']]).strip()
-                            # Si es un número, convertir a entero para eliminar decimales
-                            try:
-                                num_factura_int = int(float(num_factura))
-                                num_factura = str(num_factura_int)
-                            except (ValueError, TypeError):
-                                pass  # Mantener como string si no es numérico
-                            print(f"📄 Fila {index}: Número factura: {num_factura}")
-                        except Exception:
-                            print(f"⚠️ Saltando fila {index}: error al procesar número de factura")
-                            continue
-                    else:
-                        print(f"⚠️ Saltando fila {index}: número de factura vacío")
-                        continue
-
-                    # Obtener volumen (requerido y debe ser > 0)
-                    try:
-                        if pd.notna(row[column_mapping['volumen_m3']]):
-                            volumen = float(row[column_mapping['volumen_m3']])
-                            if volumen <= 0:
-                                print(f"⚠️ Saltando fila {index}: volumen es 0 o negativo ({volumen})")
-                                continue
-                            print(f"📦 Fila {index}: Volumen: {volumen}")
-                        else:
-                            print(f"⚠️ Saltando fila {index}: volumen vacío")
-                            continue
-                    except (ValueError, TypeError):
-                        print(f"⚠️ Saltando fila {index}: error al convertir volumen")
-                        continue
-
-                    # Determinar código de producto basado en COD_ADICIONAL
-                    producto_codigo = "W3.2"  # Valor por defecto (aserrín)
-                    
-                    if pd.notna(row[column_mapping['cod_adicional']]):
-                        cod_adicional = str(row[column_mapping['cod_adicional']]).strip().upper()
-                        print(f"🏷️ Fila {index}: Código adicional: {cod_adicional}")
-                        
-                        if cod_adicional in CODIGO_PRODUCTO_MAPPING:
-                            producto_codigo = CODIGO_PRODUCTO_MAPPING[cod_adicional]
-                            print(f"✅ Fila {index}: Producto identificado: {cod_adicional} → {producto_codigo}")
-                        else:
-                            print(f"⚠️ Fila {index}: Código adicional no reconocido '{cod_adicional}', usando W3.2 por defecto")
-                    else:
-                        print(f"🏷️ Fila {index}: Sin código adicional, usando W3.2 por defecto")
-
-                    # Validar que no sean valores vacíos
-                    if num_factura in ["nan", "None", ""] or cliente in ["nan", "None", ""]:
-                        print(f"⚠️ Saltando fila {index}: datos vacíos")
-                        continue
-
-                    # Generar INSERT statement para la tabla ventas (precio_unitario como NULL)
-                    insert_sql = f"""INSERT INTO ventas (fecha_venta, producto_codigo, cliente, num_factura, volumen_m3, certificacion, precio_unitario, user_id) 
-VALUES ('{fecha_venta.isoformat()}', '{producto_codigo}', '{cliente.replace("'", "''")}', '{num_factura}', {volumen}, '{CERTIFICACION_DEFAULT}', NULL, '{user_id}');"""
-
-                    insert_statements.append(insert_sql)
-
-                    # Log del registro procesado
-                    record = {
-                        "fecha_venta": fecha_venta.isoformat(),
-                        "producto_codigo": producto_codigo,
-                        "cliente": cliente,
-                        "num_factura": num_factura,
-                        "volumen_m3": volumen,
-                        "certificacion": CERTIFICACION_DEFAULT,
-                        "precio_unitario": None,
-                        "user_id": user_id
-                    }
-
-                    print(f"✅ Procesado: {record}")
-                    sheet_records += 1
-                    total_records += 1
-
-                except Exception as row_error:
-                    print(f"❌ Error procesando fila {index}: {row_error}")
-                    errors.append(f"Error en fila {index}: {str(row_error)}")
-                    continue
-
-            processed_sheets += 1
-            print(f"✅ Hoja {sheet_name} procesada: {sheet_records} registros")
-
-        print("¡Procesamiento de proforma ARAUCO completado!")
-        
-        # DEBUG: Mostrar los primeros INSERT statements generados
-        print("🔍 DEBUG - PRIMEROS INSERT STATEMENTS GENERADOS:")
-        for i, stmt in enumerate(insert_statements[:3]):
-            print(f"📝 Statement {i+1}: {stmt}")
-        print(f"📊 Total de INSERT statements generados: {len(insert_statements)}")
-
-        return {
-            "success": True,
-            "records_processed": total_records,
-            "sheets_processed": processed_sheets,
-            "total_sheets": len(xf),
-            "errors": errors,
-            "insert_statements": insert_statements,
-            "message": f"¡Procesamiento de proforma ARAUCO completado! {total_records} registros procesados de {processed_sheets} hojas."
-        }
-
-    except Exception as e:
-        error_msg = f"Error en el procesamiento de proforma ARAUCO: {str(e)}"
-        print(f"❌ {error_msg}")
-        errors.append(error_msg)
-
-        return {
-            "success": False,
-            "error": error_msg,
-            "records_processed": total_records,
-            "errors": errors,
-            "insert_statements": insert_statements
-        }
\ No newline at end of file
+    return PROCESSOR.run(file_path, user_id)
@@ -1,8 +1,12 @@
 # process_ventas_generales.py - Procesador para ventas generales (archivos XLSX)
-import os
 import pandas as pd
 from datetime import datetime
-import tempfile
+import numpy as np
+
+from pipeline import Column, HeaderMatcher, Processor, Rule, TableSpec
+from pipeline.transforms import (
+    ERROR_INFINITO, clean_text, first_match, int_text, map_unique, merge_dates, per_unique, to_float, yyyymmdd_dates,
+)
 
 
 def process_file(file, user_id):
@@ -17,34 +21,7 @@ def process_file(file, user_id):
         dict: Resultado del procesamiento con INSERT statements
     """
 
-    if not file:
-        return {
-            "success": False,
-            "error": "No se proporcionó ningún archivo"
-        }
-
-    try:
-        # Guardar archivo temporalmente
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-
-        try:
-            # Ejecutar el procesamiento principal CON EL USER_ID
-            result = process_excel_file(temp_path, user_id)
-            return result
-
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-
-    except Exception as e:
-        return {
-            "success": False,
-            "error": f"Error general: {str(e)}",
-            "records_processed": 0
-        }
+    return PROCESSOR.process_file(file, user_id)
 
 
 def convert_date_number_to_datetime(date_number):
@@ -71,6 +48,154 @@ def convert_date_number_to_datetime(date_number):
         raise ValueError(f"Error al convertir fecha {date_number}: {str(e)}")
 
 
+def _fecha_o_error(value):
+    """Conversión celda a celda de las fechas que no son YYYYMMDD; devuelve la excepción si falla"""
+    try:
+        try:
+            # Intentar convertir como número de fecha primero
+            return convert_date_number_to_datetime(int(float(value)))
+        except (ValueError, TypeError):
+            # Si falla, intentar como fecha normal
+            return pd.to_datetime(value)
+    except Exception as e:
+        return e
+
+
+# ————————————————
+# 1) CONFIGURACIÓN
+# ————————————————
+
+# Certificación por defecto
+CERTIFICACION_DEFAULT = "Material Controlado"
+
+# Mapeo de productos por defecto (puede expandirse según necesidades)
+PRODUCTO_MAPPING = {
+    "W1.1": "Astillas pinus radiata",
+    "W1.2": "Aserrín pinus radiata",
+    "W2.1": "Madera aserrada",
+    "W3.1": "Astillas pinus radiata",
+    "W3.2": "Aserrín pinus radiata"
+}
+
+VENTAS = TableSpec("ventas", [
+    Column("fecha_venta", "timestamp"),
+    Column("producto_codigo"),
+    Column("cliente"),
+    Column("num_factura"),
+    Column("volumen_m3", "number"),
+    Column("certificacion"),
+    Column("precio_unitario", "number"),
+    Column("user_id"),
+])
+
+
+# Columnas a buscar, por prioridad (sin distinguir mayúsculas; cada regla
+# ignora solo los acentos de las letras indicadas)
+COLUMNAS = HeaderMatcher({
+    # Fecha contabilización; si no, fecha venta/factura; si no, cualquier FECHA
+    'fecha_venta': [
+        Rule('FECHA', ('CONTABILIZ', 'CONTABIL'), ignore_accents='ÓÍÁ'),
+        Rule('FECHA', ('VENTA', 'FACTURA'), ignore_accents='ÁÉ'),
+        Rule('FECHA'),
+    ],
+    'cliente': Rule(('CLIENTE', 'COMPRADOR'), ignore_accents='ÍÉ'),
+    'num_factura': [
+        Rule(('FACTURA', 'GUIA', 'NUMERO'), 'NUM', ignore_accents='ÚÍ'),
+        Rule(('FACTURA', 'GUIA'), ignore_accents='Í'),
+    ],
+    'descripcion_material': Rule(('DESCRIPCION', 'DESCRIPC'), 'MATERIAL', ignore_accents='ÓÍÁ'),
+    'producto_codigo': (Rule('PRODUCTO', 'CODIGO', ignore_accents='Ó'), Rule('COD_PRODUCTO', ignore_accents='Ó')),
+    # VOLUMEN y M3, o M3, o RECEPCION; si no, VOLUMEN o CANTIDAD
+    'volumen_m3': [
+        Rule(('M3', 'RECEPCION'), ignore_accents='Ó'),
+        Rule(('VOLUMEN', 'CANTIDAD')),
+    ],
+})
+
+
+class VentasMasisaProcessor(Processor):
+    """Ventas generales MASISA: fechas YYYYMMDD y volumen en dm3"""
+
+    name = "ventas generales"
+    table = VENTAS
+    engine = 'openpyxl'
+    engine_fallback = True
+    report_row_errors = True
+    success_message = "¡Procesamiento de ventas generales completado! {records} registros procesados de {sheets} hojas."
+
+    def resolve_columns(self, columns, sheet):
+        # Mapear las columnas requeridas (buscar variaciones)
+        column_mapping = COLUMNAS.resolve(columns)
+        print(f"📋 Mapeo de columnas: {column_mapping}")
+
+        # Verificar que se encontraron las columnas requeridas
+        required_fields = ['fecha_venta', 'volumen_m3']
+        missing_fields = [field for field in required_fields if field not in column_mapping]
+        if missing_fields:
+            sheet.error(f"No se encontraron las columnas requeridas en la hoja «{sheet.name}»: {missing_fields}")
+            return None
+        return column_mapping
+
+    def transform(self, df, column_mapping, sheet):
+        # Fecha de venta (requerida): número YYYYMMDD o, si no, fecha normal
+        valores_fecha = df[column_mapping['fecha_venta']]
+        con_fecha = valores_fecha.notna()
+        fecha_numero = yyyymmdd_dates(to_float(valores_fecha, np.nan))
+        pendientes = con_fecha & fecha_numero.isna()
+        fecha_otra = map_unique(valores_fecha[pendientes], _fecha_o_error)
+        es_error = fecha_otra.map(lambda value: isinstance(value, Exception))
+        errores = fecha_otra[es_error]
+        fecha_venta = merge_dates(df.index, fecha_numero, fecha_otra[~es_error])
+
+        # Número de factura (opcional): entero si es numérico, si no el texto;
+        # sin columna o vacío se genera uno automático
+        num_factura = pd.Series([f"AUTO-{index+1:04d}" for index in df.index], index=df.index, dtype=object)
+        if 'num_factura' in column_mapping:
+            valores_factura = df[column_mapping['num_factura']]
+            numeros = to_float(valores_factura, np.nan)
+            factura = int_text(numeros).fillna(clean_text(valores_factura, None))
+            num_factura = factura.where(valores_factura.notna(), num_factura)
+            # int() de un infinito no es ValueError: la fila falla (si la fecha no falló antes)
+            infinitos = con_fecha & valores_factura.notna() & np.isinf(numeros) & ~df.index.isin(errores.index)
+            if infinitos.any():
+                errores = pd.concat([errores, pd.Series(ERROR_INFINITO, index=df.index[infinitos.to_numpy()])])
+                errores = errores.sort_index()
+        self.report_errors(sheet, errores)
+
+        # Código de producto: ASTILLA VERDE (TS) -> W3.1, si no W3.2
+        es_astilla = pd.Series(False, index=df.index)
+        if 'descripcion_material' in column_mapping:
+            descripcion = clean_text(df[column_mapping['descripcion_material']])
+            es_astilla = first_match(per_unique(descripcion, lambda unique: unique.str.upper()),
+                                     ["ASTILLA VERDE (TS)"]) == 0
+        producto_codigo = pd.Series(np.where(es_astilla, "W3.1", "W3.2"), index=df.index, dtype=object)
+
+        # Si hay columna de producto_codigo específica, usarla como override
+        if 'producto_codigo' in column_mapping:
+            producto_codigo = clean_text(df[column_mapping['producto_codigo']], None).fillna(producto_codigo)
+
+        # Volumen (requerido y > 0) - SIEMPRE DIVIDIR POR 1000, y x2.54 para ASTILLA VERDE (TS)
+        volumen_original = to_float(df[column_mapping['volumen_m3']])
+        volumen = volumen_original / 1000
+        volumen = volumen.where(~es_astilla, volumen * 2.54)
+
+        keep = (con_fecha & ~df.index.isin(errores.index) & ~(volumen_original <= 0)
+                & ~num_factura.isin(["nan", "None", ""]))
+        return self.collect(sheet, keep, {
+            "fecha_venta": fecha_venta,
+            "producto_codigo": producto_codigo,
+            "cliente": "MASISA",  # Cliente fijo MASISA
+            "num_factura": num_factura,
+            "volumen_m3": volumen,
+            "certificacion": CERTIFICACION_DEFAULT,
+            "precio_unitario": None,
+            "user_id": sheet.user_id
+        })
+
+
+PROCESSOR = VentasMasisaProcessor()
+
+
 def process_excel_file(file_path, user_id):
     """
     Procesa el archivo Excel de ventas generales y genera INSERT statements
@@ -79,348 +204,4 @@ def process_excel_file(file_path, user_id):
         file_path: Ruta del archivo Excel a procesar
         user_id: ID del usuario autenticado
     """
-
-    print("🚀🚀🚀 EJECUTANDO SCRIPT DE VENTAS GENERALES 🚀🚀🚀")
-    print(f"🎯 Archivo: {file_path}")
-    print(f"👤 Usuario: {user_id}")
-    print("🚀🚀🚀 ESTE ES EL SCRIPT PARA VENTAS GENERALES 🚀🚀🚀")
-
-    # ————————————————
-    # 1) CONFIGURACIÓN
-    # ————————————————
-
-    # Certificación por defecto
-    CERTIFICACION_DEFAULT = "Material Controlado"
-
-    # Mapeo de productos por defecto (puede expandirse según necesidades)
-    PRODUCTO_MAPPING = {
-        "W1.1": "Astillas pinus radiata",
-        "W1.2": "Aserrín pinus radiata",
-        "W2.1": "Madera aserrada",
-        "W3.1": "Astillas pinus radiata",
-        "W3.2": "Aserrín pinus radiata"
-    }
-
-    total_records = 0
-    processed_sheets = 0
-    errors = []
-    insert_statements = []
-
-    try:
-        print(f"📁 Procesando archivo XLSX: {file_path}")
-
-        # ————————————————
-        # 2) CARGAR TODO EL EXCEL
-        # ————————————————
-        # Leer archivo XLSX usando openpyxl
-        try:
-            print("🔧 Usando engine 'openpyxl' para archivo .xlsx")
-            xf = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
-        except Exception as read_error:
-            print(f"❌ Error leyendo archivo Excel: {read_error}")
-            # Intentar con engine automático como fallback
-            print("🔄 Intentando con engine automático...")
-            xf = pd.read_excel(file_path, sheet_name=None)
-
-        # ————————————————
-        # 3) PROCESAR CADA HOJA
-        # ————————————————
-        for sheet_name, df in xf.items():
-            print(f"📊 Procesando hoja: {sheet_name} con {len(df)} filas")
-
-            # Limpieza de nombres de columna (quita espacios al inicio/fin)
-            df.columns = df.columns.str.strip()
-
-            print(f"📋 Columnas encontradas: {list(df.columns)}")
-
-            # Mapear las columnas requeridas (buscar variaciones)
-            column_mapping = {}
-
-            # Buscar FECHA_VENTA (con variaciones de caracteres especiales)
-            for col in df.columns:
-                col_clean = str(col).upper().replace(
-                    'Ó', 'O').replace('Í', 'I').replace('Á', 'A')
-                if 'FECHA' in col_clean and ('CONTABILIZ' in col_clean or 'CONTABIL' in col_clean):
-                    column_mapping['fecha_venta'] = col
-                    print(
-                        f"📅 Columna de fecha contabilización encontrada: {col}")
-                    break
-
-            # Si no se encuentra fecha contabiliz, buscar fecha venta
-            if 'fecha_venta' not in column_mapping:
-                for col in df.columns:
-                    col_clean = str(col).upper().replace(
-                        'Á', 'A').replace('É', 'E')
-                    if 'FECHA' in col_clean and ('VENTA' in col_clean or 'FACTURA' in col_clean):
-                        column_mapping['fecha_venta'] = col
-                        print(f"📅 Columna de fecha venta encontrada: {col}")
-                        break
-
-            # Si no se encuentra, buscar solo FECHA
-            if 'fecha_venta' not in column_mapping:
-                for col in df.columns:
-                    if 'FECHA' in str(col).upper():
-                        column_mapping['fecha_venta'] = col
-                        print(f"📅 Columna de fecha encontrada: {col}")
-                        break
-
-            # Buscar CLIENTE
-            for col in df.columns:
-                col_clean = str(col).upper().replace(
-                    'Í', 'I').replace('É', 'E')
-                if 'CLIENTE' in col_clean or 'COMPRADOR' in col_clean:
-                    column_mapping['cliente'] = col
-                    print(f"👤 Columna de cliente encontrada: {col}")
-                    break
-
-            # Buscar NUM_FACTURA o NUM_GUIA
-            for col in df.columns:
-                col_clean = str(col).upper().replace(
-                    'Ú', 'U').replace('Í', 'I')
-                if ('FACTURA' in col_clean or 'GUIA' in col_clean or 'NUMERO' in col_clean) and 'NUM' in col_clean:
-                    column_mapping['num_factura'] = col
-                    print(f"📄 Columna de número factura encontrada: {col}")
-                    break
-
-            # Si no se encuentra num_factura, buscar variaciones
-            if 'num_factura' not in column_mapping:
-                for col in df.columns:
-                    col_clean = str(col).upper().replace('Í', 'I')
-                    if 'FACTURA' in col_clean or 'GUIA' in col_clean:
-                        column_mapping['num_factura'] = col
-                        print(f"📄 Columna de factura/guía encontrada: {col}")
-                        break
-
-            # Buscar DESCRIPCIÓN MATERIAL (para determinar producto_codigo)
-            for col in df.columns:
-                col_clean = str(col).upper().replace(
-                    'Ó', 'O').replace('Í', 'I').replace('Á', 'A')
-                if ('DESCRIPCION' in col_clean or 'DESCRIPC' in col_clean) and 'MATERIAL' in col_clean:
-                    column_mapping['descripcion_material'] = col
-                    print(
-                        f"📝 Columna de descripción material encontrada: {col}")
-                    break
-
-            # Buscar PRODUCTO_CODIGO (opcional)
-            for col in df.columns:
-                col_clean = str(col).upper().replace('Ó', 'O')
-                if ('PRODUCTO' in col_clean and 'CODIGO' in col_clean) or 'COD_PRODUCTO' in col_clean:
-                    column_mapping['producto_codigo'] = col
-                    print(f"🏷️ Columna de código producto encontrada: {col}")
-                    break
-
-            # Buscar VOLUMEN_M3
-            for col in df.columns:
-                col_clean = str(col).upper().replace('Ó', 'O')
-                if ('VOLUMEN' in col_clean and 'M3' in col_clean) or 'M3' in col_clean or 'RECEPCION' in col_clean:
-                    column_mapping['volumen_m3'] = col
-                    print(f"📦 Columna de volumen encontrada: {col}")
-                    break
-
-            # Si no se encuentra volumen_m3, buscar CANTIDAD o VOLUMEN
-            if 'volumen_m3' not in column_mapping:
-                for col in df.columns:
-                    col_clean = str(col).upper()
-                    if 'VOLUMEN' in col_clean or 'CANTIDAD' in col_clean:
-                        column_mapping['volumen_m3'] = col
-                        print(
-                            f"📦 Columna de volumen/cantidad encontrada: {col}")
-                        break
-
-            print(f"📋 Mapeo de columnas: {column_mapping}")
-
-            # Verificar que se encontraron las columnas requeridas
-            required_fields = ['fecha_venta', 'volumen_m3']
-            missing_fields = [
-                field for field in required_fields if field not in column_mapping]
-
-            if missing_fields:
-                error_msg = f"No se encontraron las columnas requeridas en la hoja «{sheet_name}»: {missing_fields}"
-                errors.append(error_msg)
-                print(f"❌ {error_msg}")
-                continue
-
-            sheet_records = 0
-
-            # Itera sobre cada fila de la hoja
-            for index, row in df.iterrows():
-                try:
-                    # Obtener fecha de venta (requerido)
-                    if pd.notna(row[column_mapping['fecha_venta']]):
-                        try:
-                            # Intentar convertir como número de fecha primero
-                            fecha_numero = int(
-                                float(row[column_mapping['fecha_venta']]))
-                            fecha_venta = convert_date_number_to_datetime(
-                                fecha_numero)
-                            print(
-                                f"📅 Fila {index}: Fecha convertida: {fecha_numero} → {fecha_venta}")
-                        except (ValueError, TypeError):
-                            # Si falla, intentar como fecha normal
-                            fecha_venta = pd.to_datetime(
-                                row[column_mapping['fecha_venta']])
-                            print(
-                                f"📅 Fila {index}: Fecha procesada: {fecha_venta}")
-                    else:
-                        print(f"⚠️ Saltando fila {index}: fecha venta vacía")
-                        continue
-
-                    # Cliente fijo MASISA
-                    cliente = "MASISA"
-                    print(f"👤 Fila {index}: Cliente fijo: {cliente}")
-
-                    # Obtener número de factura (opcional, generar automático)
-                    num_factura = f"AUTO-{index+1:04d}"  # Valor por defecto
-                    if 'num_factura' in column_mapping and pd.notna(row[column_mapping['num_factura']]):
-                        try:
-                            # Convertir a entero para eliminar decimales si es necesario
-                            num_factura_int = int(
-                                float(row[column_mapping['num_factura']]))
-                            num_factura = str(num_factura_int)
-                            print(
-                                f"📄 Fila {index}: Número factura convertido: {row[column_mapping['num_factura']]} → {num_factura}")
-                        except (ValueError, TypeError):
-                            num_factura = str(
-                                row[column_mapping['num_factura']]).strip()
-                            print(
-                                f"📄 Fila {index}: Número factura como string: {num_factura}")
-                    else:
-                        print(
-                            f"📄 Fila {index}: Usando número factura automático: {num_factura}")
-
-                    # Determinar código de producto basado en descripción material
-                    producto_codigo = "W3.2"  # Valor por defecto
-                    producto_nombre = "Aserrín pinus radiata"  # Nombre por defecto
-
-                    if 'descripcion_material' in column_mapping and pd.notna(row[column_mapping['descripcion_material']]):
-                        descripcion_material = str(
-                            row[column_mapping['descripcion_material']]).strip()
-                        print(
-                            f"📝 Fila {index}: Descripción material: {descripcion_material}")
-
-                        # Verificar si es astilla verde
-                        if "ASTILLA VERDE (TS)" in descripcion_material.upper():
-                            producto_codigo = "W3.1"
-                            producto_nombre = "Astillas pinus radiata"
-                            print(
-                                f"✅ Fila {index}: Producto identificado: ASTILLA VERDE (TS) → {producto_codigo}")
-                        else:
-                            producto_codigo = "W3.2"
-                            producto_nombre = "Aserrín pinus radiata"
-                            print(
-                                f"✅ Fila {index}: Producto identificado: Material por defecto → {producto_codigo}")
-                    else:
-                        print(
-                            f"🏷️ Fila {index}: Sin descripción material, usando código por defecto: {producto_codigo}")
-
-                    # Si hay columna de producto_codigo específica, usarla como override
-                    if 'producto_codigo' in column_mapping and pd.notna(row[column_mapping['producto_codigo']]):
-                        producto_codigo_override = str(
-                            row[column_mapping['producto_codigo']]).strip()
-                        print(
-                            f"🔄 Fila {index}: Override código producto: {producto_codigo_override}")
-                        producto_codigo = producto_codigo_override
-                        producto_nombre = PRODUCTO_MAPPING.get(
-                            producto_codigo, "Producto desconocido")
-
-                    # Obtener volumen (requerido y debe ser > 0) - SIEMPRE DIVIDIR POR 1000
-                    try:
-                        if pd.notna(row[column_mapping['volumen_m3']]):
-                            volumen_original = float(
-                                row[column_mapping['volumen_m3']])
-                            if volumen_original <= 0:
-                                print(
-                                    f"⚠️ Saltando fila {index}: volumen es 0 o negativo ({volumen_original})")
-                                continue
-
-                            # SIEMPRE dividir por 1000
-                            volumen = volumen_original / 1000
-
-                            # Si es ASTILLA VERDE (TS), multiplicar por 2.54
-                            if 'descripcion_material' in column_mapping and pd.notna(row[column_mapping['descripcion_material']]):
-                                descripcion_material = str(
-                                    row[column_mapping['descripcion_material']]).strip()
-                                if "ASTILLA VERDE (TS)" in descripcion_material.upper():
-                                    volumen = volumen * 2.54
-                                    print(
-                                        f"📦 Fila {index}: Volumen ASTILLA VERDE (TS): {volumen_original} / 1000 * 2.54 = {volumen}")
-                                else:
-                                    print(
-                                        f"📦 Fila {index}: Volumen convertido: {volumen_original} / 1000 = {volumen}")
-                            else:
-                                print(
-                                    f"📦 Fila {index}: Volumen convertido: {volumen_original} / 1000 = {volumen}")
-                        else:
-                            print(f"⚠️ Saltando fila {index}: volumen vacío")
-                            continue
-                    except (ValueError, TypeError):
-                        print(
-                            f"⚠️ Saltando fila {index}: error al convertir volumen")
-                        continue
-
-                    # Validar que no sean valores vacíos
-                    if num_factura in ["nan", "None", ""] or cliente in ["nan", "None", ""]:
-                        print(f"⚠️ Saltando fila {index}: datos vacíos")
-                        continue
-
-                    # Generar INSERT statement para la tabla ventas (precio_unitario como NULL)
-                    insert_sql = f"""INSERT INTO ventas (fecha_venta, producto_codigo, cliente, num_factura, volumen_m3, certificacion, precio_unitario, user_id) 
-VALUES ('{fecha_venta.isoformat()}', '{producto_codigo}', '{cliente.replace("'", "''")}', '{num_factura}', {volumen}, '{CERTIFICACION_DEFAULT}', NULL, '{user_id}');"""
-
-                    insert_statements.append(insert_sql)
-
-                    # Log del registro procesado
-                    record = {
-                        "fecha_venta": fecha_venta.isoformat(),
-                        "producto_codigo": producto_codigo,
-                        "producto_nombre": producto_nombre,
-                        "cliente": cliente,
-                        "num_factura": num_factura,
-                        "volumen_m3": volumen,
-                        "certificacion": CERTIFICACION_DEFAULT,
-                        "user_id": user_id
-                    }
-
-                    print(f"✅ Procesado: {record}")
-                    sheet_records += 1
-                    total_records += 1
-
-                except Exception as row_error:
-                    print(f"❌ Error procesando fila {index}: {row_error}")
-                    errors.append(f"Error en fila {index}: {str(row_error)}")
-                    continue
-
-            processed_sheets += 1
-            print(f"✅ Hoja {sheet_name} procesada: {sheet_records} registros")
-
-        print("¡Procesamiento de ventas generales completado!")
-
-        # DEBUG: Mostrar los primeros INSERT statements generados
-        print("🔍 DEBUG - PRIMEROS INSERT STATEMENTS GENERADOS:")
-        for i, stmt in enumerate(insert_statements[:3]):
-            print(f"📝 Statement {i+1}: {stmt}")
-        print(
-            f"📊 Total de INSERT statements generados: {len(insert_statements)}")
-
-        return {
-            "success": True,
-            "records_processed": total_records,
-            "sheets_processed": processed_sheets,
-            "total_sheets": len(xf),
-            "errors": errors,
-            "insert_statements": insert_statements,
-            "message": f"¡Procesamiento de ventas generales completado! {total_records} registros procesados de {processed_sheets} hojas."
-        }
-
-    except Exception as e:
-        error_msg = f"Error en el procesamiento de ventas generales: {str(e)}"
-        print(f"❌ {error_msg}")
-        errors.append(error_msg)
-
-        return {
-            "success": False,
-            "error": error_msg,
-            "records_processed": total_records,
-            "errors": errors,
-            "insert_statements": insert_statements
-        }
+    return PROCESSOR.run(file_path, user_id)
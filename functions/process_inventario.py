@@ -3,18 +3,33 @@ Función ID 3: Procesador de Inventario
 Procesa archivos Excel de inventario y stock
 """
 
+import os
+
+import numpy as np
 import pandas as pd
 from datetime import datetime
-import os
-import tempfile
 
-def process_file(file, supabase):
+from pipeline import open_upload
+from pipeline.transforms import clean_text, map_unique, to_float
+
+# 'filas' consulta y actualiza/inserta producto por producto; 'bulk' usa
+# upserts por lotes (requiere una restricción única sobre producto_codigo)
+INVENTARIO_MODE = os.getenv('INVENTARIO_MODE', 'filas')
+
+# Productos por upsert en modo 'bulk'
+INVENTARIO_CHUNK_SIZE = int(os.getenv('INVENTARIO_CHUNK_SIZE', '500'))
+
+
+def process_file(file, supabase, mode=None, chunk_size=None):
     """
     Procesa un archivo Excel de inventario
     
     Args:
         file: Archivo subido desde el frontend
         supabase: Cliente de Supabase para insertar datos
+        mode: 'filas' (consulta + update/insert por fila) o 'bulk' (upserts por
+            lotes); por defecto INVENTARIO_MODE
+        chunk_size: Filas por lote en modo 'bulk'; por defecto INVENTARIO_CHUNK_SIZE
     
     Returns:
         dict: Resultado del procesamiento
@@ -29,15 +44,11 @@ def process_file(file, supabase):
     try:
         print("🚀 Iniciando procesamiento de inventario...")
         
-        # Guardar archivo temporalmente
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as temp_file:
-            file.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        try:
+        # Leer el archivo directamente desde la carga, sin copiarlo a disco
+        with open_upload(file) as source:
             # Cargar archivo Excel
             print("📊 Cargando archivo Excel de inventario...")
-            df = pd.read_excel(temp_path)
+            df = pd.read_excel(source)
             print(f"✅ Archivo cargado. Encontradas {len(df)} filas.")
             
             # Limpieza de nombres de columna
@@ -53,67 +64,12 @@ def process_file(file, supabase):
                     "error": f"Faltan columnas requeridas: {missing_cols}. Columnas disponibles: {list(df.columns)}"
                 }
             
-            total_records = 0
-            errors = []
-            
-            # Procesar cada fila
-            for index, row in df.iterrows():
-                try:
-                    producto_codigo = str(row["PRODUCTO_CODIGO"]).strip()
-                    descripcion = str(row["DESCRIPCION"]).strip()
-                    stock_actual = float(row["STOCK_ACTUAL"])
-                    stock_minimo = float(row["STOCK_MINIMO"])
-                    ubicacion = str(row["UBICACION"]).strip()
-                    
-                    # Validar datos
-                    if producto_codigo in ["nan", "None", ""] or descripcion in ["nan", "None", ""]:
-                        continue
-                    
-                    if pd.isna(stock_actual) or stock_actual < 0:
-                        continue
-                    
-                    if pd.isna(stock_minimo) or stock_minimo < 0:
-                        continue
-                    
-                    # Determinar estado del stock
-                    estado_stock = "CRITICO" if stock_actual <= stock_minimo else "NORMAL"
-                    if stock_actual <= (stock_minimo * 1.2):
-                        estado_stock = "BAJO"
-                    
-                    # Crear registro
-                    record = {
-                        "producto_codigo": producto_codigo,
-                        "descripcion": descripcion,
-                        "stock_actual": stock_actual,
-                        "stock_minimo": stock_minimo,
-                        "ubicacion": ubicacion,
-                        "estado_stock": estado_stock,
-                        "fecha_actualizacion": datetime.now().isoformat()
-                    }
-                    
-                    # Insertar o actualizar en Supabase
-                    # Primero intentar actualizar si existe
-                    existing = supabase.table("inventario").select("id").eq("producto_codigo", producto_codigo).execute()
-                    
-                    if existing.data:
-                        # Actualizar registro existente
-                        result = supabase.table("inventario").update(record).eq("producto_codigo", producto_codigo).execute()
-                        action = "actualizado"
-                    else:
-                        # Insertar nuevo registro
-                        result = supabase.table("inventario").insert(record).execute()
-                        action = "insertado"
-                    
-                    if not hasattr(result, 'error') or not result.error:
-                        total_records += 1
-                        print(f"✅ Producto {action}: {producto_codigo} - Stock: {stock_actual} ({estado_stock})")
-                    else:
-                        errors.append(f"Error en fila {index + 1}: {result.error.message}")
-                        
-                except Exception as e:
-                    errors.append(f"Error procesando fila {index + 1}: {str(e)}")
-                    continue
-            
+            mode = (mode or INVENTARIO_MODE).lower()
+            if mode == 'bulk':
+                total_records, errors = process_bulk(df, supabase, chunk_size or INVENTARIO_CHUNK_SIZE)
+            else:
+                total_records, errors = process_rows(df, supabase)
+
             print(f"🎉 Procesamiento de inventario completado: {total_records} registros procesados")
             
             return {
@@ -122,11 +78,6 @@ def process_file(file, supabase):
                 "errors": errors,
                 "message": f"Procesamiento de inventario completado exitosamente. {total_records} registros procesados."
             }
-            
-        finally:
-            # Limpiar archivo temporal
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
         
     except Exception as e:
         error_msg = f"Error general en el procesamiento de inventario: {str(e)}"
@@ -136,4 +87,183 @@ def process_file(file, supabase):
             "success": False,
             "error": error_msg,
             "records_processed": 0
-        }
\ No newline at end of file
+        }
+
+
+def process_rows(df, supabase):
+    """
+    Modo fila por fila: consulta y luego actualiza o inserta cada producto
+
+    Returns:
+        tuple: (registros procesados, lista de errores)
+    """
+    total_records = 0
+    errors = []
+
+    # Procesar cada fila
+    for index, row in df.iterrows():
+        try:
+            producto_codigo = str(row["PRODUCTO_CODIGO"]).strip()
+            descripcion = str(row["DESCRIPCION"]).strip()
+            stock_actual = float(row["STOCK_ACTUAL"])
+            stock_minimo = float(row["STOCK_MINIMO"])
+            ubicacion = str(row["UBICACION"]).strip()
+
+            # Validar datos
+            if producto_codigo in ["nan", "None", ""] or descripcion in ["nan", "None", ""]:
+                continue
+
+            if pd.isna(stock_actual) or stock_actual < 0:
+                continue
+
+            if pd.isna(stock_minimo) or stock_minimo < 0:
+                continue
+
+            # Determinar estado del stock
+            estado_stock = "CRITICO" if stock_actual <= stock_minimo else "NORMAL"
+            if stock_actual <= (stock_minimo * 1.2):
+                estado_stock = "BAJO"
+
+            # Crear registro
+            record = {
+                "producto_codigo": producto_codigo,
+                "descripcion": descripcion,
+                "stock_actual": stock_actual,
+                "stock_minimo": stock_minimo,
+                "ubicacion": ubicacion,
+                "estado_stock": estado_stock,
+                "fecha_actualizacion": datetime.now().isoformat()
+            }
+
+            # Insertar o actualizar en Supabase
+            # Primero intentar actualizar si existe
+            existing = supabase.table("inventario").select("id").eq("producto_codigo", producto_codigo).execute()
+
+            if existing.data:
+                # Actualizar registro existente
+                result = supabase.table("inventario").update(record).eq("producto_codigo", producto_codigo).execute()
+                action = "actualizado"
+            else:
+                # Insertar nuevo registro
+                result = supabase.table("inventario").insert(record).execute()
+                action = "insertado"
+
+            if not hasattr(result, 'error') or not result.error:
+                total_records += 1
+                print(f"✅ Producto {action}: {producto_codigo} - Stock: {stock_actual} ({estado_stock})")
+            else:
+                errors.append(f"Error en fila {index + 1}: {result.error.message}")
+
+        except Exception as e:
+            errors.append(f"Error procesando fila {index + 1}: {str(e)}")
+            continue
+
+    return total_records, errors
+
+
+def process_bulk(df, supabase, chunk_size):
+    """
+    Modo por lotes: valida todas las filas por columna y escribe con upserts
+    (on_conflict producto_codigo) de ``chunk_size`` productos
+
+    Por cada lote se hace una consulta de los códigos existentes (solo para
+    informar insertados/actualizados) y un upsert, en vez de dos llamadas por
+    fila. La consulta va por lote y no una sola con todos los códigos: el
+    filtro ``in_`` viaja en la URL y con miles de códigos no cabe. Si un código se repite en el archivo gana la última fila, igual que
+    en el modo fila por fila.
+
+    Returns:
+        tuple: (registros procesados, lista de errores)
+    """
+    errors = []
+
+    producto_codigo = _text(df["PRODUCTO_CODIGO"])
+    descripcion = _text(df["DESCRIPCION"])
+    ubicacion = _text(df["UBICACION"])
+    stock_actual, error_actual = _floats(df["STOCK_ACTUAL"])
+    stock_minimo, error_minimo = _floats(df["STOCK_MINIMO"])
+
+    # Filas en las que float() falla: mismo mensaje que el modo fila por fila
+    error_fila = error_actual.fillna(error_minimo)
+    for index, message in error_fila.dropna().items():
+        errors.append(f"Error procesando fila {index + 1}: {message}")
+
+    keep = (error_fila.isna()
+            & ~producto_codigo.isin(["nan", "None", ""]) & ~descripcion.isin(["nan", "None", ""])
+            & (stock_actual >= 0) & (stock_minimo >= 0))
+
+    # Determinar estado del stock
+    estado_stock = np.where(stock_actual <= stock_minimo * 1.2, "BAJO",
+                            np.where(stock_actual <= stock_minimo, "CRITICO", "NORMAL"))
+
+    records = pd.DataFrame({
+        "producto_codigo": producto_codigo,
+        "descripcion": descripcion,
+        "stock_actual": stock_actual,
+        "stock_minimo": stock_minimo,
+        "ubicacion": ubicacion,
+        "estado_stock": estado_stock,
+        "fecha_actualizacion": datetime.now().isoformat()
+    })[keep]
+
+    # Un upsert no puede tocar dos veces el mismo código: queda la última fila
+    filas_por_codigo = records["producto_codigo"].value_counts()
+    records = records.drop_duplicates("producto_codigo", keep="last")
+    print(f"📦 {len(records)} productos válidos ({int(filas_por_codigo.sum())} filas), "
+          f"lotes de {chunk_size}")
+
+    total_records = 0
+    for number, start in enumerate(range(0, len(records), chunk_size), start=1):
+        chunk = records.iloc[start:start + chunk_size]
+        codigos = chunk["producto_codigo"].tolist()
+        try:
+            existing = supabase.table("inventario").select("producto_codigo").in_("producto_codigo", codigos).execute()
+            existentes = {fila["producto_codigo"] for fila in existing.data or []}
+
+            result = supabase.table("inventario").upsert(
+                chunk.to_dict("records"), on_conflict="producto_codigo").execute()
+        except Exception as e:
+            errors.append(f"Error en lote {number} ({len(chunk)} productos): {str(e)}")
+            continue
+
+        if not hasattr(result, 'error') or not result.error:
+            total_records += int(filas_por_codigo[codigos].sum())
+            actualizados = sum(codigo in existentes for codigo in codigos)
+            print(f"✅ Lote {number}: {len(chunk) - actualizados} insertados, {actualizados} actualizados")
+        else:
+            errors.append(f"Error en lote {number} ({len(chunk)} productos): {result.error.message}")
+
+    return total_records, errors
+
+
+def _text(series):
+    """``str(val).strip()`` por celda, incluidas las vacías ("nan")"""
+    text = clean_text(series, None)
+    missing = text.isna()
+    if missing.any():
+        # Las celdas vacías llegan como NaN desde read_excel
+        text[missing] = series[missing].map(lambda value: "nan" if value is None else str(value).strip())
+    return text
+
+
+def _float_error(value):
+    try:
+        float(value)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+def _floats(series):
+    """
+    ``float(val)`` por celda
+
+    Returns:
+        tuple: (Serie de floats, Serie con el mensaje de error de float() o None)
+    """
+    numbers = to_float(series, np.nan)
+    failed = pd.Series(None, index=series.index, dtype=object)
+    candidates = numbers.isna() & series.map(lambda value: not (value is None or isinstance(value, float))).astype(bool)
+    if candidates.any():
+        failed[candidates] = map_unique(series[candidates], _float_error)
+    return numbers, failed
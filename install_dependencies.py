@@ -39,7 +39,8 @@ def main():
         'pandas': 'pandas>=2.2.0',
         'openpyxl': 'openpyxl>=3.1.0',
         'xlrd': 'xlrd>=2.0.1',
-        'dotenv': 'python-dotenv>=1.0.0'
+        'dotenv': 'python-dotenv>=1.0.0',
+        'pyarrow': 'pyarrow>=14.0.0'
     }
     
     packages_to_install = []
@@ -0,0 +1,123 @@
+"""
+Caché de módulos de procesadores
+
+Carga cada script de ``functions/`` una sola vez por proceso y lo reutiliza
+entre requests. La entrada se invalida cuando cambia el mtime del archivo,
+de modo que editar un procesador no requiere reiniciar la API.
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+import threading
+import time
+
+
+class ModuleCache:
+    """
+    Caché de módulos thread-safe indexada por ruta resuelta + mtime
+
+    Cada archivo se registra con un nombre de módulo único derivado de su
+    ruta, así dos procesadores nunca comparten la entrada ``sys.modules``
+    aunque se carguen en paralelo desde distintos threads de gunicorn.
+    """
+
+    def __init__(self):
+        self._entries = {}  # ruta resuelta -> (mtime_ns, módulo)
+        self._locks = {}  # ruta resuelta -> lock de carga
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.load_time_total = 0.0
+        self.last_load_time = 0.0
+
+    @staticmethod
+    def module_name_for(path):
+        """Nombre de módulo único y estable para una ruta resuelta"""
+        digest = hashlib.sha1(path.encode('utf-8')).hexdigest()[:12]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        return f"user_function_{stem}_{digest}"
+
+    def _path_lock(self, path):
+        with self._lock:
+            lock = self._locks.get(path)
+            if lock is None:
+                lock = self._locks[path] = threading.Lock()
+            return lock
+
+    def get(self, function_file):
+        """
+        Devuelve el módulo cargado para ``function_file``
+
+        Args:
+            function_file: Ruta (relativa o absoluta) del script del procesador
+
+        Returns:
+            module: Módulo ya ejecutado, reutilizado mientras el archivo no cambie
+        """
+        path = os.path.realpath(function_file)
+        mtime_ns = os.stat(path).st_mtime_ns
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == mtime_ns:
+            with self._lock:
+                self.hits += 1
+            return entry[1]
+
+        # Un lock por archivo: dos threads que piden el mismo procesador frío
+        # esperan una sola carga; archivos distintos cargan en paralelo
+        with self._path_lock(path):
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == mtime_ns:
+                with self._lock:
+                    self.hits += 1
+                return entry[1]
+
+            module = self._load(path)
+            with self._lock:
+                self.misses += 1
+                if entry is not None:
+                    self.reloads += 1
+                    print(f"🔄 Procesador modificado, recargado: {path}")
+            self._entries[path] = (mtime_ns, module)
+            return module
+
+    def _load(self, path):
+        module_name = self.module_name_for(path)
+        start = time.perf_counter()
+
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except Exception:
+            sys.modules.pop(module_name, None)
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.load_time_total += elapsed
+            self.last_load_time = elapsed
+        print(f"📦 Procesador cargado: {path} ({elapsed * 1000:.1f} ms)")
+        return module
+
+    def stats(self):
+        """Métricas de la caché para el endpoint /metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "modules_cached": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "load_time_total_ms": round(self.load_time_total * 1000, 3),
+                "last_load_time_ms": round(self.last_load_time * 1000, 3),
+            }
+
+
+# Instancia compartida por todo el proceso
+module_cache = ModuleCache()
@@ -0,0 +1,31 @@
+"""
+Pipeline compartido de ingesta de planillas
+
+Los procesadores de ``functions/`` heredan de ``Processor`` y solo declaran
+su tabla destino, sus reglas de columnas y sus transformaciones.
+"""
+
+from pipeline.artifacts import find_artifact, sweep_artifacts
+from pipeline.core import Processor, SheetContext, cell
+from pipeline.emitters import Column, TableSpec
+from pipeline.headers import HeaderMatcher, Rule, find_column, match_columns, normalize_header, scan_header_row
+from pipeline.uploads import maybe_sweep_temp_files, open_upload, sweep_temp_files
+
+__all__ = [
+    "Column",
+    "HeaderMatcher",
+    "Processor",
+    "Rule",
+    "SheetContext",
+    "TableSpec",
+    "cell",
+    "find_artifact",
+    "find_column",
+    "match_columns",
+    "maybe_sweep_temp_files",
+    "normalize_header",
+    "open_upload",
+    "scan_header_row",
+    "sweep_artifacts",
+    "sweep_temp_files",
+]
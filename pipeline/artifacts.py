@@ -0,0 +1,149 @@
+"""
+Archivos de salida para descarga (Arrow IPC / Parquet)
+
+Los formatos binarios no viajan dentro del JSON: cada tabla se escribe en
+``ARTIFACT_DIR`` con un id aleatorio y la respuesta incluye la URL
+``/artifacts/<id>`` para descargarla. El directorio es compartido por los
+workers de gunicorn, así que cualquiera puede servir la descarga. Los
+archivos con más de ``ARTIFACT_MAX_AGE`` segundos se eliminan en el mismo
+barrido que los temporales de carga.
+"""
+
+import os
+import re
+import tempfile
+import time
+import uuid
+
+ARTIFACT_DIR = os.getenv('ARTIFACT_DIR') or os.path.join(tempfile.gettempdir(), "balance_artifacts")
+
+# Antigüedad (segundos) desde la que un archivo ya no se puede descargar
+ARTIFACT_MAX_AGE = int(os.getenv('ARTIFACT_MAX_AGE', '3600'))
+
+# Formato -> (extensión, mimetype)
+ARTIFACT_FORMATS = {
+    'arrow': ('.arrow', 'application/vnd.apache.arrow.stream'),
+    'parquet': ('.parquet', 'application/vnd.apache.parquet'),
+}
+
+_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def arrow_available():
+    """Indica si pyarrow está instalado (dependencia opcional)"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def write_artifact(table, output_format, name):
+    """
+    Escribe una tabla de pyarrow como Arrow IPC (stream) o Parquet
+
+    Args:
+        table: ``pyarrow.Table``
+        output_format: 'arrow' o 'parquet'
+        name: Nombre de la tabla destino (se usa en el nombre de descarga)
+
+    Returns:
+        dict: Metadatos del archivo (id, URL de descarga, tamaño, registros)
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    extension, mimetype = ARTIFACT_FORMATS[output_format]
+    artifact_id = uuid.uuid4().hex
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    path = os.path.join(ARTIFACT_DIR, f"{artifact_id}-{name}{extension}")
+
+    # Se escribe con otro nombre y se renombra, para no servir archivos a medias
+    partial = path + ".part"
+    if output_format == 'parquet':
+        pq.write_table(table, partial)
+    else:
+        with pa.OSFile(partial, 'wb') as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(partial, path)
+
+    return {
+        "table": name,
+        "format": output_format,
+        "records": table.num_rows,
+        "artifact_id": artifact_id,
+        "url": f"/artifacts/{artifact_id}",
+        "filename": f"{name}{extension}",
+        "content_type": mimetype,
+        "size": os.path.getsize(path),
+    }
+
+
+def find_artifact(artifact_id):
+    """
+    Ubica un archivo generado
+
+    Returns:
+        tuple: (ruta, nombre de descarga, mimetype), o None si no existe o expiró
+    """
+    if not _ID_PATTERN.match(artifact_id or ""):
+        return None
+
+    prefix = f"{artifact_id}-"
+    try:
+        names = [n for n in os.listdir(ARTIFACT_DIR) if n.startswith(prefix) and not n.endswith(".part")]
+    except OSError:
+        return None
+    if not names:
+        return None
+
+    path = os.path.join(ARTIFACT_DIR, names[0])
+    try:
+        if time.time() - os.path.getmtime(path) >= ARTIFACT_MAX_AGE:
+            return None
+    except OSError:
+        return None
+
+    download_name = names[0][len(prefix):]
+    for extension, mimetype in ARTIFACT_FORMATS.values():
+        if download_name.endswith(extension):
+            return path, download_name, mimetype
+    return None
+
+
+def sweep_artifacts(max_age=None, now=None):
+    """
+    Elimina archivos generados que ya expiraron
+
+    Args:
+        max_age: Antigüedad mínima en segundos (por defecto ARTIFACT_MAX_AGE)
+        now: Marca de tiempo de referencia (por defecto time.time())
+
+    Returns:
+        int: Cantidad de archivos eliminados
+    """
+    max_age = ARTIFACT_MAX_AGE if max_age is None else max_age
+    now = time.time() if now is None else now
+
+    removed = 0
+    try:
+        entries = os.scandir(ARTIFACT_DIR)
+    except OSError:
+        # El directorio se crea con el primer archivo
+        return 0
+
+    with entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if now - entry.stat(follow_symlinks=False).st_mtime < max_age:
+                    continue
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                continue
+
+    if removed:
+        print(f"🧹 Archivos de descarga expirados eliminados: {removed}")
+    return removed
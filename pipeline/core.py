@@ -0,0 +1,873 @@
+"""
+Orquestación del pipeline de ingesta
+
+Un procesador declara su tabla destino, cómo encontrar sus columnas y cómo
+transformar las filas; ``Processor.run`` se encarga del resto:
+
+    lectura del libro -> resolución de encabezados -> transformación -> emisión SQL
+"""
+
+import os
+import time
+
+import pandas as pd
+
+from pipeline.artifacts import ARTIFACT_FORMATS, arrow_available, write_artifact
+from pipeline.emitters import SQL_BATCH_SIZE
+from pipeline.layouts import header_cells, layout_cache
+from pipeline.parallel import sheet_executor, sheet_payload
+from pipeline.progress import FINAL_EVENT
+from pipeline.readers import open_workbook, read_sheet_data
+from pipeline.uploads import open_upload
+
+
+# Elementos (sentencias o bloques) por línea en el modo streaming
+STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', '1000'))
+
+# Clave de la respuesta en la que va la salida de cada formato
+OUTPUT_KEYS = {
+    'sql': 'insert_statements',
+    'sql_batch': 'insert_statements',
+    'copy': 'copy',
+    'columnar': 'columnar',
+    'arrow': 'artifacts',
+    'parquet': 'artifacts',
+}
+
+
+def cell(row, idx, default=None):
+    """Valor de la columna ``idx`` de una fila leída sin encabezado"""
+    return row[idx] if idx < len(row) else default
+
+
+class SheetContext:
+    """Estado del procesamiento de una hoja"""
+
+    def __init__(self, name, user_id, errors, progress=None):
+        self.name = name
+        self.user_id = user_id
+        self.errors = errors
+        self.progress = progress
+        self.skipped = 0
+        self.rejected = {}
+        self.rows = 0
+        self.reads = 0
+        self.columns_skipped = 0
+        self.timings = {}
+
+    def report(self, event, **data):
+        """Publica un evento de progreso de la hoja (no hace nada si nadie lo pidió)"""
+        if self.progress is not None:
+            self.progress(event, sheet=self.name, **data)
+
+    def error(self, message):
+        """Registra un error visible en la respuesta"""
+        self.errors.append(message)
+        print(f"❌ {message}")
+
+    def state(self):
+        """Resultado de la hoja para enviarlo desde otro proceso (ver ``restore``)"""
+        return {
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "rejected": self.rejected,
+            "rows": self.rows,
+            "reads": self.reads,
+            "columns_skipped": self.columns_skipped,
+            "timings": self.timings,
+        }
+
+    def restore(self, state):
+        """Incorpora el resultado de la hoja procesada en otro proceso"""
+        self.errors.extend(state["errors"])
+        self.skipped = state["skipped"]
+        self.rejected = state["rejected"]
+        self.rows = state["rows"]
+        self.reads = state["reads"]
+        self.columns_skipped = state["columns_skipped"]
+        self.timings = state["timings"]
+
+
+def _mapped_columns(mapping):
+    """Columnas (nombres o índices) que aparecen en un mapping de columnas"""
+    if isinstance(mapping, dict):
+        mapping = mapping.values()
+    if isinstance(mapping, (list, tuple, set, frozenset, type({}.values()))):
+        columns = set()
+        for value in mapping:
+            columns |= _mapped_columns(value)
+        return columns
+    if mapping is None:
+        return set()
+    return {mapping}
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+def _process_sheet_remote(module_path, workbook_path, sheet_name, user_id):
+    """
+    Tarea de ``pipeline.parallel``: abre el libro y procesa una sola hoja
+
+    Returns:
+        tuple: (DataFrame de registros o None si se omitió, ``SheetContext.state()``)
+    """
+    from module_cache import module_cache
+
+    processor = module_cache.get(module_path).PROCESSOR
+    workbook = open_workbook(workbook_path, processor.engine, processor.engine_fallback, processor.reader)
+    sheet = SheetContext(sheet_name, user_id, [])
+    records = processor.process_sheet(workbook, sheet)
+    return records, sheet.state()
+
+
+class Processor:
+    """
+    Base de los procesadores de planillas Excel
+
+    Atributos de configuración:
+        name: Sufijo de los mensajes de error ("de recepciones", ...)
+        table: ``TableSpec`` de la tabla destino
+        header_mode: 'columns' si el encabezado está en la primera fila,
+            'scan' si hay que buscarlo entre las primeras ``scan_rows`` filas
+        engine / engine_fallback: Engine de lectura y si se reintenta con
+            detección automática cuando falla
+        reader: Modo de lectura, 'pandas' o 'chunks' (por defecto EXCEL_READER,
+            ver ``pipeline.readers``)
+        report_row_errors: Si los errores por fila se agregan a ``errors``
+        success_message: Mensaje final; recibe ``records`` y ``sheets``
+
+    Formatos de salida (``output_formats``):
+        'sql': un INSERT por registro (formato histórico)
+        'sql_batch': INSERT de varias filas, de a ``batch_size`` registros
+        'copy': CSV con encabezado para ``COPY ... FROM STDIN`` (clave ``copy``)
+        'columnar': nombres de columna + una lista de valores por columna (clave ``columnar``)
+        'arrow' / 'parquet': archivo Arrow IPC o Parquet por tabla, para descargar
+            desde ``/artifacts/<id>`` (clave ``artifacts``; requiere pyarrow)
+
+    ``stream`` admite los formatos de ``stream_formats`` (los que no generan archivos).
+    """
+
+    name = None
+    table = None
+    header_mode = 'columns'
+    scan_rows = 20
+    engine = None
+    engine_fallback = False
+    reader = None
+    report_row_errors = False
+    success_message = "¡Procesamiento completado! {records} registros procesados de {sheets} hojas."
+    output_formats = ('sql', 'sql_batch', 'copy', 'columnar', 'arrow', 'parquet')
+    stream_formats = ('sql', 'sql_batch', 'copy', 'columnar')
+
+    # ————————————————
+    # Puntos de extensión
+    # ————————————————
+
+    def resolve_columns(self, columns, sheet):
+        """
+        Modo 'columns': mapea campo -> nombre de columna
+
+        Returns:
+            dict: Mapeo de columnas, o None para omitir la hoja
+        """
+        raise NotImplementedError
+
+    def scan_header(self, head, sheet):
+        """
+        Modo 'scan': ubica la fila de encabezado en las primeras filas
+
+        Returns:
+            tuple: (fila de encabezado, dict campo -> índice), o None para omitir la hoja
+        """
+        raise NotImplementedError
+
+    def transform_row(self, row, index, mapping, sheet):
+        """Convierte una fila en un registro (dict), o None para saltarla"""
+        raise NotImplementedError
+
+    def transform(self, df, mapping, sheet):
+        """
+        Convierte la hoja en un DataFrame de registros de ``table``
+
+        Por defecto aplica ``transform_row`` fila por fila; los procesadores
+        pueden reemplazarlo por operaciones sobre columnas completas.
+        """
+        records = []
+        for index, row in df.iterrows():
+            try:
+                record = self.transform_row(row, index, mapping, sheet)
+            except Exception as row_error:
+                print(f"❌ Error procesando fila {index}: {row_error}")
+                if self.report_row_errors:
+                    sheet.errors.append(f"Error en fila {index}: {str(row_error)}")
+                sheet.skipped += 1
+                continue
+            if record is None:
+                sheet.skipped += 1
+                continue
+            records.append(record)
+
+        if not records:
+            return self.table.empty_frame()
+        return pd.DataFrame.from_records(records, columns=self.table.column_names)
+
+    def collect(self, sheet, keep, values):
+        """
+        Arma el DataFrame de registros de una transformación vectorizada
+
+        Args:
+            sheet: ``SheetContext`` de la hoja
+            keep: Máscara booleana de las filas que generan registro
+            values: Dict campo -> Serie alineada con la hoja o valor fijo
+
+        Returns:
+            pd.DataFrame: Registros con las columnas de ``table``, en orden
+        """
+        keep = keep.fillna(False).astype(bool)
+        sheet.skipped += int((~keep).sum())
+        frame = pd.DataFrame({name: values[name] for name in self.table.column_names}, index=keep.index)
+        return frame[keep.to_numpy()].reset_index(drop=True)
+
+    def reject(self, sheet, codes, reasons):
+        """
+        Registra por qué se descartaron filas en una transformación vectorizada
+
+        Args:
+            sheet: ``SheetContext`` de la hoja
+            codes: Código de descarte de cada fila (``rejection_codes``), 0 si se acepta
+            reasons: Dict código -> descripción del motivo
+
+        Returns:
+            pd.Series: Máscara de las filas aceptadas, para ``collect``
+        """
+        counts = codes[codes != 0].value_counts().sort_index()
+        for code, count in counts.items():
+            reason = reasons[code]
+            sheet.rejected[reason] = sheet.rejected.get(reason, 0) + int(count)
+        return codes == 0
+
+    def report_errors(self, sheet, messages):
+        """
+        Registra los errores por fila de una transformación vectorizada
+
+        Args:
+            sheet: ``SheetContext`` de la hoja
+            messages: Serie índice de fila -> mensaje, solo con las filas que fallaron
+        """
+        for index, message in messages.items():
+            print(f"❌ Error procesando fila {index}: {message}")
+            if self.report_row_errors:
+                sheet.errors.append(f"Error en fila {index}: {message}")
+
+    # ————————————————
+    # Etapas
+    # ————————————————
+
+    def read_sheet(self, workbook, sheet):
+        """
+        Lee la hoja y resuelve su encabezado; devuelve (df, mapping) o None
+
+        Primero se resuelve el encabezado (la primera fila en modo 'columns',
+        las primeras ``scan_rows`` en modo 'scan'): si la hoja no califica se
+        omite sin leer sus filas, y si califica se leen solo las columnas que
+        usa el procesador (``used_columns``).
+
+        En modo 'scan' la hoja se lee una sola vez: el encabezado se busca en
+        las primeras filas de esa lectura y el resto se arma con las mismas
+        filas. ``sheet.reads`` cuenta las lecturas de la hoja.
+        """
+        if self.header_mode == 'scan':
+            data = read_sheet_data(workbook, sheet.name)
+            sheet.reads += 1
+            if data is None:
+                head = workbook.parse(sheet.name, nrows=self.scan_rows, header=None)
+            else:
+                head = data.parse(header=None, nrows=self.scan_rows)
+            found = self.find_header(head, sheet)
+            if found is None:
+                print(f"⚠️ No se detectó cabecera en hoja «{sheet.name}»")
+                return None
+            header_row_idx, mapping = found
+            usecols = self.select_columns(list(head.columns), mapping, sheet)
+            if data is None:
+                # Engines distintos de openpyxl (.xls): se vuelve a leer el archivo
+                df = workbook.parse(sheet.name, skiprows=header_row_idx + 1, header=None, usecols=usecols)
+                sheet.reads += 1
+            else:
+                df = data.parse(header=None, skiprows=header_row_idx + 1, usecols=usecols)
+            print(f"✅ Hoja {sheet.name}: Header en fila {header_row_idx + 1}. Procesando {len(df)} filas.")
+            return df, mapping
+
+        header = self.read_header(workbook, sheet)
+        if header is None:
+            return None
+        if header:
+            columns, mapping = header
+            usecols = self.select_columns(columns, mapping, sheet)
+            df = workbook.parse(sheet.name, usecols=usecols)
+            sheet.reads += 1
+            print(f"📊 Procesando hoja: {sheet.name} con {len(df)} filas")
+            df.columns = df.columns.astype(str).str.strip()
+            return df, mapping
+
+        # Sin fila de encabezado: se lee la hoja completa para ver sus columnas
+        df = workbook.parse(sheet.name)
+        sheet.reads += 1
+        print(f"📊 Procesando hoja: {sheet.name} con {len(df)} filas")
+
+        # Limpieza de nombres de columna (quita espacios al inicio/fin)
+        df.columns = df.columns.astype(str).str.strip()
+        print(f"📋 Columnas encontradas: {list(df.columns)}")
+
+        mapping = self.resolve_layout(list(df.columns), sheet)
+        if mapping is None:
+            return None
+        return df, mapping
+
+    def read_header(self, workbook, sheet):
+        """
+        Modo 'columns': lee solo la fila de encabezado y resuelve las columnas
+
+        Returns:
+            tuple: (columnas, mapping); () si la primera fila está vacía (hay
+                que leer la hoja completa), o None para omitir la hoja
+        """
+        header = workbook.parse(sheet.name, nrows=0)
+        if not len(header.columns):
+            return ()
+
+        # Limpieza de nombres de columna (quita espacios al inicio/fin)
+        columns = list(header.columns.astype(str).str.strip())
+        print(f"📋 Columnas encontradas: {columns}")
+
+        mapping = self.resolve_layout(columns, sheet)
+        if mapping is None:
+            print(f"⏭️ Hoja {sheet.name} omitida sin leer sus filas")
+            return None
+        return columns, mapping
+
+    def resolve_layout(self, columns, sheet):
+        """
+        ``resolve_columns`` con la caché de formatos (``pipeline.layouts``):
+        si el tenant ya subió una hoja con exactamente estas columnas, se
+        reutiliza su mapping
+        """
+        if not layout_cache.enabled:
+            return self.resolve_columns(columns, sheet)
+        fingerprint = tuple(columns)
+        cached = layout_cache.get(sheet.user_id, self, [fingerprint])
+        if cached is not None:
+            print(f"🗂️ Hoja {sheet.name}: formato conocido, se reutiliza su mapeo de columnas")
+            return cached[1]
+        mapping = self.resolve_columns(columns, sheet)
+        if mapping is not None:
+            layout_cache.put(sheet.user_id, self, fingerprint, None, mapping)
+        return mapping
+
+    def find_header(self, head, sheet):
+        """
+        ``scan_header`` con la caché de formatos (``pipeline.layouts``): si las
+        filas hasta un encabezado ya conocido coinciden, no se vuelve a buscar
+        """
+        if not layout_cache.enabled:
+            return self.scan_header(head, sheet)
+        known = [row for row in layout_cache.header_rows(sheet.user_id, self) if row < len(head)]
+        rows = [header_cells(row) for row in head.head(known[-1] + 1).itertuples(index=False)] if known else []
+        cached = layout_cache.get(sheet.user_id, self, [tuple(rows[:row + 1]) for row in known])
+        if cached is not None:
+            print(f"🗂️ Hoja {sheet.name}: formato conocido, encabezado en fila {cached[0] + 1}")
+            return cached
+
+        found = self.scan_header(head, sheet)
+        if found is not None:
+            header_row_idx, mapping = found
+            fingerprint = tuple(header_cells(row) for row in head.head(header_row_idx + 1).itertuples(index=False))
+            layout_cache.put(sheet.user_id, self, fingerprint, header_row_idx, mapping)
+        return found
+
+    def used_columns(self, mapping):
+        """
+        Columnas que lee ``transform``: por defecto, las que aparecen en el
+        mapping. Un procesador que use otras columnas puede devolver None
+        para leerlas todas.
+        """
+        return _mapped_columns(mapping)
+
+    def select_columns(self, columns, mapping, sheet):
+        """
+        Posiciones de las columnas a leer (``usecols``)
+
+        Args:
+            columns: Columnas del encabezado (nombres sin espacios, o índices en modo 'scan')
+            mapping: Mapping resuelto de la hoja
+            sheet: ``SheetContext``; registra en ``columns_skipped`` las que no se leen
+
+        Returns:
+            list: Posiciones a leer, o None para leer todas
+        """
+        used = self.used_columns(mapping)
+        if used is None:
+            return None
+        usecols = [position for position, name in enumerate(columns) if name in used]
+        if not usecols or len(usecols) == len(columns):
+            return None
+        sheet.columns_skipped = len(columns) - len(usecols)
+        print(f"✂️ Hoja {sheet.name}: se leen {len(usecols)} de {len(columns)} columnas")
+        return usecols
+
+    def read_sheet_chunks(self, workbook, sheet):
+        """
+        Como ``read_sheet``, pero con un libro en modo 'chunks'
+
+        Returns:
+            tuple: (``SheetChunks``, iterador de sus partes, mapping) o None
+        """
+        if self.header_mode == 'scan':
+            sheet.reads += 1
+            head, rows = workbook.parse_head(sheet.name, self.scan_rows)
+            found = self.find_header(head, sheet)
+            if found is None:
+                print(f"⚠️ No se detectó cabecera en hoja «{sheet.name}»")
+                return None
+            header_row_idx, mapping = found
+            usecols = self.select_columns(list(head.columns), mapping, sheet)
+            chunks = workbook.iter_chunks(sheet.name, header=None, skiprows=header_row_idx + 1, rows=rows,
+                                          usecols=usecols)
+            print(f"✅ Hoja {sheet.name}: Header en fila {header_row_idx + 1}. Procesando por partes.")
+            return chunks, iter(chunks), mapping
+
+        header = self.read_header(workbook, sheet)
+        if header is None:
+            return None
+        sheet.reads += 1
+        if header:
+            columns, mapping = header
+            chunks = workbook.iter_chunks(sheet.name, header=0,
+                                          usecols=self.select_columns(columns, mapping, sheet))
+            print(f"📊 Procesando hoja: {sheet.name} por partes de {workbook.chunk_rows} filas")
+            return chunks, iter(chunks), mapping
+
+        chunks = workbook.iter_chunks(sheet.name, header=0)
+        parts = iter(chunks)
+        first = next(parts)
+        print(f"📊 Procesando hoja: {sheet.name} por partes de {workbook.chunk_rows} filas")
+
+        first.columns = first.columns.astype(str).str.strip()
+        print(f"📋 Columnas encontradas: {list(first.columns)}")
+
+        mapping = self.resolve_layout(list(first.columns), sheet)
+        if mapping is None:
+            return None
+        return chunks, _prepend(first, parts), mapping
+
+    def transform_chunks(self, workbook, sheet):
+        """
+        Lee y transforma la hoja parte por parte
+
+        Returns:
+            tuple: (registros o None si se omitió, si el resultado equivale a
+                leer la hoja completa)
+        """
+        started = time.perf_counter()
+        read = self.read_sheet_chunks(workbook, sheet)
+        if read is None:
+            sheet.timings['read'] = time.perf_counter() - started
+            return None, True
+        chunks, parts, mapping = read
+
+        errors_before = len(sheet.errors)
+        frames, transform_time = self._transform_parts(parts, mapping, sheet)
+        mismatched = self._mismatched(chunks, mapping)
+        if mismatched:
+            # Alguna parte infirió otro tipo de columna que la hoja completa: se
+            # descarta lo hecho y se vuelve a leer por partes con el tipo de la hoja
+            chunks = chunks.normalized(mismatched)
+            if chunks is None:
+                return None, False
+            print(f"🔁 Tipos de columna distintos entre partes de la hoja {sheet.name}; "
+                  f"se vuelve a leer con los tipos de la hoja completa")
+            frames = None
+            del sheet.errors[errors_before:]
+            sheet.skipped = 0
+            sheet.rejected = {}
+            sheet.reads += 1
+            frames, more_time = self._transform_parts(iter(chunks), mapping, sheet)
+            transform_time += more_time
+            if self._mismatched(chunks, mapping):
+                return None, False
+
+        sheet.timings['read'] = time.perf_counter() - started - transform_time
+        sheet.timings['transform'] = transform_time
+        sheet.rows = chunks.rows
+
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return self.table.empty_frame(), True
+        return (frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)), True
+
+    def _transform_parts(self, parts, mapping, sheet):
+        """Transforma las partes de una hoja; devuelve los registros de cada una y el tiempo usado"""
+        frames = []
+        transform_time = 0.0
+        for df in parts:
+            if self.header_mode != 'scan':
+                df.columns = df.columns.astype(str).str.strip()
+            transform_started = time.perf_counter()
+            frames.append(self.transform(df, mapping, sheet))
+            transform_time += time.perf_counter() - transform_started
+        return frames, transform_time
+
+    def _mismatched(self, chunks, mapping):
+        """Columnas que usa el procesador sin el tipo que tendrían en la hoja completa"""
+        used = _mapped_columns(mapping)
+        if self.header_mode == 'scan':
+            return {name for name in chunks.mismatched if name in used}
+        return {name for name in chunks.mismatched if str(name).strip() in used}
+
+    def process_sheet(self, workbook, sheet):
+        """Procesa una hoja completa; devuelve sus registros o None si se omitió"""
+        if getattr(workbook, 'chunked', False):
+            errors_before = len(sheet.errors)
+            records, consistent = self.transform_chunks(workbook, sheet)
+            if consistent:
+                if records is not None:
+                    print(f"✅ Hoja {sheet.name} procesada: {len(records)} registros "
+                          f"({sheet.skipped} filas omitidas, {sheet.reads} lectura(s) de la hoja)")
+                    if sheet.rejected:
+                        print(f"🚫 Filas omitidas por motivo: {sheet.rejected}")
+                return records
+
+            # Una columna sin tipo equivalente por partes (ver
+            # ``SheetChunks.normalized``): se descarta lo hecho y se lee la hoja entera
+            print(f"🔁 Tipos de columna distintos entre partes de la hoja {sheet.name}; se lee completa")
+            del sheet.errors[errors_before:]
+            sheet.skipped = 0
+            sheet.rejected = {}
+            sheet.timings = {}
+
+        started = time.perf_counter()
+        read = self.read_sheet(workbook, sheet)
+        sheet.timings['read'] = time.perf_counter() - started
+        if read is None:
+            return None
+        df, mapping = read
+        sheet.rows = len(df)
+
+        started = time.perf_counter()
+        records = self.transform(df, mapping, sheet)
+        sheet.timings['transform'] = time.perf_counter() - started
+        print(f"✅ Hoja {sheet.name} procesada: {len(records)} registros ({sheet.skipped} filas omitidas, "
+              f"{sheet.reads} lectura(s) de la hoja)")
+        if sheet.rejected:
+            print(f"🚫 Filas omitidas por motivo: {sheet.rejected}")
+        return records
+
+    def iter_sheets(self, workbook, user_id, errors, progress=None, source=None, skipped=None):
+        """
+        Procesa las hojas del libro y las entrega en su orden original
+
+        Si el libro tiene varias hojas y es grande (ver ``pipeline.parallel``),
+        las hojas se procesan a la vez en el pool de lectura; si no, una a una
+        con ``workbook``.
+
+        Args:
+            workbook: Libro abierto con ``open_workbook``
+            user_id: ID del usuario autenticado
+            errors: Lista donde se acumulan los errores visibles
+            progress: Callback ``progress(evento, **datos)`` o None
+            source: Ruta o buffer del libro, para repartir sus hojas entre procesos
+            skipped: Dict donde se suman las hojas omitidas (``sheets``) y las
+                columnas que no se leyeron (``columns``), o None
+
+        Yields:
+            tuple: (nombre de la hoja, DataFrame de registros) de cada hoja procesada
+        """
+        sheet_names = workbook.sheet_names
+        with sheet_payload(source, sheet_names, self) as payload:
+            pending = self.submit_sheets(payload, sheet_names, user_id)
+            try:
+                for position, sheet_name in enumerate(sheet_names, start=1):
+                    sheet = SheetContext(sheet_name, user_id, errors, progress)
+                    sheet.report("sheet_started", position=position, total_sheets=len(sheet_names))
+
+                    if pending is None:
+                        records = self.process_sheet(workbook, sheet)
+                    else:
+                        records, state = pending[position - 1].result()
+                        sheet.restore(state)
+
+                    stages = {stage: round(seconds, 4) for stage, seconds in sheet.timings.items()}
+                    if skipped is not None:
+                        skipped["sheets"] += records is None
+                        skipped["columns"] += sheet.columns_skipped
+                    if records is None:
+                        sheet.report("sheet_skipped", reads=sheet.reads, stages=stages)
+                        continue
+                    sheet.report("sheet_finished", rows=sheet.rows, records=len(records),
+                                 skipped=sheet.skipped, rejected=sheet.rejected, reads=sheet.reads,
+                                 stages=stages)
+                    yield sheet_name, records
+            finally:
+                # Si una hoja falló (o se cortó el streaming), las demás ya no se esperan
+                for future in pending or ():
+                    future.cancel()
+
+    def submit_sheets(self, payload, sheet_names, user_id):
+        """
+        Envía cada hoja al pool de lectura si el libro lo amerita
+
+        Args:
+            payload: Resultado de ``pipeline.parallel.sheet_payload``
+            sheet_names: Hojas del libro
+            user_id: ID del usuario autenticado
+
+        Returns:
+            list: Un future por hoja, en el orden de ``sheet_names``; None para
+                procesarlas en este proceso
+        """
+        if payload is None:
+            return None
+        module_path, workbook_path = payload
+        print(f"🧵 Procesando {len(sheet_names)} hojas en paralelo")
+        executor = sheet_executor()
+        return [executor.submit(_process_sheet_remote, module_path, workbook_path, sheet_name, user_id)
+                for sheet_name in sheet_names]
+
+    def process_file(self, file, user_id, output_format='sql', batch_size=None, progress=None):
+        """
+        Punto de entrada de la API Flask: procesa el archivo subido sin
+        copiarlo a una ruta temporal
+
+        Args:
+            file: Archivo subido desde el frontend
+            user_id: ID del usuario autenticado
+            output_format: Uno de ``output_formats``
+            batch_size: Registros por sentencia en 'sql_batch' (por defecto SQL_BATCH_SIZE)
+            progress: Callback de progreso (``pipeline.progress``) o None
+
+        Returns:
+            dict: Resultado del procesamiento con INSERT statements
+        """
+        if not file:
+            return {
+                "success": False,
+                "error": "No se proporcionó ningún archivo"
+            }
+
+        try:
+            with open_upload(file) as source:
+                return self.run(source, user_id, output_format, batch_size, progress)
+        except Exception as e:
+            if progress is not None:
+                progress(FINAL_EVENT, success=False, error=str(e))
+            return {
+                "success": False,
+                "error": f"Error general: {str(e)}",
+                "records_processed": 0
+            }
+
+    def run(self, source, user_id, output_format='sql', batch_size=None, progress=None):
+        """
+        Procesa un libro Excel completo y genera INSERT statements
+
+        Args:
+            source: Ruta del archivo Excel o buffer binario
+            user_id: ID del usuario autenticado
+            output_format: Uno de ``output_formats``
+            batch_size: Registros por sentencia en 'sql_batch' (por defecto SQL_BATCH_SIZE)
+            progress: Callback de progreso (``pipeline.progress``) o None
+
+        Returns:
+            dict: Resultado del procesamiento con INSERT statements
+        """
+        self.check_format(output_format)
+
+        errors = []
+        frames = []
+        processed_sheets = 0
+        skipped = {"sheets": 0, "columns": 0}
+        result = None
+
+        try:
+            workbook = open_workbook(source, self.engine, self.engine_fallback, self.reader)
+            sheet_names = workbook.sheet_names
+            print(f"📄 Hojas encontradas: {sheet_names}")
+            if progress is not None:
+                progress("job_started", processor=self.name, total_sheets=len(sheet_names))
+
+            for _, records in self.iter_sheets(workbook, user_id, errors, progress, source, skipped):
+                frames.append(records)
+                processed_sheets += 1
+
+            started = time.perf_counter()
+            output = self.emit(frames, output_format, batch_size)
+            total_records = sum(len(frame) for frame in frames)
+            if progress is not None:
+                progress("emit_finished", format=output_format, records=total_records,
+                         seconds=round(time.perf_counter() - started, 4))
+
+            result = {
+                "success": True,
+                "records_processed": total_records,
+                "sheets_processed": processed_sheets,
+                "total_sheets": len(sheet_names),
+                "sheets_skipped": skipped["sheets"],
+                "columns_skipped": skipped["columns"],
+                "errors": errors,
+                OUTPUT_KEYS[output_format]: output,
+                "message": self.success_message.format(records=total_records, sheets=processed_sheets)
+            }
+
+        except Exception as e:
+            label = f" de {self.name}" if self.name else ""
+            error_msg = f"Error en el procesamiento{label}: {str(e)}"
+            print(f"❌ {error_msg}")
+            errors.append(error_msg)
+            try:
+                output = self.emit(frames, output_format, batch_size)
+            except Exception as emit_error:
+                # La salida parcial tampoco se pudo generar (por ejemplo, disco lleno
+                # al escribir un archivo Arrow/Parquet): se responde sin salida
+                print(f"❌ No se pudo generar la salida parcial: {emit_error}")
+                errors.append(f"No se pudo generar la salida parcial: {str(emit_error)}")
+                output = []
+
+            result = {
+                "success": False,
+                "error": error_msg,
+                "records_processed": sum(len(frame) for frame in frames),
+                "errors": errors,
+                OUTPUT_KEYS[output_format]: output
+            }
+
+        finally:
+            # El canal de progreso se cierra aunque algo escape al manejo de errores
+            if progress is not None:
+                progress(FINAL_EVENT, success=bool(result and result["success"]),
+                         records_processed=result["records_processed"] if result else 0, errors=len(errors))
+
+        if output_format != 'sql':
+            result["format"] = output_format
+        return result
+
+    def check_format(self, output_format, streaming=False):
+        """Lanza ValueError si el formato no se puede generar (o transmitir)"""
+        formats = self.stream_formats if streaming else self.output_formats
+        if output_format not in formats:
+            raise ValueError(f"Formato de salida no soportado: {output_format}")
+        if output_format in ARTIFACT_FORMATS and not arrow_available():
+            raise ValueError(f"El formato '{output_format}' requiere pyarrow, que no está instalado")
+
+    def process_stream(self, file, user_id, output_format='sql', batch_size=None, progress=None):
+        """
+        Punto de entrada de la API Flask en modo streaming (NDJSON)
+
+        Igual que ``process_file``, pero entrega el resultado por partes
+        (ver ``stream``). Un error general se informa en la línea final.
+
+        Yields:
+            dict: Partes del resultado; la última tiene ``"type": "summary"``
+        """
+        if not file:
+            yield {"type": "summary", "success": False, "error": "No se proporcionó ningún archivo"}
+            return
+
+        try:
+            with open_upload(file) as source:
+                yield from self.stream(source, user_id, output_format, batch_size, progress)
+        except Exception as e:
+            if progress is not None:
+                progress(FINAL_EVENT, success=False, error=str(e))
+            yield {
+                "type": "summary",
+                "success": False,
+                "error": f"Error general: {str(e)}",
+                "records_processed": 0
+            }
+
+    def stream(self, source, user_id, output_format='sql', batch_size=None, progress=None):
+        """
+        Procesa el libro hoja por hoja y entrega la salida de cada hoja apenas
+        está lista, en partes de a lo más ``STREAM_CHUNK_SIZE`` elementos
+
+        Solo se mantiene en memoria la hoja en curso. Cada parte es
+        ``{"type": "sheet", "sheet": nombre, <clave del formato>: [...]}``; al
+        final viene ``{"type": "summary", ...}`` con los conteos y errores, con
+        las mismas claves que la respuesta de ``run``.
+
+        Yields:
+            dict: Partes del resultado
+        """
+        self.check_format(output_format, streaming=True)
+        key = OUTPUT_KEYS[output_format]
+
+        errors = []
+        total_records = 0
+        processed_sheets = 0
+        skipped = {"sheets": 0, "columns": 0}
+
+        try:
+            workbook = open_workbook(source, self.engine, self.engine_fallback, self.reader)
+            sheet_names = workbook.sheet_names
+            print(f"📄 Hojas encontradas: {sheet_names}")
+            if progress is not None:
+                progress("job_started", processor=self.name, total_sheets=len(sheet_names))
+
+            for sheet_name, records in self.iter_sheets(workbook, user_id, errors, progress, source, skipped):
+                processed_sheets += 1
+                total_records += len(records)
+
+                output = self.emit([records], output_format, batch_size)
+                del records
+                for start in range(0, len(output), STREAM_CHUNK_SIZE):
+                    yield {"type": "sheet", "sheet": sheet_name, key: output[start:start + STREAM_CHUNK_SIZE]}
+                del output
+
+            summary = {
+                "success": True,
+                "records_processed": total_records,
+                "sheets_processed": processed_sheets,
+                "total_sheets": len(sheet_names),
+                "sheets_skipped": skipped["sheets"],
+                "columns_skipped": skipped["columns"],
+                "errors": errors,
+                "message": self.success_message.format(records=total_records, sheets=processed_sheets)
+            }
+
+        except Exception as e:
+            label = f" de {self.name}" if self.name else ""
+            error_msg = f"Error en el procesamiento{label}: {str(e)}"
+            print(f"❌ {error_msg}")
+            errors.append(error_msg)
+
+            summary = {
+                "success": False,
+                "error": error_msg,
+                "records_processed": total_records,
+                "errors": errors
+            }
+
+        if progress is not None:
+            progress(FINAL_EVENT, success=summary["success"], records_processed=total_records, errors=len(errors))
+        yield {"type": "summary", "format": output_format, **summary}
+
+    def emit(self, frames, output_format='sql', batch_size=None):
+        """Etapa de emisión: registros de todas las hojas -> salida en ``output_format``"""
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            records = self.table.empty_frame()
+        else:
+            records = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+        if output_format in ARTIFACT_FORMATS:
+            return [write_artifact(self.table.arrow_table(records), output_format, self.table.name)]
+        if output_format == 'columnar':
+            return [self.table.columnar(records)]
+        if output_format == 'copy':
+            return self.table.copy_payloads(records)
+        if output_format == 'sql_batch':
+            return self.table.batch_insert_statements(records, batch_size or SQL_BATCH_SIZE)
+        return self.table.insert_statements(records)
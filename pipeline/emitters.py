@@ -0,0 +1,380 @@
+"""
+Etapa de emisión: convierte los registros de una tabla en sentencias SQL
+
+Cada procesador declara su tabla destino con ``TableSpec``. Los registros
+llegan como un DataFrame con una columna por campo y aquí se transforman,
+columna por columna, en literales SQL.
+"""
+
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+NULL = "NULL"
+
+# Filas por sentencia en el formato 'sql_batch' cuando no se indica batchSize
+SQL_BATCH_SIZE = int(os.getenv('SQL_BATCH_SIZE', '500'))
+
+# Columnas de texto con pocos valores distintos: en Arrow/Parquet se guardan
+# como diccionario
+DICTIONARY_COLUMNS = frozenset({
+    "proveedor", "cliente", "certificacion", "producto_codigo", "user_id", "origen", "comuna",
+})
+
+
+# Tipo de las columnas de un DataFrame sin registros
+EMPTY_DTYPES = {
+    'text': object,
+    'number': 'float64',
+    'timestamp': 'datetime64[us]',
+}
+
+
+class Column:
+    """
+    Columna de una tabla destino
+
+    Args:
+        name: Nombre de la columna en la base de datos
+        kind: 'text', 'number' o 'timestamp'
+        optional: Si es True, la columna se omite del INSERT cuando el valor es nulo
+    """
+
+    __slots__ = ('name', 'kind', 'optional')
+
+    def __init__(self, name, kind='text', optional=False):
+        self.name = name
+        self.kind = kind
+        self.optional = optional
+
+
+class TableSpec:
+    """
+    Tabla destino de un procesador
+
+    Args:
+        name: Nombre de la tabla (recepciones, ventas, consumos, produccion)
+        columns: Lista de ``Column`` en el orden del INSERT
+        multiline: Si es True, VALUES va en una segunda línea (formato histórico)
+    """
+
+    def __init__(self, name, columns, multiline=True):
+        self.name = name
+        self.columns = list(columns)
+        self.multiline = multiline
+
+    @property
+    def column_names(self):
+        return [column.name for column in self.columns]
+
+    def empty_frame(self):
+        """DataFrame sin registros, con el tipo de cada columna (Arrow no convierte float a timestamp)"""
+        return pd.DataFrame({column.name: pd.Series(dtype=EMPTY_DTYPES[column.kind]) for column in self.columns})
+
+    def literals(self, frame):
+        """Literales SQL de cada columna (los nulos se emiten como NULL)"""
+        return {
+            column.name: LITERAL_BUILDERS[column.kind](frame[column.name])
+            for column in self.columns
+        }
+
+    def csv_fields(self, frame):
+        """Campos CSV de cada columna (los nulos quedan como campo vacío sin comillas)"""
+        return {
+            column.name: CSV_BUILDERS[column.kind](frame[column.name])
+            for column in self.columns
+        }
+
+    def columnar(self, frame):
+        """
+        Registros por columna, para la respuesta JSON
+
+        Returns:
+            dict: ``table``, ``columns`` (nombres), ``optional`` (columnas que
+            los INSERT omiten cuando son nulas), ``records`` y ``values`` (una
+            lista por columna, en el orden de ``columns``)
+        """
+        return {
+            "table": self.name,
+            "columns": self.column_names,
+            "optional": [column.name for column in self.columns if column.optional],
+            "records": len(frame),
+            "values": [VALUE_BUILDERS[column.kind](frame[column.name]) for column in self.columns],
+        }
+
+    def arrow_table(self, frame):
+        """
+        Registros como ``pyarrow.Table`` tipada
+
+        Las fechas quedan como timestamp[us], los números como float64 y los
+        textos como string (diccionario para ``DICTIONARY_COLUMNS``). Los
+        arreglos se construyen desde las columnas de pandas, sin pasar por
+        objetos Python fila por fila.
+        """
+        import pyarrow as pa
+
+        arrays = [ARROW_BUILDERS[column.kind](frame[column.name], column.name in DICTIONARY_COLUMNS)
+                  for column in self.columns]
+        return pa.Table.from_arrays(arrays, names=self.column_names)
+
+    def insert_statements(self, frame):
+        """
+        Genera un INSERT por registro
+
+        Args:
+            frame: DataFrame con una columna por cada ``Column`` de la tabla
+
+        Returns:
+            list: Sentencias SQL en el orden de las filas
+        """
+        if frame is None or len(frame) == 0:
+            return []
+
+        headers, codes, rows = self.value_rows(frame)
+        separator = " \nVALUES " if self.multiline else " VALUES "
+        prefixes = [f"INSERT INTO {self.name} ({', '.join(header)}){separator}" for header in headers]
+
+        if len(prefixes) == 1:
+            prefix = prefixes[0]
+            return [prefix + row + ";" for row in rows]
+        return [prefixes[code] + row + ";" for code, row in zip(codes, rows)]
+
+    def batch_insert_statements(self, frame, batch_size):
+        """
+        Genera INSERT de varias filas (``VALUES (...), (...), ...``)
+
+        Los registros se agrupan por columnas presentes (las opcionales solo
+        aparecen cuando traen valor) y cada grupo se divide en sentencias de
+        a lo más ``batch_size`` filas. Dentro de un grupo se respeta el orden
+        de las filas; los grupos salen en el orden de su primera fila.
+
+        Args:
+            frame: DataFrame con una columna por cada ``Column`` de la tabla
+            batch_size: Máximo de filas por sentencia
+
+        Returns:
+            list: Sentencias SQL
+        """
+        if frame is None or len(frame) == 0:
+            return []
+
+        headers, codes, rows = self.value_rows(frame)
+        groups = _group_rows(headers, codes, rows)
+
+        separator, row_separator = (" \nVALUES ", ",\n") if self.multiline else (" VALUES ", ", ")
+        statements = []
+        for header, group in zip(headers, groups):
+            prefix = f"INSERT INTO {self.name} ({', '.join(header)}){separator}"
+            for start in range(0, len(group), batch_size):
+                statements.append(prefix + row_separator.join(group[start:start + batch_size]) + ";")
+        return statements
+
+    def copy_payloads(self, frame):
+        """
+        Registros en CSV para ``COPY ... FROM STDIN``
+
+        Cada combinación de columnas presentes (ver ``value_rows``) genera su
+        propio bloque, de modo que las columnas opcionales sin valor conserven
+        el default de la tabla igual que con los INSERT.
+
+        Returns:
+            list: Dicts con ``table``, ``columns``, ``copy`` (sentencia COPY),
+            ``records`` y ``data`` (CSV con encabezado)
+        """
+        if frame is None or len(frame) == 0:
+            return []
+
+        headers, codes, rows = self._rows(self.csv_fields(frame), "", "", "", ",")
+        payloads = []
+        for header, group in zip(headers, _group_rows(headers, codes, rows)):
+            payloads.append({
+                "table": self.name,
+                "columns": header,
+                "copy": f"COPY {self.name} ({', '.join(header)}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+                "records": len(group),
+                "data": ",".join(header) + "\n" + "\n".join(group) + "\n",
+            })
+        return payloads
+
+    def value_rows(self, frame):
+        """
+        Tupla de valores de cada registro, lista para un INSERT
+
+        Returns:
+            tuple: (listas de columnas presentes, índice en esa lista de cada
+            fila, "(valores)" de cada fila). Sin columnas opcionales todas las
+            filas comparten la única lista de columnas.
+        """
+        return self._rows(self.literals(frame), NULL, "(", ")", ", ")
+
+    def _rows(self, fields, null, left, right, separator):
+        """Une los campos de cada registro; ``null`` marca las columnas opcionales vacías"""
+        required = [c.name for c in self.columns if not c.optional]
+        if len(required) == len(self.columns):
+            rows = [left + separator.join(values) + right for values in zip(*(fields[name] for name in required))]
+            return [required], None, rows
+
+        # Columnas opcionales: el INSERT solo las incluye cuando traen valor,
+        # así que cada combinación de columnas presentes tiene su propia lista
+        names = self.column_names
+        always = [name in required for name in names]
+        signatures = {}
+        codes = []
+        rows = []
+        for values in zip(*(fields[name] for name in names)):
+            signature = tuple(a or value != null for value, a in zip(values, always))
+            code = signatures.get(signature)
+            if code is None:
+                code = signatures[signature] = len(signatures)
+            codes.append(code)
+            rows.append(left + separator.join(value for value, p in zip(values, signature) if p) + right)
+
+        headers = [[name for name, p in zip(names, signature) if p] for signature in signatures]
+        return headers, codes, rows
+
+
+def _group_rows(headers, codes, rows):
+    """Filas agrupadas por lista de columnas, respetando su orden"""
+    if len(headers) == 1:
+        return [rows]
+    groups = [[] for _ in headers]
+    for code, row in zip(codes, rows):
+        groups[code].append(row)
+    return groups
+
+
+def _is_null(value):
+    return value is None or value is pd.NaT or (isinstance(value, float) and value != value)
+
+
+def text_literals(series):
+    """'valor' con comillas simples escapadas"""
+    return [
+        NULL if _is_null(value) else "'" + str(value).replace("'", "''") + "'"
+        for value in series.tolist()
+    ]
+
+
+def number_literals(series):
+    """Representación de Python de cada número (igual que en un f-string)"""
+    return [NULL if _is_null(value) else str(value) for value in series.tolist()]
+
+
+def isoformat_values(series):
+    """
+    Fechas en formato ISO 8601, igual que ``Timestamp.isoformat()``
+
+    Las fechas sin fracción de segundo (la inmensa mayoría en planillas) se
+    formatean en bloque con numpy; el resto usa isoformat elemento a elemento.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        values = series.tolist()
+        if all(_is_null(value) or isinstance(value, datetime) for value in values):
+            # Fechas con resoluciones que no caben en un mismo dtype
+            return [None if _is_null(value) else pd.Timestamp(value).isoformat() for value in values]
+        series = pd.to_datetime(series, errors='coerce', format='mixed')
+
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return [None if value is pd.NaT else value.isoformat() for value in series.tolist()]
+
+    values = series.to_numpy()
+    seconds = values.astype('datetime64[s]')
+    result = np.datetime_as_string(seconds).astype(object)
+
+    nat = np.isnat(values)
+    fractional = ~nat & (values != seconds.astype(values.dtype))
+    result[nat] = None
+    if fractional.any():
+        for position in np.flatnonzero(fractional):
+            result[position] = pd.Timestamp(values[position]).isoformat()
+    return result.tolist()
+
+
+def timestamp_literals(series):
+    return [NULL if value is None else "'" + value + "'" for value in isoformat_values(series)]
+
+
+LITERAL_BUILDERS = {
+    'text': text_literals,
+    'number': number_literals,
+    'timestamp': timestamp_literals,
+}
+
+
+def text_values(series):
+    return [None if _is_null(value) else str(value) for value in series.tolist()]
+
+
+def number_values(series):
+    """Números tal cual; NaN e infinito quedan como null (no son JSON válido)"""
+    return [None if _is_null(value) or value in (_INF, -_INF) else value for value in series.tolist()]
+
+
+_INF = float('inf')
+
+VALUE_BUILDERS = {
+    'text': text_values,
+    'number': number_values,
+    'timestamp': isoformat_values,
+}
+
+
+def text_fields(series):
+    """Texto siempre entre comillas dobles, para distinguir "" de NULL"""
+    return [
+        "" if _is_null(value) else '"' + str(value).replace('"', '""') + '"'
+        for value in series.tolist()
+    ]
+
+
+def number_fields(series):
+    return ["" if _is_null(value) else str(value) for value in series.tolist()]
+
+
+def timestamp_fields(series):
+    return ["" if value is None else value for value in isoformat_values(series)]
+
+
+CSV_BUILDERS = {
+    'text': text_fields,
+    'number': number_fields,
+    'timestamp': timestamp_fields,
+}
+
+
+def arrow_timestamps(series, dictionary=False):
+    import pyarrow as pa
+
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        try:
+            # Timestamp con resoluciones mixtas (columna object)
+            return pa.array(series, type=pa.timestamp('us'), from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+            series = pd.to_datetime(series, errors='coerce', format='mixed')
+    return pa.array(series.dt.as_unit('us'), from_pandas=True)
+
+
+def arrow_numbers(series, dictionary=False):
+    import pyarrow as pa
+
+    return pa.array(pd.to_numeric(series, errors='coerce'), type=pa.float64(), from_pandas=True)
+
+
+def arrow_text(series, dictionary=False):
+    import pyarrow as pa
+
+    try:
+        array = pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Valores que no son str (números en una columna de texto)
+        array = pa.array(series.where(series.isna(), series.astype(str)), type=pa.string(), from_pandas=True)
+    return array.dictionary_encode() if dictionary else array
+
+
+ARROW_BUILDERS = {
+    'text': arrow_text,
+    'number': arrow_numbers,
+    'timestamp': arrow_timestamps,
+}
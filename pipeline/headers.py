@@ -0,0 +1,296 @@
+"""
+Etapa de resolución de encabezados
+
+Helpers compartidos para ubicar las columnas que necesita cada procesador,
+ya sea por nombre de columna (encabezado en la primera fila) o buscando la
+fila de encabezado entre las primeras filas de la hoja.
+
+``HeaderMatcher`` resuelve las reglas palabra clave -> campo de un
+procesador: normaliza cada celda una sola vez (minúsculas y, si la regla lo
+pide, sin acentos) y busca todas las palabras clave con una sola expresión
+regular.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Separadores que ignoran las reglas ``compact`` (FCH_RECEPCION = FCHRECEPCION)
+_SEPARATORS = re.compile(r"[\s_/]+")
+
+_NOTHING = frozenset()
+
+
+def find_column(columns, predicate):
+    """
+    Primera columna cuyo nombre cumple ``predicate``
+
+    Args:
+        columns: Nombres de columna de la hoja (ya sin espacios al inicio/fin)
+        predicate: Función que recibe el nombre en mayúsculas y devuelve bool
+
+    Returns:
+        str: Nombre original de la columna, o None si ninguna coincide
+    """
+    for col in columns:
+        if predicate(str(col).upper()):
+            return col
+    return None
+
+
+def match_columns(columns, expected_columns):
+    """
+    Busca columnas por nombre exacto, sin distinguir mayúsculas/minúsculas
+
+    Returns:
+        tuple: (dict esperado -> nombre real, lista de columnas no encontradas)
+    """
+    lowered = {}
+    for actual in columns:
+        lowered.setdefault(actual.strip().lower(), actual)
+
+    columnas_map = {}
+    missing = []
+    for expected in expected_columns:
+        actual = lowered.get(expected.lower())
+        if actual is None:
+            missing.append(expected)
+        else:
+            columnas_map[expected] = actual
+    return columnas_map, missing
+
+
+def normalize_header(value):
+    """Texto de una celda para comparar con las palabras clave: sin espacios al
+    inicio/fin, en minúsculas (``casefold``) y sin acentos"""
+    return _strip_accents(str(value).strip().casefold())
+
+
+def _strip_accents(text):
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=None)
+def _accent_table(letters):
+    return str.maketrans({letter: _strip_accents(letter) for letter in letters})
+
+
+def _form(text, compact, ignore_accents):
+    """Texto ya en minúsculas en la forma que compara una regla"""
+    if ignore_accents is True:
+        text = _strip_accents(text)
+    elif ignore_accents:
+        text = text.translate(_accent_table(ignore_accents))
+    if compact:
+        text = _SEPARATORS.sub('', text)
+    return text
+
+
+class Rule:
+    """
+    Condición sobre una celda de encabezado (sin distinguir mayúsculas)
+
+    Args:
+        *groups: Palabras clave (o listas de palabras); la celda debe contener
+            al menos una palabra de cada grupo
+        exclude: Palabras que descartan la celda
+        compact: Si es True, se compara la celda sin espacios, '_' ni '/'
+        ignore_accents: Si es True, tampoco se distinguen los acentos; si es un
+            texto, solo los de esas letras (``'ÓÍÁ'``: 'Ó', 'Í' y 'Á' valen como
+            'O', 'I' y 'A', pero 'É' no vale como 'E')
+    """
+
+    __slots__ = ('groups', 'exclude', 'form')
+
+    def __init__(self, *groups, exclude=(), compact=False, ignore_accents=False):
+        if not isinstance(ignore_accents, bool):
+            # Misma forma para el mismo conjunto de letras, en cualquier orden
+            ignore_accents = ''.join(sorted(set(ignore_accents.casefold())))
+        self.form = (compact, ignore_accents)
+        self.groups = tuple(
+            tuple(self._keyword(word) for word in ((group,) if isinstance(group, str) else group))
+            for group in groups
+        )
+        self.exclude = tuple(self._keyword(word) for word in exclude)
+
+    def _keyword(self, word):
+        return _form(str(word).strip().casefold(), *self.form)
+
+    def keywords(self):
+        return [word for group in self.groups for word in group] + list(self.exclude)
+
+    def matches(self, found):
+        """Si la celda cumple la regla, dado lo que devuelve ``HeaderMatcher.keywords``"""
+        found = found[self.form]
+        return (all(any(word in found for word in group) for group in self.groups)
+                and not any(word in found for word in self.exclude))
+
+
+class _Keywords:
+    """Busca en un texto todas las palabras clave de una lista, en una pasada"""
+
+    def __init__(self, words):
+        # Más largas primero: en cada posición la expresión toma la más larga,
+        # y con ella todas las palabras que contiene
+        words = sorted({word for word in words if word}, key=len, reverse=True)
+        self.pattern = re.compile("(?=(" + "|".join(map(re.escape, words)) + "))") if words else None
+        self.contained = {word: frozenset(other for other in words if other in word) for word in words}
+
+    def find(self, text):
+        if self.pattern is None:
+            return _NOTHING
+        found = set()
+        for match in self.pattern.finditer(text):
+            found |= self.contained[match.group(1)]
+        return found
+
+
+class HeaderMatcher:
+    """
+    Reglas campo -> columna de un procesador, compiladas una vez
+
+    Args:
+        fields: Dict campo -> reglas en orden de prioridad. Cada regla es una
+            ``Rule`` o una tupla de ``Rule`` (basta con que se cumpla una); una
+            sola regla puede ir sin lista. Como con ``find_column``, gana la
+            primera columna que cumple la primera regla, y solo si ninguna la
+            cumple se prueba la siguiente.
+    """
+
+    def __init__(self, fields):
+        self.fields = {}
+        for field, rules in fields.items():
+            if not isinstance(rules, list):
+                rules = [rules]
+            self.fields[field] = [rule if isinstance(rule, tuple) else (rule,) for rule in rules]
+
+        # Una expresión por forma de comparación que usen las reglas
+        words = {}
+        for rules in self.fields.values():
+            for options in rules:
+                for rule in options:
+                    words.setdefault(rule.form, []).extend(rule.keywords())
+        self._keywords = {form: _Keywords(form_words) for form, form_words in words.items()}
+
+    @classmethod
+    def from_keywords(cls, keywords, exclude=None):
+        """
+        Matcher de un dict campo -> palabras clave (las de ``scan_header_row``)
+
+        Args:
+            keywords: Dict campo -> palabras clave; basta con que la celda contenga una
+            exclude: Dict campo -> palabras que descartan una celda para ese campo
+        """
+        exclude = exclude or {}
+        return cls({field: Rule(words, exclude=exclude.get(field, ())) for field, words in keywords.items()})
+
+    def keywords(self, value):
+        """
+        Palabras clave que contiene una celda
+
+        Returns:
+            dict: Forma de comparación (ver ``Rule``) -> palabras encontradas
+        """
+        return self._found(str(value).strip().casefold())
+
+    def _found(self, text):
+        return {form: keywords.find(_form(text, *form)) for form, keywords in self._keywords.items()}
+
+    def find(self, cells, field, skip=()):
+        """
+        Posición de la columna de ``field``
+
+        Args:
+            cells: Resultado de ``keywords`` por columna (None = celda vacía)
+            field: Campo a buscar
+            skip: Posiciones que no se consideran
+
+        Returns:
+            int: Posición de la columna, o None si ninguna cumple las reglas
+        """
+        match = self.rank(cells, field, skip)
+        return None if match is None else match[0]
+
+    def rank(self, cells, field, skip=()):
+        """
+        Como ``find``, con la prioridad de la regla que cumplió la columna
+
+        Returns:
+            tuple: (posición, prioridad: 0 si cumple la primera regla del campo,
+                1 la segunda...), o None si ninguna columna cumple las reglas
+        """
+        for priority, options in enumerate(self.fields[field]):
+            for position, found in enumerate(cells):
+                if found is None or position in skip:
+                    continue
+                if any(rule.matches(found) for rule in options):
+                    return position, priority
+        return None
+
+    def resolve(self, columns, scored=False):
+        """
+        Modo 'columns': ubica cada campo por el nombre de las columnas
+
+        Args:
+            columns: Nombres de columna de la hoja (ya sin espacios al inicio/fin)
+            scored: Si es True, cada campo trae también la prioridad de la
+                regla que cumplió su columna (ver ``rank``)
+
+        Returns:
+            dict: Campo -> nombre original de la columna (o tupla (nombre,
+                prioridad) con ``scored``), solo con los campos encontrados
+        """
+        cells = [self.keywords(column) for column in columns]
+        mapping = {}
+        for field in self.fields:
+            match = self.rank(cells, field)
+            if match is not None:
+                position, priority = match
+                mapping[field] = (columns[position], priority) if scored else columns[position]
+        return mapping
+
+
+def scan_header_row(head, keywords, required, min_found, optional=(), exclude=None):
+    """
+    Busca la fila de encabezado en las primeras filas de una hoja
+
+    Args:
+        head: DataFrame leído con ``header=None`` (primeras filas de la hoja)
+        keywords: ``HeaderMatcher``, o dict campo -> palabras clave en minúsculas
+        required: Campos requeridos, en orden de búsqueda
+        min_found: Cantidad mínima de requeridos para aceptar la fila
+        optional: Campos opcionales que se buscan en la fila aceptada
+        exclude: Dict campo -> palabras que descartan una celda para ese campo
+            (solo si ``keywords`` es un dict)
+
+    Returns:
+        tuple: (índice de la fila de encabezado, dict campo -> índice de columna),
+        o None si ninguna fila califica
+    """
+    matcher = keywords if isinstance(keywords, HeaderMatcher) else HeaderMatcher.from_keywords(keywords, exclude)
+
+    for i, row in head.iterrows():
+        cells = []
+        for val in row.values:
+            text = str(val).strip().casefold()
+            # Celdas vacías (NaN) no cuentan
+            cells.append(None if text == "nan" else matcher._found(text))
+
+        # Puntaje de la fila: cantidad de campos requeridos encontrados
+        columnas_map = {}
+        for target in required:
+            position = matcher.find(cells, target)
+            if position is not None:
+                columnas_map[target] = position
+
+        if len(columnas_map) >= min_found:
+            for target in optional:
+                position = matcher.find(cells, target, skip=set(columnas_map.values()))
+                if position is not None:
+                    columnas_map[target] = position
+            return i, columnas_map
+
+    return None
@@ -0,0 +1,295 @@
+"""
+Trabajos asíncronos de procesamiento
+
+``POST /jobs`` guarda el archivo subido en ``JOB_DIR``, encola el
+procesamiento en un pool acotado de threads del worker y responde de
+inmediato con el id del trabajo. El estado (y el resultado, al terminar) se
+escribe en ``JOB_DIR/<id>.json``, de modo que ``GET /jobs/<id>`` lo puede
+responder cualquier worker de gunicorn, no solo el que recibió la carga.
+
+Los archivos de trabajos terminados que no cambian hace más de
+``JOB_RESULT_TTL`` segundos se eliminan en el barrido del janitor. Los de
+trabajos en espera o en curso se conservan, salvo que lleven más de
+``JOB_STALE_AGE`` segundos sin cambios (trabajos de un worker que murió).
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline.progress import open_channel
+
+JOB_DIR = os.getenv('JOB_DIR') or os.path.join(tempfile.gettempdir(), "balance_jobs")
+
+# Trabajos que se procesan a la vez en cada worker de gunicorn
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+
+# Trabajos en espera o en curso que acepta cada worker antes de responder 503
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', '16'))
+
+# Segundos que se conserva un trabajo desde su último cambio de estado
+JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '3600'))
+
+# Segundos sin cambios tras los que un trabajo en espera o en curso se da por perdido
+JOB_STALE_AGE = int(os.getenv('JOB_STALE_AGE', '86400'))
+
+# Estados de un trabajo
+QUEUED = "queued"
+RUNNING = "running"
+FINISHED = "finished"
+FAILED = "failed"
+FINAL_STATUSES = (FINISHED, FAILED)
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class JobQueueFull(Exception):
+    """El worker ya tiene ``JOB_QUEUE_MAX`` trabajos pendientes"""
+
+
+class JobExists(Exception):
+    """Ya hay un trabajo con el mismo id"""
+
+
+class JobManager:
+    """
+    Pool de trabajos de un proceso y acceso a los estados guardados en disco
+
+    El executor se crea con el primer trabajo, así los workers de gunicorn
+    que nunca reciben uno no levantan threads.
+    """
+
+    def __init__(self, workers=None, queue_max=None):
+        self.workers = JOB_WORKERS if workers is None else workers
+        self.queue_max = JOB_QUEUE_MAX if queue_max is None else queue_max
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.submitted = 0
+        self.finished = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                    thread_name_prefix="job")
+            return self._executor
+
+    def submit(self, task, upload, job_id=None, **info):
+        """
+        Encola un trabajo
+
+        Args:
+            task: Función ``task(source)`` que procesa el archivo y devuelve el
+                resultado (dict serializable a JSON)
+            upload: ``FileStorage`` de werkzeug o buffer binario; se copia a
+                disco porque el stream se cierra al terminar el request
+            job_id: Id del trabajo (ver ``pipeline.progress.valid_job_id``);
+                por defecto uno aleatorio
+            **info: Datos que se devuelven junto al estado (función, formato...)
+
+        Returns:
+            dict: Estado inicial del trabajo
+
+        Raises:
+            JobQueueFull: Si el worker ya tiene ``queue_max`` trabajos pendientes
+            JobExists: Si ``job_id`` ya está en uso
+        """
+        job_id = job_id or uuid.uuid4().hex
+        os.makedirs(JOB_DIR, exist_ok=True)
+        # El id se toma creando su estado: dos cargas con el mismo id (en
+        # cualquier worker) no pueden pasar las dos
+        try:
+            os.close(os.open(_state_path(job_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            raise JobExists(f"El trabajo {job_id} ya existe") from None
+
+        with self._lock:
+            if self.pending >= self.queue_max:
+                self.rejected += 1
+                _remove(_state_path(job_id))
+                raise JobQueueFull(f"Hay {self.pending} trabajos pendientes en este worker")
+            self.pending += 1
+
+        try:
+            upload_path = _upload_path(job_id)
+            stream = getattr(upload, 'stream', upload)
+            with open(upload_path, 'wb') as target:
+                shutil.copyfileobj(stream, target, _COPY_CHUNK)
+
+            state = {"job_id": job_id, "status": QUEUED, "created_at": time.time(), **info}
+            _write_state(state)
+            # Desde aquí /progress/<id> acepta suscripciones y ve los eventos desde el inicio
+            open_channel(job_id, publish=True)
+            self._get_executor().submit(self._run, task, state, upload_path)
+        except BaseException:
+            _remove(_state_path(job_id))
+            _remove(_upload_path(job_id))
+            with self._lock:
+                self.pending -= 1
+            raise
+
+        with self._lock:
+            self.submitted += 1
+        return state
+
+    def _run(self, task, state, upload_path):
+        state = dict(state, status=RUNNING, started_at=time.time())
+        _write_state(state)
+        try:
+            with open(upload_path, 'rb') as source:
+                result = task(source)
+            state.update(status=FINISHED, result=result)
+        except Exception as e:
+            print(f"❌ Error en el trabajo {state['job_id']}: {e}")
+            print(traceback.format_exc())
+            state.update(status=FAILED, error=str(e))
+        finally:
+            state["finished_at"] = time.time()
+            state["seconds"] = round(state["finished_at"] - state["started_at"], 3)
+            try:
+                _write_state(state)
+            finally:
+                _remove(upload_path)
+                with self._lock:
+                    self.pending -= 1
+                    if state["status"] == FINISHED:
+                        self.finished += 1
+                    else:
+                        self.failed += 1
+
+    def stats(self):
+        """Métricas del pool para el endpoint /metrics"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_max": self.queue_max,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "finished": self.finished,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+def get_job(job_id):
+    """
+    Estado guardado de un trabajo
+
+    Returns:
+        dict: Estado (con ``result`` si terminó), o None si no existe o expiró
+    """
+    path = _state_path(job_id)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        age = time.time() - os.path.getmtime(path)
+    except (OSError, ValueError):
+        return None
+
+    if state.get("status") in FINAL_STATUSES and age >= JOB_RESULT_TTL:
+        return None
+    return state
+
+
+def sweep_jobs(max_age=None, now=None, stale_age=None):
+    """
+    Elimina estados y cargas de trabajos sin cambios hace más de ``max_age``
+
+    Los trabajos en espera o en curso se conservan hasta ``stale_age``.
+
+    Args:
+        max_age: Antigüedad mínima en segundos (por defecto JOB_RESULT_TTL)
+        now: Marca de tiempo de referencia (por defecto time.time())
+        stale_age: Antigüedad desde la que se eliminan también los trabajos en
+            espera o en curso (por defecto JOB_STALE_AGE)
+
+    Returns:
+        int: Cantidad de archivos eliminados
+    """
+    max_age = JOB_RESULT_TTL if max_age is None else max_age
+    stale_age = JOB_STALE_AGE if stale_age is None else stale_age
+    now = time.time() if now is None else now
+
+    expired = []  # (id del trabajo, ruta, antigüedad)
+    try:
+        entries = os.scandir(JOB_DIR)
+    except OSError:
+        # El directorio se crea con el primer trabajo
+        return 0
+
+    with entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                age = now - entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if age >= max_age:
+                # <id>.json, <id>.upload y los .part de ``_write_state``
+                expired.append((entry.name.split(".", 1)[0], entry.path, age))
+
+    active = {}
+    removed = 0
+    for job_id, path, age in expired:
+        if job_id not in active:
+            active[job_id] = _is_active(job_id)
+        if active[job_id] and age < stale_age:
+            continue
+        try:
+            os.unlink(path)
+            removed += 1
+        except OSError:
+            continue
+
+    if removed:
+        print(f"🧹 Archivos de trabajos expirados eliminados: {removed}")
+    return removed
+
+
+def _is_active(job_id):
+    try:
+        with open(_state_path(job_id), 'r', encoding='utf-8') as f:
+            return json.load(f).get("status") in (QUEUED, RUNNING)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError):
+        # Estado recién tomado por ``submit`` y todavía vacío
+        return True
+
+
+def _state_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.json")
+
+
+def _upload_path(job_id):
+    return os.path.join(JOB_DIR, f"{job_id}.upload")
+
+
+def _write_state(state):
+    # Se escribe con otro nombre y se renombra, para no leer estados a medias
+    path = _state_path(state["job_id"])
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(partial, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, default=str)
+    os.replace(partial, path)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+# Instancia compartida por todo el proceso
+job_manager = JobManager()
@@ -0,0 +1,175 @@
+"""
+Caché de formatos de planilla (layouts)
+
+Los tenants suben todos los meses los mismos exports, y las hojas de un libro
+suelen compartir el encabezado (los doce meses de un reporte de ingresos).
+Esta caché guarda, por tenant, procesador y encabezado, la fila de
+encabezado y el mapping ya resueltos: si una hoja trae exactamente el mismo
+encabezado, no se vuelve a buscar.
+
+La huella de una hoja son las celdas de su encabezado sin espacios al
+inicio/fin (en modo 'scan', las filas desde la primera hasta la de
+encabezado, porque esa búsqueda se queda con la primera fila que califica).
+Cualquier cambio en esas celdas es otra clave, y un procesador recargado es
+otra instancia, así que una entrada nunca se aplica a un formato distinto.
+Solo se guardan las resoluciones exitosas: una hoja omitida vuelve a pasar
+por el procesador y registra sus errores.
+
+Es una caché por proceso (como ``module_cache``), acotada a
+``LAYOUT_CACHE_SIZE`` entradas con descarte LRU.
+"""
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Encabezados resueltos que se recuerdan por proceso (0 = sin caché)
+LAYOUT_CACHE_SIZE = int(os.getenv('LAYOUT_CACHE_SIZE', '512'))
+
+
+def header_cells(values):
+    """
+    Celdas de una fila de encabezado tal como se comparan en la caché
+
+    Args:
+        values: Valores de la fila (nombres de columna o celdas leídas sin encabezado)
+
+    Returns:
+        tuple: Textos sin espacios al inicio/fin ('' para celdas vacías), sin
+            las celdas vacías del final
+    """
+    cells = ['' if pd.isna(value) else str(value).strip() for value in values]
+    while cells and not cells[-1]:
+        cells.pop()
+    return tuple(cells)
+
+
+class LayoutCache:
+    """
+    Caché LRU thread-safe de encabezados resueltos
+
+    Args:
+        max_entries: Cantidad máxima de encabezados (por defecto LAYOUT_CACHE_SIZE)
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = LAYOUT_CACHE_SIZE if max_entries is None else max_entries
+        self._entries = OrderedDict()  # (tenant, procesador, huella) -> (fila, mapping)
+        self._header_rows = {}  # (tenant, procesador) -> {fila de encabezado: entradas}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def get(self, tenant, processor, fingerprints):
+        """
+        Encabezado resuelto antes para alguna de las huellas
+
+        Args:
+            tenant: ID del usuario que subió el archivo
+            processor: Procesador que lo resolvió
+            fingerprints: Huellas candidatas de la hoja (una por fila de
+                encabezado posible, ver ``header_rows``)
+
+        Returns:
+            tuple: (fila de encabezado, copia del mapping), o None si no está
+        """
+        with self._lock:
+            for fingerprint in fingerprints:
+                key = (tenant, processor, fingerprint)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    break
+            else:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        header_row, mapping = entry
+        return header_row, copy.deepcopy(mapping)
+
+    def header_rows(self, tenant, processor):
+        """Filas de encabezado (modo 'scan') con entradas para el tenant y procesador"""
+        with self._lock:
+            return sorted(self._header_rows.get((tenant, processor), ()))
+
+    def put(self, tenant, processor, fingerprint, header_row, mapping):
+        """
+        Guarda el encabezado resuelto de una hoja
+
+        Args:
+            tenant: ID del usuario que subió el archivo
+            processor: Procesador que lo resolvió
+            fingerprint: Huella del encabezado (ver ``header_cells``)
+            header_row: Fila del encabezado en modo 'scan', o None en modo 'columns'
+            mapping: Mapping devuelto por el procesador
+        """
+        if not self.enabled:
+            return
+        key = (tenant, processor, fingerprint)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (header_row, copy.deepcopy(mapping))
+            self._count(key[:2], header_row, 1)
+            while len(self._entries) > self.max_entries:
+                (tenant, processor, _), (old_row, _) = self._entries.popitem(last=False)
+                self._count((tenant, processor), old_row, -1)
+                self.evictions += 1
+
+    def _count(self, owner, header_row, delta):
+        if header_row is None:
+            return
+        rows = self._header_rows.setdefault(owner, {})
+        rows[header_row] = rows.get(header_row, 0) + delta
+        if not rows[header_row]:
+            del rows[header_row]
+            if not rows:
+                del self._header_rows[owner]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._header_rows.clear()
+
+    def stats(self):
+        """Métricas de la caché para el endpoint /metrics"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "layouts_cached": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def merge_stats(stats):
+    """
+    Suma las métricas de varias cachés (este proceso y los hijos del pool)
+
+    Args:
+        stats: Lista de resultados de ``LayoutCache.stats``
+    """
+    merged = {"layouts_cached": 0, "max_entries": 0, "hits": 0, "misses": 0, "evictions": 0}
+    for item in stats:
+        for name in merged:
+            merged[name] += item.get(name, 0)
+    lookups = merged["hits"] + merged["misses"]
+    merged["hit_rate"] = round(merged["hits"] / lookups, 4) if lookups else 0.0
+    merged["processes"] = len(stats)
+    return merged
+
+
+# Instancia compartida por todo el proceso
+layout_cache = LayoutCache()
@@ -0,0 +1,103 @@
+"""
+Lectura de hojas en paralelo
+
+Leer una hoja con pandas/openpyxl es trabajo de CPU en Python, así que las
+hojas de un libro grande (por ejemplo, los doce meses de un reporte de
+ingresos) se reparten entre procesos: cada uno abre el libro por su ruta en
+disco (su contenido no viaja con cada tarea), lee y transforma solo su hoja,
+y devuelve el DataFrame de registros. El procesador une los resultados en el
+orden original de las hojas.
+
+El pool se crea la primera vez que llega un libro que lo amerita (varias
+hojas y al menos ``SHEET_PARALLEL_MIN_BYTES``); los libros chicos se leen en
+el mismo proceso, donde abrir el libro una vez cuesta menos que repartirlo.
+Los procesos hijos (del pool de ``worker_pool``) no reparten hojas: el
+paralelismo no se anida.
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from pipeline.uploads import upload_file
+
+# Procesos para leer hojas en paralelo (0 o 1 = una hoja a la vez). Desactivado
+# por defecto: cada proceso carga pandas y se suma a los workers de gunicorn
+SHEET_WORKERS = int(os.getenv('SHEET_WORKERS', '0'))
+
+# Tamaño mínimo del archivo para repartir sus hojas entre procesos
+SHEET_PARALLEL_MIN_BYTES = int(os.getenv('SHEET_PARALLEL_MIN_BYTES', str(1024 * 1024)))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def sheet_executor():
+    """Pool de procesos de lectura de hojas (se crea al primer uso)"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=SHEET_WORKERS,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def processor_path(processor):
+    """
+    Ruta del script que define ``processor``, para cargarlo en otro proceso
+
+    Returns:
+        str: Ruta del módulo, o None si no se cargó desde un archivo registrado
+            en ``sys.modules`` (por ejemplo, desde un script de pruebas)
+    """
+    module = sys.modules.get(type(processor).__module__)
+    if module is None or getattr(module, 'PROCESSOR', None) is not processor:
+        return None
+    return getattr(module, '__file__', None)
+
+
+@contextmanager
+def sheet_payload(source, sheet_names, processor):
+    """
+    Decide si un libro se lee en paralelo y prepara lo que reciben los procesos
+
+    Los procesos reciben la ruta del libro: si ``source`` es un buffer, se
+    escribe una sola vez a un temporal que se elimina al salir del bloque.
+
+    Args:
+        source: Ruta del archivo o buffer binario con ``seek``
+        sheet_names: Hojas del libro
+        processor: Procesador que lo va a leer
+
+    Yields:
+        tuple: (ruta del procesador, ruta del libro), o None si conviene
+            leerlo en el mismo proceso
+    """
+    path = _parallel_processor_path(source, sheet_names, processor)
+    if path is None:
+        yield None
+        return
+    with upload_file(source) as workbook_path:
+        yield path, workbook_path
+
+
+def _parallel_processor_path(source, sheet_names, processor):
+    if SHEET_WORKERS < 2 or len(sheet_names) < 2 or source is None:
+        return None
+    # Un hijo del pool de procesos ya es paralelismo: no levanta otro pool
+    if multiprocessing.parent_process() is not None:
+        return None
+
+    if isinstance(source, (str, os.PathLike)):
+        size = os.path.getsize(source)
+    else:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+    if size < SHEET_PARALLEL_MIN_BYTES:
+        return None
+    return processor_path(processor)
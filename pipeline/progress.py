@@ -0,0 +1,343 @@
+"""
+Canal de progreso de los trabajos (Server-Sent Events)
+
+Los procesadores informan su avance con un callback ``progress(evento, **datos)``
+que solo existe cuando la carga trae un ``jobId``; sin él, el costo es un
+``if progress is not None`` por etapa.
+
+Los eventos pasan por un archivo por trabajo en ``PROGRESS_DIR`` para que la
+conexión SSE funcione aunque la atienda otro worker de gunicorn (o el trabajo
+corra en otro proceso). El archivo lo crea (o lo vacía) cada ejecución al
+recibir la carga, con ``open_channel``: una suscripción solo ve los eventos de
+la ejecución en curso y rechaza los ids que no corresponden a ninguna carga.
+
+Los eventos solo se escriben si alguien se suscribió: ``subscribe`` crea un
+marcador ``<id>.subscribed`` junto al archivo de eventos y, sin él, publicar
+un evento cuesta un ``stat``. El marcador queda hasta que lo barre el janitor,
+así que una nueva ejecución con el mismo id también publica.
+
+Cada suscripción ocupa un thread de gunicorn mientras dura, así que cada
+proceso acepta a lo más ``PROGRESS_MAX_SUBSCRIBERS`` a la vez.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+PROGRESS_DIR = os.getenv('PROGRESS_DIR') or os.path.join(tempfile.gettempdir(), "balance_progress")
+
+# Segundos sin eventos tras los que se cierra una suscripción
+PROGRESS_IDLE_TIMEOUT = int(os.getenv('PROGRESS_IDLE_TIMEOUT', '120'))
+
+# Suscripciones abiertas a la vez en cada worker de gunicorn (cada una ocupa un thread)
+PROGRESS_MAX_SUBSCRIBERS = int(os.getenv('PROGRESS_MAX_SUBSCRIBERS', '2'))
+
+# Segundos que una suscripción espera a que llegue la carga de su trabajo
+PROGRESS_CHANNEL_WAIT = int(os.getenv('PROGRESS_CHANNEL_WAIT', '10'))
+
+# Antigüedad (segundos) desde la que el janitor elimina los archivos de eventos
+PROGRESS_MAX_AGE = int(os.getenv('PROGRESS_MAX_AGE', '3600'))
+
+# Intervalo de lectura del archivo de eventos y de los comentarios keep-alive
+_POLL_INTERVAL = 0.2
+_KEEPALIVE_INTERVAL = 15
+
+# Evento que cierra la suscripción
+FINAL_EVENT = "job_finished"
+
+_JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class UnknownJob(Exception):
+    """No hay ninguna carga con el id pedido"""
+
+
+class TooManySubscribers(Exception):
+    """El worker ya tiene ``PROGRESS_MAX_SUBSCRIBERS`` suscripciones abiertas"""
+
+
+def valid_job_id(job_id):
+    """Indica si ``job_id`` se puede usar como nombre de archivo"""
+    return bool(job_id) and _JOB_ID_PATTERN.match(job_id) is not None
+
+
+def _events_path(job_id):
+    return os.path.join(PROGRESS_DIR, f"{job_id}.events")
+
+
+def _marker_path(job_id):
+    return os.path.join(PROGRESS_DIR, f"{job_id}.subscribed")
+
+
+def _touch(path):
+    with open(path, 'a', encoding='utf-8'):
+        pass
+
+
+def progress_callback(job_id):
+    """
+    Callback de progreso de un trabajo
+
+    Args:
+        job_id: Id elegido por el cliente (ver ``valid_job_id``)
+
+    Returns:
+        callable: ``progress(evento, **datos)``; None si no hay ``job_id``
+    """
+    if not valid_job_id(job_id):
+        return None
+
+    path = _events_path(job_id)
+    marker = _marker_path(job_id)
+    started = time.perf_counter()
+
+    def progress(event, **data):
+        # Sin suscriptores no se escribe nada
+        if not os.path.exists(marker):
+            return
+        line = json.dumps({"event": event, "job_id": job_id,
+                           "elapsed": round(time.perf_counter() - started, 4), **data},
+                          ensure_ascii=False, default=str)
+        try:
+            with open(path, 'a', encoding='utf-8') as events:
+                events.write(line + "\n")
+        except OSError:
+            pass
+
+    return progress
+
+
+def open_channel(job_id, publish=False):
+    """
+    Abre el canal de eventos de una ejecución (crea o vacía su archivo)
+
+    Se llama al recibir la carga (``/execute-function`` con ``jobId``) o al
+    encolar el trabajo (``pipeline.jobs``): si el id ya se había usado, los
+    eventos de la ejecución anterior se descartan.
+
+    Args:
+        job_id: Id del trabajo
+        publish: Si es True, los eventos se escriben desde ya aunque nadie se
+            haya suscrito todavía (trabajos de /jobs, que se siguen después
+            de encolarlos)
+
+    Returns:
+        str: Ruta del archivo de eventos
+    """
+    os.makedirs(PROGRESS_DIR, exist_ok=True)
+    path = _events_path(job_id)
+    with open(path, 'w', encoding='utf-8'):
+        pass
+    if publish:
+        _touch(_marker_path(job_id))
+    return path
+
+
+def _wait_for_channel(job_id, timeout):
+    path = _events_path(job_id)
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        if time.monotonic() >= deadline:
+            return None
+        time.sleep(_POLL_INTERVAL)
+    return path
+
+
+class SubscriberLimit:
+    """
+    Cupo de suscripciones abiertas a la vez en el proceso
+
+    Args:
+        max_subscribers: Máximo de suscripciones (por defecto PROGRESS_MAX_SUBSCRIBERS)
+    """
+
+    def __init__(self, max_subscribers=None):
+        self.max_subscribers = PROGRESS_MAX_SUBSCRIBERS if max_subscribers is None else max_subscribers
+        self._lock = threading.Lock()
+        self.open = 0
+        self.served = 0
+        self.rejected = 0
+        self.unknown = 0
+
+    def acquire(self):
+        """Toma un lugar; False si ya no quedan"""
+        with self._lock:
+            if self.open >= self.max_subscribers:
+                self.rejected += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self, served=True):
+        """Devuelve un lugar (``served=False`` si el trabajo no existía)"""
+        with self._lock:
+            self.open -= 1
+            if served:
+                self.served += 1
+            else:
+                self.unknown += 1
+
+    def stats(self):
+        """Métricas de las suscripciones para el endpoint /metrics"""
+        with self._lock:
+            return {
+                "open": self.open,
+                "max_subscribers": self.max_subscribers,
+                "served": self.served,
+                "rejected": self.rejected,
+                "unknown": self.unknown,
+            }
+
+
+class Subscription:
+    """
+    Mensajes SSE de una suscripción (ver ``subscribe``)
+
+    Al terminar o cerrarse (WSGI llama a ``close`` aunque el cliente se
+    desconecte antes del primer mensaje) devuelve su lugar en el cupo.
+    """
+
+    __slots__ = ('_events', '_limit')
+
+    def __init__(self, events, limit):
+        self._events = events
+        self._limit = limit
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._events)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self):
+        self._events.close()
+        limit, self._limit = self._limit, None
+        if limit is not None:
+            limit.release()
+
+
+def subscribe(job_id, wait=None):
+    """
+    Suscripción a los eventos de un trabajo
+
+    Si la carga todavía no llega (el cliente se suscribe antes de enviar el
+    archivo a ``/execute-function``), espera a que se abra su canal.
+
+    Args:
+        job_id: Id del trabajo (ver ``valid_job_id``)
+        wait: Segundos que espera el canal (por defecto PROGRESS_CHANNEL_WAIT)
+
+    Returns:
+        Subscription: Mensajes SSE hasta ``job_finished`` o hasta
+            ``PROGRESS_IDLE_TIMEOUT`` segundos sin novedades
+
+    Raises:
+        TooManySubscribers: Si el proceso ya tiene el cupo lleno
+        UnknownJob: Si no se abrió un canal con ese id dentro de la espera
+    """
+    if not progress_subscribers.acquire():
+        raise TooManySubscribers(
+            f"Hay {progress_subscribers.max_subscribers} suscripciones abiertas en este worker")
+
+    path = _wait_for_channel(job_id, PROGRESS_CHANNEL_WAIT if wait is None else wait)
+    if path is None:
+        progress_subscribers.release(served=False)
+        raise UnknownJob(f"No hay una carga con el id {job_id}")
+    try:
+        _touch(_marker_path(job_id))
+    except OSError:
+        progress_subscribers.release(served=False)
+        raise
+    return Subscription(_events(job_id, path), progress_subscribers)
+
+
+def _events(job_id, path):
+    yield f"event: subscribed\ndata: {json.dumps({'job_id': job_id})}\n\n"
+
+    # El canal es el de la ejecución en curso: se lee desde su inicio
+    offset = 0
+    pending = ""
+    last_event = last_keepalive = time.monotonic()
+    while True:
+        try:
+            with open(path, 'r', encoding='utf-8') as events:
+                # Una nueva ejecución con el mismo id vació el archivo
+                if os.fstat(events.fileno()).st_size < offset:
+                    offset = 0
+                    pending = ""
+                events.seek(offset)
+                chunk = events.read()
+                offset = events.tell()
+        except OSError:
+            return
+
+        if chunk:
+            last_event = time.monotonic()
+            pending += chunk
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                if not line:
+                    continue
+                event = json.loads(line).get("event", "message")
+                yield f"event: {event}\ndata: {line}\n\n"
+                if event == FINAL_EVENT:
+                    return
+
+        now = time.monotonic()
+        if now - last_event >= PROGRESS_IDLE_TIMEOUT:
+            yield f"event: timeout\ndata: {json.dumps({'job_id': job_id})}\n\n"
+            return
+        if now - last_keepalive >= _KEEPALIVE_INTERVAL:
+            last_keepalive = now
+            yield ": keep-alive\n\n"
+
+        time.sleep(_POLL_INTERVAL)
+
+
+def sweep_progress_files(max_age=None, now=None):
+    """
+    Elimina archivos de eventos y marcadores de suscripción antiguos
+
+    Args:
+        max_age: Antigüedad mínima en segundos (por defecto PROGRESS_MAX_AGE)
+        now: Marca de tiempo de referencia (por defecto time.time())
+
+    Returns:
+        int: Cantidad de archivos eliminados
+    """
+    max_age = PROGRESS_MAX_AGE if max_age is None else max_age
+    now = time.time() if now is None else now
+
+    removed = 0
+    try:
+        entries = os.scandir(PROGRESS_DIR)
+    except OSError:
+        return 0
+
+    with entries:
+        for entry in entries:
+            try:
+                if not entry.name.endswith((".events", ".subscribed")) \
+                        or not entry.is_file(follow_symlinks=False):
+                    continue
+                if now - entry.stat(follow_symlinks=False).st_mtime < max_age:
+                    continue
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                continue
+
+    if removed:
+        print(f"🧹 Archivos de progreso expirados eliminados: {removed}")
+    return removed
+
+
+# Cupo compartido por todo el proceso
+progress_subscribers = SubscriberLimit()
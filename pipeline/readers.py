@@ -0,0 +1,493 @@
+"""
+Etapa de lectura: abre el libro Excel y entrega sus hojas
+
+Hay dos modos de lectura (``EXCEL_READER``):
+
+    'pandas': ``pd.ExcelFile``; cada hoja se lee completa en un DataFrame
+    'chunks': openpyxl en modo ``read_only`` con ``iter_rows(values_only=True)``;
+        las hojas se entregan en partes de ``READ_CHUNK_ROWS`` filas, así la
+        memoria usada depende del tamaño de la parte y no del de la hoja
+
+Cada parte pasa por el mismo ``TextParser`` que usa ``pd.read_excel``, con el
+encabezado de la hoja y el índice de fila global, así que las
+transformaciones reciben los mismos valores. La única diferencia posible es
+el tipo inferido de una columna, que pandas decide mirando la columna
+completa (por ejemplo, enteros con alguna celda vacía más abajo pasan a
+float). ``SheetChunks`` lo verifica al terminar y, si alguna de las columnas
+que usó el procesador difiere, el procesador vuelve a leer la hoja por partes
+forzando en cada una el tipo de la columna completa (``normalized``). Solo
+si no hay un tipo equivalente (booleanos mezclados con otros valores, que
+pandas convierte a enteros) se lee la hoja completa.
+
+``TextParser`` y el reader openpyxl de ``pd.ExcelFile`` (``_reader``,
+``get_sheet_data``) no son API pública de pandas. Si una versión de pandas no
+los trae, el modo 'chunks' y ``read_sheet_data`` se desactivan y las hojas se
+leen con ``pd.ExcelFile.parse``: mismo resultado, con más lecturas por hoja.
+"""
+
+import os
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import (is_bool_dtype, is_datetime64_any_dtype, is_float_dtype, is_numeric_dtype,
+                              is_object_dtype, is_string_dtype)
+from pandas.errors import EmptyDataError
+
+try:
+    from pandas.io.parsers import TextParser
+except ImportError:  # API interna de pandas: sin ella se lee con pd.ExcelFile.parse
+    TextParser = None
+
+# Modo de lectura por defecto: 'pandas' o 'chunks'
+EXCEL_READER = os.getenv('EXCEL_READER', 'pandas')
+
+# Filas por parte en el modo 'chunks'
+READ_CHUNK_ROWS = int(os.getenv('READ_CHUNK_ROWS', '5000'))
+
+_ZIP_SIGNATURE = b"PK\x03\x04"
+
+
+def open_workbook(source, engine=None, fallback=False, reader=None):
+    """
+    Abre un libro Excel
+
+    Args:
+        source: Ruta del archivo o buffer binario
+        engine: Engine de pandas a usar (None = detección automática)
+        fallback: Si es True y el engine falla, reintenta con detección automática
+        reader: 'pandas' o 'chunks' (por defecto EXCEL_READER); 'chunks' solo
+            aplica a archivos .xlsx leídos con openpyxl
+
+    Returns:
+        pd.ExcelFile | ChunkedWorkbook: Libro abierto, listo para leer sus hojas
+    """
+    if (reader or EXCEL_READER) == 'chunks' and engine in (None, 'openpyxl') and TextParser is not None \
+            and _is_xlsx(source):
+        try:
+            return ChunkedWorkbook(source)
+        except Exception as read_error:
+            print(f"⚠️ No se pudo abrir el libro en modo por partes, se usa pandas: {read_error}")
+            if hasattr(source, 'seek'):
+                source.seek(0)
+
+    if engine is None:
+        return pd.ExcelFile(source)
+
+    if engine == 'openpyxl' and fallback and not _is_xlsx(source):
+        # openpyxl solo lee archivos ZIP: no vale la pena intentarlo con un .xls
+        print(f"🔄 El archivo no es .xlsx, se usa engine automático en vez de '{engine}'")
+        return pd.ExcelFile(source)
+
+    try:
+        print(f"🔧 Usando engine '{engine}'")
+        return pd.ExcelFile(source, engine=engine)
+    except Exception as read_error:
+        if not fallback:
+            raise
+        print(f"❌ Error leyendo archivo Excel: {read_error}")
+        print("🔄 Intentando con engine automático...")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        return pd.ExcelFile(source)
+
+
+def _is_xlsx(source):
+    """Indica si el archivo es un ZIP (xlsx/xlsm), sin mover la posición del buffer"""
+    try:
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return f.read(4) == _ZIP_SIGNATURE
+        position = source.tell()
+        signature = source.read(4)
+        source.seek(position)
+        return signature == _ZIP_SIGNATURE
+    except (OSError, AttributeError, ValueError):
+        return False
+
+
+def _convert(value):
+    """
+    Valor de una celda tal como lo entrega el reader openpyxl de pandas:
+    vacío -> "", números enteros -> int, errores (#N/A, #DIV/0!...) -> NaN
+
+    Con ``values_only`` no se ve el tipo de celda, así que un texto que sea
+    exactamente un código de error también se lee como NaN.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        integer = int(value)
+        return integer if integer == value else float(value)
+    if isinstance(value, str) and value in _ERROR_CODES:
+        return np.nan
+    return value
+
+
+def _error_codes():
+    from openpyxl.cell.cell import ERROR_CODES
+    return frozenset(ERROR_CODES)
+
+
+_ERROR_CODES = _error_codes()
+
+
+def _pad(rows, width):
+    return [row + [""] * (width - len(row)) if len(row) < width else row for row in rows]
+
+
+def _strip(row):
+    """Fila sin celdas vacías al final"""
+    end = len(row)
+    while end and row[end - 1] == "":
+        end -= 1
+    return row if end == len(row) else row[:end]
+
+
+def _rows_needed(header, skiprows, nrows):
+    """Filas del archivo que lee pandas para ``nrows`` filas (``_calc_rows``)"""
+    return (1 if header is None else 1 + header) + nrows + (skiprows or 0)
+
+
+def _parse_rows(data, header=0, skiprows=None, nrows=None, usecols=None):
+    """
+    DataFrame de filas sin celdas vacías al final, como ``pd.ExcelFile.parse``
+    con el engine openpyxl: quita las filas vacías del final, completa el
+    ancho y usa el mismo ``TextParser``
+    """
+    data = list(data)
+    while data and not data[-1]:
+        data.pop()
+    if not data:
+        return pd.DataFrame()
+    data = _pad(data, max(len(row) for row in data))
+
+    try:
+        return TextParser(data, header=header, skiprows=skiprows, nrows=nrows, usecols=usecols,
+                          skip_blank_lines=False).read(nrows)
+    except EmptyDataError:
+        return pd.DataFrame()
+
+
+def read_sheet_data(workbook, sheet_name):
+    """
+    Lee una hoja una sola vez, para sacar de la misma lectura sus primeras
+    filas (búsqueda de encabezado) y el resto
+
+    Args:
+        workbook: Libro abierto con ``open_workbook``
+        sheet_name: Nombre de la hoja
+
+    Returns:
+        SheetData: Filas de la hoja, o None si el engine del libro no es
+            openpyxl o esta versión de pandas no expone su reader (entonces
+            hay que usar ``workbook.parse``)
+    """
+    if isinstance(workbook, ChunkedWorkbook):
+        rows = list(workbook.rows(sheet_name))
+        while rows and not rows[-1]:
+            rows.pop()
+        return SheetData(_pad(rows, max((len(row) for row in rows), default=0)))
+
+    if getattr(workbook, 'engine', None) != 'openpyxl' or TextParser is None:
+        return None
+    # Mismas llamadas que pd.ExcelFile.parse, pero quedándose con las filas
+    reader = getattr(workbook, '_reader', None)
+    if not (hasattr(reader, 'get_sheet_by_name') and hasattr(reader, 'get_sheet_data')):
+        return None
+    sheet = reader.get_sheet_by_name(sheet_name)
+    return SheetData(reader.get_sheet_data(sheet, None))
+
+
+class SheetData:
+    """
+    Filas de una hoja tal como las entrega openpyxl a pandas (sin filas vacías
+    al final y todas del mismo ancho)
+
+    ``parse`` tiene los argumentos de ``pd.ExcelFile.parse`` y devuelve lo
+    mismo, sin volver a leer el archivo.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def parse(self, header=0, skiprows=None, nrows=None, usecols=None):
+        if nrows is None:
+            return _parse_rows(self.rows, header, skiprows, usecols=usecols)
+        # pandas lee solo las primeras filas, con el ancho y el recorte de esas filas
+        window = self.rows[:_rows_needed(header, skiprows, nrows)]
+        return _parse_rows([_strip(row) for row in window], header, skiprows, nrows, usecols)
+
+
+def _frame(rows, header_row, offset=0, usecols=None, dtypes=None):
+    """
+    DataFrame de un grupo de filas, con el mismo parser que ``pd.read_excel``
+
+    Args:
+        rows: Filas ya convertidas y del mismo ancho
+        header_row: Fila de encabezado (mismo ancho) o None para columnas 0..n-1
+        offset: Índice de la primera fila dentro de la hoja
+        usecols: Posiciones de las columnas a leer (por defecto, todas)
+        dtypes: Tipo forzado por columna (por defecto, el que infiere pandas)
+    """
+    data = rows if header_row is None else [header_row] + rows
+    if not data:
+        return pd.DataFrame()
+    try:
+        df = TextParser(data, header=None if header_row is None else 0, usecols=usecols,
+                        skip_blank_lines=False, dtype=dtypes or None).read()
+    except EmptyDataError:
+        return pd.DataFrame()
+    if offset:
+        df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
+
+
+class ChunkedWorkbook:
+    """
+    Libro .xlsx abierto con openpyxl en modo ``read_only``
+
+    Expone ``sheet_names`` y ``parse`` como ``pd.ExcelFile`` (para las lecturas
+    chicas, como buscar el encabezado) y ``iter_chunks`` para leer una hoja
+    por partes.
+
+    Args:
+        source: Ruta del archivo o buffer binario
+        chunk_rows: Filas por parte (por defecto READ_CHUNK_ROWS)
+    """
+
+    chunked = True
+
+    def __init__(self, source, chunk_rows=None):
+        from openpyxl import load_workbook
+
+        self.book = load_workbook(source, read_only=True, data_only=True, keep_links=False)
+        self.chunk_rows = chunk_rows or READ_CHUNK_ROWS
+
+    @property
+    def sheet_names(self):
+        return self.book.sheetnames
+
+    def close(self):
+        self.book.close()
+
+    def rows(self, sheet_name):
+        """
+        Filas de la hoja convertidas como en pandas, sin celdas vacías al
+        final de cada fila (una fila vacía es ``[]``)
+        """
+        sheet = self.book[sheet_name]
+        sheet.reset_dimensions()
+        for row in sheet.iter_rows(values_only=True):
+            values = [_convert(value) for value in row]
+            while values and values[-1] == "":
+                values.pop()
+            yield values
+
+    def parse(self, sheet_name, header=0, skiprows=None, nrows=None, usecols=None):
+        """
+        Lee una hoja (o sus primeras ``nrows`` filas) completa, igual que
+        ``pd.ExcelFile.parse`` con esos argumentos
+        """
+        rows = self.rows(sheet_name)
+        if nrows is not None:
+            rows = islice(rows, _rows_needed(header, skiprows, nrows))
+        return _parse_rows(rows, header, skiprows, nrows, usecols)
+
+    def parse_head(self, sheet_name, nrows):
+        """
+        Primeras ``nrows`` filas sin encabezado, sin perder el resto de la hoja
+
+        Returns:
+            tuple: (DataFrame como ``parse(header=None, nrows=nrows)``, iterador
+                de todas las filas para ``iter_chunks``)
+        """
+        rows = self.rows(sheet_name)
+        window = list(islice(rows, _rows_needed(None, None, nrows)))
+        return _parse_rows(window, None, None, nrows), chain(window, rows)
+
+    def iter_chunks(self, sheet_name, header=0, skiprows=0, rows=None, usecols=None):
+        """
+        Hoja en partes de ``chunk_rows`` filas
+
+        Args:
+            sheet_name: Nombre de la hoja
+            header: 0 si la primera fila (después de ``skiprows``) es el
+                encabezado, None si no hay encabezado
+            skiprows: Filas a saltar al inicio
+            rows: Filas ya abiertas con ``parse_head`` (por defecto se lee la hoja)
+            usecols: Posiciones de las columnas a leer (por defecto, todas)
+
+        Returns:
+            SheetChunks: Iterable de DataFrames con el índice de fila de la hoja
+        """
+        return SheetChunks(self, sheet_name, header, skiprows, rows, usecols)
+
+
+class SheetChunks:
+    """
+    Partes de una hoja (ver ``ChunkedWorkbook.iter_chunks``)
+
+    Después de recorrerla, ``mismatched`` tiene las columnas cuyo contenido
+    podría diferir de leer la hoja completa: las que no tienen el mismo tipo
+    en todas las partes o faltan en alguna (por ser más angosta). Si el
+    procesador usó alguna, hay que volver a leerla con ``normalized``.
+    """
+
+    def __init__(self, workbook, sheet_name, header=0, skiprows=0, rows=None, usecols=None, dtypes=None,
+                 width=0):
+        self.workbook = workbook
+        self.sheet_name = sheet_name
+        self.source_rows = rows
+        self.usecols = usecols
+        self.header = header
+        self.skiprows = skiprows or 0
+        self.dtypes = dtypes or {}
+        self.width = width
+        self.mismatched = set()
+        self.rows = 0
+        self._dtypes = {}  # columna -> tipos inferidos en las partes con datos
+        self._blank = set()
+        self._numbers = set()  # columnas con números (no textos numéricos) en alguna parte numérica
+        self._bools = set()  # columnas con algún booleano
+        self._labels = []
+
+    def __iter__(self):
+        rows = self.source_rows
+        if rows is None:
+            rows = self.workbook.rows(self.sheet_name)
+
+        # Las filas saltadas también cuentan para el ancho de la hoja; las
+        # columnas pedidas existen en la hoja completa aunque una parte no llegue a ellas
+        width = max(self.width, max(self.usecols) + 1 if self.usecols else 0)
+        for row in islice(rows, self.skiprows):
+            width = max(width, len(row))
+
+        header_row = None
+        if self.header is not None:
+            header_row = next(rows, None)
+            if header_row is None:
+                yield pd.DataFrame()
+                return
+            width = max(width, len(header_row))
+
+        chunk = []
+        blank = 0
+        offset = 0
+        yielded = False
+        for row in rows:
+            if not row:
+                # Las filas vacías solo se agregan si después viene una con datos
+                blank += 1
+                continue
+            chunk.extend([] for _ in range(blank))
+            blank = 0
+            chunk.append(row)
+            if len(chunk) >= self.workbook.chunk_rows:
+                width = max(width, max(len(r) for r in chunk))
+                yield self._observe(chunk, header_row, width, offset)
+                offset += len(chunk)
+                chunk = []
+                yielded = True
+
+        if chunk or not yielded:
+            if chunk:
+                width = max(width, max(len(r) for r in chunk))
+            if header_row is None and not chunk:
+                yield pd.DataFrame()
+            else:
+                yield self._observe(chunk, header_row, width, offset)
+
+        self.width = width
+        # Una parte más angosta que la hoja completa no tiene sus últimas columnas
+        every = set().union(*self._labels) if self._labels else set()
+        for labels in self._labels:
+            self.mismatched |= every - labels
+        for name in self._blank:
+            if not all(_absorbs_blanks(dtype) for dtype in self._dtypes.get(name, ())):
+                self.mismatched.add(name)
+
+    @property
+    def consistent(self):
+        """Si todas las columnas equivalen a las de la hoja completa"""
+        return not self.mismatched
+
+    def normalized(self, columns=None):
+        """
+        Las mismas partes, leídas otra vez con el ancho de la hoja completa y,
+        en cada columna de ``mismatched``, el tipo que pandas infiere al leerla
+        completa: float si todas las partes son numéricas, texto si las
+        partes numéricas solo tenían textos numéricos, el tipo de las partes
+        con datos si solo difieren por partes vacías y object si no
+
+        Args:
+            columns: Columnas de ``mismatched`` a corregir (por defecto, todas)
+
+        Returns:
+            SheetChunks: Nueva lectura por partes (sin recorrer), o None si
+                alguna columna no tiene un tipo equivalente
+        """
+        dtypes = {}
+        for name in self.mismatched if columns is None else columns:
+            seen = self._dtypes.get(name, set())
+            if name in self._bools or any(is_bool_dtype(dtype) for dtype in seen):
+                # pandas convierte los booleanos de una columna mixta a números
+                return None
+            if not seen or (len(seen) == 1 and _absorbs_blanks(next(iter(seen)))):
+                continue  # solo faltaba en partes más angostas
+            text = [dtype for dtype in seen if is_string_dtype(dtype) and not is_object_dtype(dtype)]
+            if all(is_numeric_dtype(dtype) for dtype in seen):
+                dtypes[name] = 'float64'
+            elif len(seen) == 1:
+                dtypes[name] = next(iter(seen))
+            elif text and name not in self._numbers and all(dtype in text or is_numeric_dtype(dtype)
+                                                            for dtype in seen):
+                dtypes[name] = text[0]
+            else:
+                dtypes[name] = object
+        return SheetChunks(self.workbook, self.sheet_name, self.header, self.skiprows, None, self.usecols,
+                           {**self.dtypes, **dtypes}, self.width)
+
+    def _observe(self, chunk, header_row, width, offset):
+        chunk = _pad(chunk, width)
+        df = _frame(chunk, None if header_row is None else _pad([header_row], width)[0], offset,
+                    self.usecols, self.dtypes)
+        self._labels.append(set(df.columns))
+        self.rows += len(df)
+        if not len(df):
+            return df
+
+        for index, name in enumerate(df.columns):
+            values = df[name]
+            if values.isna().all():
+                # Columna vacía en esta parte: se lee como float (salvo que su
+                # tipo esté forzado), que pandas absorbe en el tipo de la columna
+                # completa salvo enteros/booleanos
+                if name not in self.dtypes:
+                    self._blank.add(name)
+                continue
+            seen = self._dtypes.setdefault(name, set())
+            seen.add(values.dtype)
+            if len(seen) > 1:
+                self.mismatched.add(name)
+            if is_numeric_dtype(values.dtype) or is_object_dtype(values.dtype):
+                # Una parte de textos numéricos ("7.25") se lee como número, pero
+                # junto a otros textos la columna completa sigue siendo texto; los
+                # booleanos pasan a float (con vacíos) o a int (con otros tipos)
+                position = self.usecols[index] if self.usecols else index
+                if name not in self._numbers and any(_is_number(row[position]) for row in chunk):
+                    self._numbers.add(name)
+                if name not in self._bools and any(isinstance(row[position], bool) for row in chunk):
+                    self._bools.add(name)
+        return df
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _absorbs_blanks(dtype):
+    """Si una columna de este tipo sigue igual al sumarle una parte vacía (leída como float)"""
+    return is_float_dtype(dtype) or is_object_dtype(dtype) or is_datetime64_any_dtype(dtype)
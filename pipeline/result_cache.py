@@ -0,0 +1,287 @@
+"""
+Caché de resultados por contenido del archivo
+
+Los usuarios vuelven a subir el mismo libro (reintentos, doble clic, el
+frontend que repite la carga tras un corte de red). El resultado de un
+procesador del pipeline depende solo de los bytes del archivo, del código
+del procesador, del usuario y del formato pedido, así que se guarda bajo esa
+clave y la segunda carga responde sin volver a leer el libro.
+
+La huella del archivo (SHA-256) se calcula mientras werkzeug lo recibe (ver
+``pipeline.uploads.HashingSpool``). Hay dos niveles:
+
+- Memoria: LRU por proceso acotado a ``RESULT_CACHE_MAX_BYTES``.
+- Disco (opcional): un archivo por resultado en ``RESULT_CACHE_DIR``,
+  compartido por los workers de gunicorn; el janitor elimina los que no se
+  usan hace ``RESULT_CACHE_MAX_AGE`` segundos y los más antiguos si el
+  directorio supera ``RESULT_CACHE_DISK_MAX_BYTES``.
+
+Solo se guardan resultados exitosos de procesadores del pipeline: las
+funciones antiguas pueden escribir en la base de datos, y los formatos
+'arrow'/'parquet' apuntan a archivos de descarga que expiran.
+"""
+
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from pipeline.artifacts import ARTIFACT_FORMATS
+
+# Tamaño máximo de los resultados guardados en memoria por proceso (0 = sin caché)
+RESULT_CACHE_MAX_BYTES = int(os.getenv('RESULT_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Directorio del nivel en disco, compartido entre workers (vacío = solo memoria)
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '')
+
+# Segundos sin uso tras los que el janitor elimina un resultado del disco
+RESULT_CACHE_MAX_AGE = int(os.getenv('RESULT_CACHE_MAX_AGE', '86400'))
+
+# Tamaño máximo del directorio del nivel en disco
+RESULT_CACHE_DISK_MAX_BYTES = int(os.getenv('RESULT_CACHE_DISK_MAX_BYTES', str(1024 * 1024 * 1024)))
+
+_SUFFIX = ".json"
+
+
+def _code_version():
+    """Huella del código del pipeline: un cambio invalida lo guardado en disco"""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        with open(path, 'rb') as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:16]
+
+
+CODE_VERSION = _code_version()
+
+
+def is_success(body):
+    """
+    Indica si un resultado serializado con ``worker_pool.encode_result`` fue exitoso
+
+    ``encode_result`` ordena las claves, así que el ``success`` del nivel
+    superior es de las últimas y se busca desde el final sin decodificar el JSON.
+    """
+    position = body.rfind(b'"success":')
+    return position >= 0 and body.startswith(b'true', position + len(b'"success":'))
+
+
+class ResultCache:
+    """
+    Caché de resultados en memoria (LRU por bytes) con un nivel en disco opcional
+
+    Args:
+        max_bytes: Tamaño máximo en memoria (por defecto RESULT_CACHE_MAX_BYTES)
+        directory: Directorio del nivel en disco (por defecto RESULT_CACHE_DIR)
+    """
+
+    def __init__(self, max_bytes=None, directory=None):
+        self.max_bytes = RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.directory = RESULT_CACHE_DIR if directory is None else directory
+        self._entries = OrderedDict()  # clave -> resultado en JSON (bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.directory)
+
+    def key_for(self, entry, digest, user_id, output_format='sql', batch_size=None):
+        """
+        Clave del resultado de una carga (también la usa ``pipeline.singleflight``),
+        o None si no se puede guardar
+
+        Args:
+            entry: ``FunctionEntry`` resuelta por el registro
+            digest: SHA-256 del archivo subido (hex), o None si no se calculó
+            user_id: ID del usuario autenticado
+            output_format: Formato de salida
+            batch_size: Registros por sentencia en 'sql_batch'
+
+        Returns:
+            str: Clave en hex (también es el nombre del archivo en disco)
+        """
+        # Se importa aquí para evitar el ciclo pipeline.core -> pipeline.uploads -> este módulo
+        from pipeline.core import Processor
+
+        if not digest or output_format in ARTIFACT_FORMATS:
+            return None
+        if not isinstance(getattr(entry.module, 'PROCESSOR', None), Processor):
+            return None
+
+        stat = os.stat(entry.path)
+        version = f"{entry.path}:{stat.st_mtime_ns}:{stat.st_size}:{CODE_VERSION}"
+        parts = (digest, version, str(user_id), output_format, str(batch_size or ''))
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """
+        Resultado guardado bajo ``key``
+
+        Returns:
+            bytes: Resultado en JSON, o None si no está
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return body
+
+        body = self._read(key)
+        with self._lock:
+            if body is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._remember(key, body)
+        return body
+
+    def put(self, key, body):
+        """Guarda un resultado exitoso (los fallidos se vuelven a procesar)"""
+        if not self.enabled or not is_success(body):
+            return
+        with self._lock:
+            self.stores += 1
+        self._remember(key, body)
+        self._write(key, body)
+
+    def _remember(self, key, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+                self.evictions += 1
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + _SUFFIX)
+
+    def _read(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as cached:
+                body = cached.read()
+            # La antigüedad del archivo es la de su último uso
+            os.utime(path)
+        except OSError:
+            return None
+        return body
+
+    def _write(self, key, body):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Escritura atómica: otro worker nunca lee un archivo a medias
+            fd, tmp_path = tempfile.mkstemp(prefix=".", suffix=".tmp", dir=self.directory)
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(body)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"⚠️ No se pudo guardar el resultado en {self.directory}: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Métricas de la caché para el endpoint /metrics"""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "results_cached": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk": bool(self.directory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def sweep_result_cache(max_age=None, max_bytes=None, now=None, directory=None):
+    """
+    Elimina del nivel en disco los resultados sin uso y, si el directorio
+    supera ``max_bytes``, los de uso más antiguo
+
+    Args:
+        max_age: Segundos sin uso (por defecto RESULT_CACHE_MAX_AGE)
+        max_bytes: Tamaño máximo del directorio (por defecto RESULT_CACHE_DISK_MAX_BYTES)
+        now: Marca de tiempo de referencia (por defecto time.time())
+        directory: Directorio a barrer (por defecto RESULT_CACHE_DIR)
+
+    Returns:
+        int: Cantidad de archivos eliminados
+    """
+    directory = RESULT_CACHE_DIR if directory is None else directory
+    if not directory:
+        return 0
+    max_age = RESULT_CACHE_MAX_AGE if max_age is None else max_age
+    max_bytes = RESULT_CACHE_DISK_MAX_BYTES if max_bytes is None else max_bytes
+    now = time.time() if now is None else now
+
+    kept = []
+    removed = 0
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return 0
+
+    with entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                # Resultados sin uso, temporales de una escritura interrumpida y
+                # locks de ``pipeline.singleflight``
+                if entry.name.endswith((_SUFFIX, ".tmp", ".lock")) and now - stat.st_mtime >= max_age:
+                    os.unlink(entry.path)
+                    removed += 1
+                elif entry.name.endswith(_SUFFIX):
+                    kept.append((stat.st_mtime, stat.st_size, entry.path))
+            except OSError:
+                continue
+
+    total = sum(size for _, size, _ in kept)
+    for _, size, path in sorted(kept):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            removed += 1
+        except OSError:
+            pass
+        total -= size
+
+    if removed:
+        print(f"🧹 Resultados en caché expirados eliminados: {removed}")
+    return removed
+
+
+# Instancia compartida por todo el proceso
+result_cache = ResultCache()
@@ -0,0 +1,133 @@
+"""
+Coalescencia de cargas idénticas en curso (single-flight)
+
+Si el frontend envía el mismo archivo dos veces a la vez, la caché de
+resultados no alcanza: la segunda carga llega antes de que la primera
+termine. ``SingleFlight`` hace que las cargas con la misma clave (la de
+``pipeline.result_cache``) esperen a la primera y compartan su resultado.
+
+Dentro de un worker de gunicorn las cargas repetidas esperan a la primera
+en memoria. Entre workers, si la caché tiene nivel en disco, la primera
+toma un lock (``flock``) sobre ``<clave>.lock`` en ese directorio mientras
+procesa: las demás esperan el lock y leen el resultado que quedó en disco.
+"""
+
+import os
+import threading
+
+from pipeline.result_cache import RESULT_CACHE_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo coalescencia dentro del proceso
+    fcntl = None
+
+
+class _Call:
+    """Carga en curso: quienes llegan después esperan ``done``"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez las cargas con la misma clave que coinciden en el tiempo
+
+    Args:
+        lock_dir: Directorio de los locks entre procesos (None = solo en este proceso)
+    """
+
+    def __init__(self, lock_dir=None):
+        self.lock_dir = lock_dir
+        self._calls = {}  # clave -> _Call en curso
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.coalesced_workers = 0
+
+    def do(self, key, compute, recheck=None):
+        """
+        Ejecuta ``compute``, o espera a la carga con la misma clave que ya está en curso
+
+        Args:
+            key: Clave de la carga
+            compute: Función sin argumentos que produce (y guarda) el resultado
+            recheck: Función sin argumentos que busca el resultado que dejó otro
+                proceso (None si no lo hay); solo se usa con ``lock_dir``
+
+        Returns:
+            tuple: (resultado, si se compartió el de otra carga)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._lead(key, compute, recheck)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, shared
+
+    def _lead(self, key, compute, recheck):
+        if not self.lock_dir or fcntl is None or recheck is None:
+            return compute(), False
+
+        try:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            lock_file = open(os.path.join(self.lock_dir, key + ".lock"), 'a')
+        except OSError:
+            return compute(), False
+
+        with lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                waited = False
+            except BlockingIOError:
+                # Otro worker está procesando el mismo archivo
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                waited = True
+            try:
+                if waited:
+                    result = recheck()
+                    if result is not None:
+                        with self._lock:
+                            self.coalesced_workers += 1
+                        return result, True
+                return compute(), False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        """Métricas de la coalescencia para el endpoint /metrics"""
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "coalesced_workers": self.coalesced_workers,
+            }
+
+
+# Instancia compartida por todo el proceso (locks junto a la caché en disco)
+single_flight = SingleFlight(RESULT_CACHE_DIR or None)
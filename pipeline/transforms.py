@@ -0,0 +1,361 @@
+"""
+Transformaciones vectorizadas
+
+Versiones por columna completa de las conversiones que los procesadores
+hacían fila por fila. Cada helper reproduce exactamente el resultado de la
+versión escalar equivalente (indicada en su docstring), de modo que el SQL
+generado no cambia; solo se evita recorrer la hoja con ``iterrows``.
+"""
+
+import datetime as dt
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+# Mensaje de int(float('inf')), que aborta la fila en vez de omitirla
+ERROR_INFINITO = "cannot convert float infinity to integer"
+
+
+def column(df, idx, default=None):
+    """
+    Columna ``idx`` de una hoja leída sin encabezado
+
+    Equivale a ``cell(row, idx, default)`` aplicado a cada fila.
+    """
+    if idx in df.columns:
+        return df[idx]
+    return pd.Series(default, index=df.index, dtype=object)
+
+
+def _scalar_date(value):
+    try:
+        return pd.to_datetime(value, errors='coerce')
+    except (ValueError, TypeError, OverflowError):
+        return pd.NaT
+
+
+def coerce_dates(series):
+    """
+    Fechas de una columna; lo que no es fecha queda como NaT
+
+    Equivale a ``val if isinstance(val, pd.Timestamp) else
+    pd.to_datetime(val, errors='coerce')`` por celda. Las fechas y los textos
+    se convierten en bloque; el resto (números, booleanos, horas sueltas, que
+    en la práctica son pocas celdas) pasa por la conversión escalar.
+    """
+    if is_datetime64_any_dtype(series):
+        return series
+    if len(series) == 0:
+        return pd.Series(pd.NaT, index=series.index, dtype='datetime64[ns]')
+
+    values = series.astype(object)
+    present = values.notna()
+    kinds = values.map(type)
+    is_datetime = present & kinds.map(lambda kind: issubclass(kind, dt.datetime))
+    is_text = present & (kinds == str)
+
+    # Conversión en bloque; lo que quede NaT se reintenta celda por celda,
+    # porque to_datetime sobre una columna unifica la resolución y puede
+    # descartar fechas que la versión escalar sí acepta
+    pieces = []
+    scalar = present & ~is_datetime & ~is_text
+    for mask, options in ((is_datetime, {}), (is_text, {'format': 'mixed'})):
+        if not mask.any():
+            continue
+        parsed = pd.to_datetime(values[mask], errors='coerce', **options)
+        failed = parsed.isna()
+        scalar[failed[failed].index] = True
+        pieces.append(parsed[~failed])
+
+    if scalar.any():
+        parsed = map_unique(values[scalar], _scalar_date)
+        parsed = parsed[parsed.map(lambda value: value is not pd.NaT)]
+        pieces.append(parsed)
+
+    return _combine_dates(pieces, series.index)
+
+
+def _raises_on_parse(value):
+    try:
+        pd.to_datetime(value)
+        return False
+    except Exception:
+        return True
+
+
+def date_parse_errors(series, dates):
+    """
+    Celdas con valor en las que ``pd.to_datetime(val)`` (sin ``errors='coerce'``) lanza una excepción
+
+    Args:
+        series: Columna original
+        dates: Resultado de ``coerce_dates(series)``
+
+    Returns:
+        pd.Series: Máscara booleana. Los valores que pandas convierte en NaT
+        sin fallar (por ejemplo "NaT" o "") no se incluyen.
+    """
+    result = pd.Series(False, index=series.index)
+    candidates = series.notna() & dates.isna()
+    if candidates.any():
+        result[candidates] = map_unique(series[candidates], _raises_on_parse).to_numpy(dtype=bool)
+    return result
+
+
+# Resoluciones de datetime64, de menor a mayor
+_UNITS = ('s', 'ms', 'us', 'ns')
+
+
+def _combine_dates(pieces, index):
+    pieces = [piece for piece in pieces if len(piece)]
+    if not pieces:
+        return pd.Series(pd.NaT, index=index, dtype='datetime64[ns]')
+
+    try:
+        typed = []
+        for piece in pieces:
+            if not is_datetime64_any_dtype(piece):
+                units = {value.unit for value in piece}
+                if len(units) != 1:
+                    raise ValueError("resoluciones mixtas")
+                piece = piece.astype(f"datetime64[{units.pop()}]")
+            typed.append(piece)
+
+        # Unificar en la resolución más fina (falla si alguna fecha no cabe)
+        dtypes = {piece.dtype for piece in typed}
+        if len(dtypes) > 1:
+            unit = max((np.datetime_data(dtype)[0] for dtype in dtypes), key=_UNITS.index)
+            typed = [piece.astype(f"datetime64[{unit}]") for piece in typed]
+    except (ValueError, TypeError, OverflowError, AttributeError):
+        # Se entregan los Timestamp tal cual (columna object)
+        combined = pd.concat([piece.astype(object) for piece in pieces])
+        return combined.reindex(index)
+
+    combined = typed[0] if len(typed) == 1 else pd.concat(typed)
+    return combined.reindex(index)
+
+
+def merge_dates(index, *pieces):
+    """
+    Une columnas parciales de fechas (cada una con parte de las filas)
+
+    Args:
+        index: Índice de la hoja completa
+        pieces: Series de fechas; las filas que no aparecen quedan NaT
+    """
+    return _combine_dates([piece[piece.notna()] for piece in pieces], index)
+
+
+def yyyymmdd_dates(numbers):
+    """
+    Fechas de números con formato YYYYMMDD (20250728 -> 2025-07-28)
+
+    Equivale a ``datetime(año, mes, día)`` sobre los dígitos de ``int(val)``:
+    la parte entera debe tener 8 dígitos y formar una fecha válida; el resto
+    queda NaT. Año, mes y día se obtienen con aritmética entera sobre la
+    columna completa.
+
+    Args:
+        numbers: Serie de floats (por ejemplo, el resultado de ``to_float``)
+    """
+    values = numbers.to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        valid = np.isfinite(values) & (values >= 1e7) & (values < 1e8)
+    number = np.where(valid, np.trunc(np.where(valid, values, 0)), 0).astype(np.int64)
+    year, month, day = number // 10000, number // 100 % 100, number % 100
+    valid &= (month >= 1) & (month <= 12) & (day >= 1)
+
+    # Primer día del mes + (día - 1); si el día se sale del mes, el mes cambia
+    first = ((year - 1970) * 12 + (month - 1)).astype('datetime64[M]')
+    dates = first.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+    valid &= dates.astype('datetime64[M]') == first
+
+    result = np.where(valid, dates.astype('datetime64[s]'), np.datetime64('NaT', 's'))
+    return pd.Series(result, index=numbers.index)
+
+
+def rejection_codes(index, rules):
+    """
+    Motivo por el que se descarta cada fila, como código entero
+
+    Args:
+        index: Índice de la hoja
+        rules: Lista de (código, máscara) en el orden en que la versión fila
+            por fila revisaba cada condición; los códigos deben ser > 0
+
+    Returns:
+        pd.Series: Código (int8) de la primera regla que descarta cada fila,
+        o 0 si la fila genera registro
+    """
+    codes = np.zeros(len(index), dtype=np.int8)
+    for code, mask in reversed(rules):
+        codes[np.asarray(mask, dtype=bool)] = code
+    return pd.Series(codes, index=index)
+
+
+def map_unique(values, convert, *args):
+    """
+    Aplica ``convert(valor, *args)`` una vez por valor distinto
+
+    Para las celdas que no se pueden convertir en bloque, que suelen
+    repetirse (el mismo texto o número en muchas filas).
+    """
+    cache = {}
+    result = []
+    for value in values:
+        try:
+            key = (type(value), value)
+            converted = cache.get(key, cache)
+        except TypeError:
+            key = None
+            converted = cache
+        if converted is cache:
+            converted = convert(value, *args)
+            if key is not None:
+                cache[key] = converted
+        result.append(converted)
+    return pd.Series(result, index=values.index, dtype=object)
+
+
+def _scalar_float(value, default):
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return default
+
+
+def to_float(series, default=0.0):
+    """
+    Números de una columna
+
+    Equivale a ``float(val) if pd.notna(val) else default`` por celda,
+    devolviendo ``default`` cuando ``float()`` falla. ``pd.to_numeric``
+    resuelve el caso común; las celdas que rechaza pero que ``float()``
+    acepta (espacios, "nan", guiones bajos) se convierten una por una.
+    """
+    if is_bool_dtype(series):
+        return series.astype(float)
+    if is_numeric_dtype(series):
+        return series.astype(float).fillna(default)
+
+    values = series.astype(object)
+    present = values.notna()
+    result = pd.to_numeric(values, errors='coerce').astype(float)
+
+    retry = present & result.isna()
+    if retry.any():
+        result[retry] = map_unique(values[retry], _scalar_float, default).astype(float)
+    result[~present] = default
+    return result
+
+
+def per_unique(text, func):
+    """
+    Aplica ``func`` (Serie -> Serie) a cada texto distinto y expande el
+    resultado a todas las filas
+
+    Las planillas repiten mucho los mismos textos (productos, clientes,
+    certificaciones), así que las operaciones de texto se hacen una vez por
+    valor. ``text`` debe contener solo ``str`` (sin nulos).
+    """
+    codes, uniques = pd.factorize(text.to_numpy(dtype=object))
+    if len(uniques) * 2 > len(text):
+        return func(text)
+    mapped = func(pd.Series(uniques, dtype=object)).to_numpy()
+    return pd.Series(mapped[codes], index=text.index)
+
+
+def int_text(numbers):
+    """
+    ``str(int(val))`` de cada número, o None si no es finito
+
+    Args:
+        numbers: Serie de floats (por ejemplo, el resultado de ``to_float``)
+    """
+    codes, uniques = pd.factorize(numbers.to_numpy(dtype=float))
+    text = np.array([str(int(value)) if np.isfinite(value) else None for value in uniques] + [None],
+                    dtype=object)
+    return pd.Series(text[codes], index=numbers.index, dtype=object)
+
+
+def clean_text(series, default=""):
+    """
+    Texto sin espacios al inicio/fin
+
+    Equivale a ``str(val).strip() if pd.notna(val) else default`` por celda.
+    """
+    values = series.to_numpy(dtype=object)
+    codes, uniques = pd.factorize(values)
+
+    # Los textos se limpian una vez por valor distinto. El resto (números,
+    # fechas) se convierte fila por fila: factorize iguala 1, 1.0 y True,
+    # pero str() no
+    if series.dtype == object:
+        unique_text = np.fromiter((type(value) is str for value in uniques), dtype=bool, count=len(uniques))
+    else:
+        # Columna de un solo tipo (números, fechas, texto): no hay valores igualados
+        unique_text = np.ones(len(uniques), dtype=bool)
+    stripped = np.array([str(value).strip() if text else None for value, text in zip(uniques, unique_text)],
+                        dtype=object)
+    is_text = np.append(unique_text, False)[codes]
+    others = (codes >= 0) & ~is_text
+
+    result = np.full(len(values), default, dtype=object)
+    result[is_text] = stripped[codes[is_text]]
+    if others.any():
+        result[others] = [str(value).strip() for value in values[others]]
+    return pd.Series(result, index=series.index, dtype=object)
+
+
+def first_token(text):
+    """Primera palabra de cada texto (``re.match(r"^(\\S+)", desc)``), o "" si no hay"""
+    return per_unique(text, lambda unique: unique.str.extract(r"^(\S+)", expand=False).fillna("")).astype(object)
+
+
+def contains_any(lowered, keywords):
+    """Máscara de las celdas que contienen alguna de las palabras clave"""
+    def mask(unique):
+        found = pd.Series(False, index=unique.index)
+        for keyword in keywords:
+            found |= unique.str.contains(keyword, regex=False)
+        return found
+
+    return per_unique(lowered, mask).astype(bool)
+
+
+def first_match(text, keys):
+    """
+    Posición de la primera clave contenida en cada texto, o -1 si ninguna
+
+    Equivale a recorrer ``keys`` en orden con ``key in texto`` y quedarse
+    con la primera coincidencia.
+    """
+    def positions(unique):
+        found = np.full(len(unique), -1)
+        for position in reversed(range(len(keys))):
+            found[unique.str.contains(keys[position], regex=False).to_numpy(dtype=bool)] = position
+        return pd.Series(found, index=unique.index)
+
+    return per_unique(text, positions).astype(int)
+
+
+def classify(text, rules, default):
+    """
+    Código según la primera regla cuyas palabras clave aparecen en el texto
+
+    Args:
+        text: Serie de textos ya limpios
+        rules: Lista de (palabras clave en minúsculas, código), en orden de prioridad
+        default: Serie o valor para los textos que no cumplen ninguna regla
+
+    Returns:
+        pd.Series: Código de cada fila
+    """
+    def codes(unique):
+        lowered = unique.str.lower()
+        conditions = [contains_any(lowered, keywords).to_numpy() for keywords, _ in rules]
+        return pd.Series(np.select(conditions, [code for _, code in rules], default=None), index=unique.index)
+
+    matched = per_unique(text, codes)
+    return matched.where(matched.notna(), default).astype(object)
@@ -0,0 +1,256 @@
+"""
+Manejo de archivos subidos
+
+Los archivos se leen directamente desde el stream de werkzeug cuando es
+posible. Si el stream no admite ``seek`` se copia a un ``SpooledTemporaryFile``
+que queda en memoria hasta ``UPLOAD_SPOOL_MAX_BYTES`` y pasa a disco por
+encima de ese tamaño, con un nombre único generado por ``tempfile``.
+
+``HashingSpool`` es el buffer en el que werkzeug recibe cada archivo: calcula
+su SHA-256 a medida que llegan los bytes, para la caché de resultados
+(``pipeline.result_cache``) sin volver a leer el archivo.
+
+``upload_file`` entrega el archivo por ruta a otro proceso (el pool de
+``worker_pool``, las hojas en paralelo): usa la ruta si ya está en disco con
+nombre y, si no, lo copia por partes a un temporal con el mismo prefijo.
+
+El janitor elimina archivos temporales huérfanos (por ejemplo, de un worker
+que murió a mitad de una carga) que llevan más de ``UPLOAD_TEMP_MAX_AGE``
+segundos en el directorio temporal.
+"""
+
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from pipeline.artifacts import sweep_artifacts
+from pipeline.jobs import sweep_jobs
+from pipeline.progress import sweep_progress_files
+from pipeline.result_cache import sweep_result_cache
+
+# Tamaño máximo que se mantiene en memoria antes de pasar a disco
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv('UPLOAD_SPOOL_MAX_BYTES', str(16 * 1024 * 1024)))
+
+# Antigüedad (segundos) desde la que un archivo temporal se considera huérfano
+UPLOAD_TEMP_MAX_AGE = int(os.getenv('UPLOAD_TEMP_MAX_AGE', '3600'))
+
+# Cada cuántos segundos, como máximo, se barre el directorio temporal
+UPLOAD_SWEEP_INTERVAL = int(os.getenv('UPLOAD_SWEEP_INTERVAL', '600'))
+
+UPLOAD_TEMP_DIR = os.getenv('UPLOAD_TEMP_DIR') or tempfile.gettempdir()
+UPLOAD_TEMP_PREFIX = "balance_upload_"
+
+# Archivos temporales que barre el janitor: los de esta versión (``tempfile``
+# agrega 8 caracteres al prefijo) y los que creaban las versiones anteriores
+# de los procesadores ("<prefijo>_<user_id>_<time.time()>.xlsx")
+_TEMP_NAME = re.compile(re.escape(UPLOAD_TEMP_PREFIX) + r"[a-z0-9_]{8}\.xlsx"
+                        r"|(?:upload_gen_sales|cons_upload|prod_upload|upload)_.+_\d{10}\.xlsx")
+
+_COPY_CHUNK = 1024 * 1024
+
+# Tamaño desde el que werkzeug pasa un archivo recibido a disco
+_RECEIVE_SPOOL_MAX_BYTES = 500 * 1024
+
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+@contextmanager
+def open_upload(file):
+    """
+    Entrega el contenido de un archivo subido como buffer binario con ``seek``
+
+    Args:
+        file: ``FileStorage`` de werkzeug, buffer binario o ruta de archivo
+
+    Yields:
+        Buffer binario posicionado al inicio (o la ruta, si se recibió una)
+    """
+    if isinstance(file, (str, os.PathLike)):
+        yield file
+        return
+
+    stream = getattr(file, 'stream', file)
+
+    # werkzeug ya deja el archivo en memoria o en un TemporaryFile anónimo
+    if _is_seekable(stream):
+        stream.seek(0)
+        yield stream
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_BYTES, mode='w+b',
+                                       prefix=UPLOAD_TEMP_PREFIX, suffix='.xlsx',
+                                       dir=UPLOAD_TEMP_DIR) as spool:
+        shutil.copyfileobj(stream, spool, _COPY_CHUNK)
+        spool.seek(0)
+        yield spool
+
+
+class HashingSpool(tempfile.SpooledTemporaryFile):
+    """
+    Buffer de recepción de werkzeug que calcula el SHA-256 de lo que se escribe
+
+    Se usa desde ``Request._get_file_stream``; igual que el buffer por defecto
+    de werkzeug, queda en memoria hasta 500 KB y pasa a disco por encima.
+    """
+
+    def __init__(self):
+        super().__init__(max_size=_RECEIVE_SPOOL_MAX_BYTES, mode='w+b')
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._digest.update(data)
+        return super().write(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def hexdigest(self):
+        return self._digest.hexdigest()
+
+
+def upload_digest(file):
+    """
+    SHA-256 (hex) del archivo subido
+
+    Args:
+        file: ``FileStorage`` de werkzeug o buffer binario
+
+    Returns:
+        str: Huella calculada al recibirlo, o leyendo el buffer si no pasó por
+            ``HashingSpool``; None si no se puede leer sin consumirlo
+    """
+    stream = getattr(file, 'stream', file)
+    if isinstance(stream, HashingSpool):
+        return stream.hexdigest()
+    if not _is_seekable(stream):
+        return None
+
+    position = stream.tell()
+    stream.seek(0)
+    digest = hashlib.sha256()
+    for block in iter(lambda: stream.read(_COPY_CHUNK), b''):
+        digest.update(block)
+    stream.seek(position)
+    return digest.hexdigest()
+
+
+@contextmanager
+def upload_file(file):
+    """
+    Ruta en disco del archivo subido, para entregarlo a otro proceso sin
+    copiar su contenido en memoria
+
+    Si el archivo ya está en disco con nombre (una ruta, o el archivo abierto
+    de un trabajo de ``pipeline.jobs``) se usa esa ruta; si no (buffer en
+    memoria o ``TemporaryFile`` anónimo de werkzeug) se copia por partes a un
+    temporal con nombre único, que se elimina al salir.
+
+    Args:
+        file: ``FileStorage`` de werkzeug, buffer binario o ruta de archivo
+
+    Yields:
+        str: Ruta del archivo
+    """
+    if isinstance(file, (str, os.PathLike)):
+        yield os.fspath(file)
+        return
+
+    stream = getattr(file, 'stream', file)
+    name = getattr(stream, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    fd, path = tempfile.mkstemp(prefix=UPLOAD_TEMP_PREFIX, suffix='.xlsx', dir=UPLOAD_TEMP_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as target:
+            position = stream.tell() if _is_seekable(stream) else None
+            if position is not None:
+                stream.seek(0)
+            shutil.copyfileobj(stream, target, _COPY_CHUNK)
+            if position is not None:
+                stream.seek(position)
+        yield path
+    finally:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _is_seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def sweep_temp_files(max_age=None, now=None):
+    """
+    Elimina archivos temporales de carga huérfanos
+
+    Args:
+        max_age: Antigüedad mínima en segundos (por defecto UPLOAD_TEMP_MAX_AGE)
+        now: Marca de tiempo de referencia (por defecto time.time())
+
+    Returns:
+        int: Cantidad de archivos eliminados
+    """
+    max_age = UPLOAD_TEMP_MAX_AGE if max_age is None else max_age
+    now = time.time() if now is None else now
+
+    removed = 0
+    try:
+        entries = os.scandir(UPLOAD_TEMP_DIR)
+    except OSError as e:
+        print(f"⚠️ No se pudo revisar el directorio temporal {UPLOAD_TEMP_DIR}: {e}")
+        return 0
+
+    with entries:
+        for entry in entries:
+            if not _TEMP_NAME.fullmatch(entry.name):
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if now - entry.stat(follow_symlinks=False).st_mtime < max_age:
+                    continue
+                os.unlink(entry.path)
+                removed += 1
+            except OSError:
+                # Otro worker lo eliminó o sigue en uso; se reintenta en el próximo barrido
+                continue
+
+    if removed:
+        print(f"🧹 Archivos temporales huérfanos eliminados: {removed}")
+    return removed
+
+
+def maybe_sweep_temp_files():
+    """
+    Ejecuta el janitor (temporales de carga, archivos de descarga, de progreso,
+    de trabajos y resultados en caché expirados) si pasó ``UPLOAD_SWEEP_INTERVAL`` desde el último
+    barrido
+    """
+    global _last_sweep
+
+    now = time.time()
+    if now - _last_sweep < UPLOAD_SWEEP_INTERVAL:
+        return 0
+    if not _sweep_lock.acquire(blocking=False):
+        return 0
+    try:
+        if now - _last_sweep < UPLOAD_SWEEP_INTERVAL:
+            return 0
+        _last_sweep = now
+        return (sweep_temp_files(now=now) + sweep_artifacts(now=now)
+                + sweep_progress_files(now=now) + sweep_jobs(now=now) + sweep_result_cache(now=now))
+    finally:
+        _sweep_lock.release()
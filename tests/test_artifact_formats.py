@@ -0,0 +1,88 @@
+"""Formatos Arrow / Parquet cuando no queda ningún registro"""
+
+import os
+
+import pandas as pd
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from module_cache import module_cache  # noqa: E402
+from pipeline import find_artifact  # noqa: E402
+from tests.conftest import ROOT  # noqa: E402
+
+INGRESOS = os.path.join(ROOT, "functions", "process_ingresos.py")
+
+
+def _read_artifact(artifact):
+    path, _, _ = find_artifact(artifact["artifact_id"])
+    if artifact["format"] == "parquet":
+        return pq.read_table(path)
+    with pa.ipc.open_stream(path) as reader:
+        return reader.read_all()
+
+
+@pytest.fixture
+def processor():
+    return module_cache.get(INGRESOS).PROCESSOR
+
+
+@pytest.fixture
+def garbage(tmp_path):
+    path = tmp_path / "garbage.xlsx"
+    path.write_bytes(b"esto no es un libro")
+    return str(path)
+
+
+@pytest.fixture
+def without_columns(tmp_path):
+    path = tmp_path / "sin_columnas.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"A": [1, 2], "B": ["x", "y"]}).to_excel(writer, sheet_name="Resumen", index=False)
+        pd.DataFrame({"Otra": [3]}).to_excel(writer, sheet_name="Notas", index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("output_format", ["arrow", "parquet"])
+def test_unreadable_upload_emits_empty_artifact(processor, garbage, output_format):
+    result = processor.run(garbage, "u1", output_format)
+
+    assert result["success"] is False
+    [artifact] = result["artifacts"]
+    assert artifact["records"] == 0
+    table = _read_artifact(artifact)
+    assert table.num_rows == 0
+    assert table.schema.field("fecha_recepcion").type == pa.timestamp("us")
+    assert table.schema.field("volumen_m3").type == pa.float64()
+
+
+@pytest.mark.parametrize("output_format", ["arrow", "parquet"])
+def test_all_sheets_skipped_emits_empty_artifact(processor, without_columns, output_format):
+    result = processor.run(without_columns, "u1", output_format)
+
+    assert result["success"] is True
+    assert result["records_processed"] == 0
+    assert result["sheets_skipped"] == 2
+    [artifact] = result["artifacts"]
+    assert _read_artifact(artifact).num_rows == 0
+
+
+@pytest.mark.parametrize("output_format", ["arrow", "parquet"])
+def test_artifact_write_failure_returns_error_and_final_event(processor, without_columns, monkeypatch,
+                                                              output_format):
+    import pipeline.core
+
+    def disk_full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(pipeline.core, "write_artifact", disk_full)
+    events = []
+    result = processor.run(without_columns, "u1", output_format,
+                           progress=lambda event, **data: events.append((event, data)))
+
+    assert result["success"] is False
+    assert result["artifacts"] == []
+    assert "No space left on device" in result["error"]
+    assert events[-1][0] == "job_finished"
+    assert events[-1][1]["success"] is False
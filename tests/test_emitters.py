@@ -0,0 +1,226 @@
+"""Emisión: INSERT fila por fila y por lotes, CSV para COPY, registros por columna y columnas opcionales"""
+
+import contextlib
+import csv
+import io
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from pipeline.emitters import Column, TableSpec
+from tests.test_processor_equivalence import LEGACY, ROOT, load, run
+from tests.workbooks import CASES
+
+RECEPCIONES = TableSpec("recepciones", [
+    Column("fecha", "timestamp"),
+    Column("proveedor"),
+    Column("volumen", "number"),
+    Column("rol", optional=True),
+    Column("comuna", optional=True),
+])
+
+
+def frame():
+    return pd.DataFrame({
+        "fecha": [datetime(2025, 3, n) for n in range(1, 6)],
+        "proveedor": ["Forestal A", "O'Higgins", "Forestal A", "B", "C"],
+        "volumen": [12.5, 3.0, 0.1, 1000.0, 7.25],
+        "rol": ["12-3", None, "4", None, "5"],
+        "comuna": ["Chillán", None, None, None, "Yungay"],
+    })
+
+
+def legacy_statement(values, multiline=True):
+    """Un INSERT armado como en los procesadores anteriores al pipeline"""
+    columns = ["fecha", "proveedor", "volumen"]
+    literals = [f"'{values['fecha'].isoformat()}'", f"'{values['proveedor'].replace(chr(39), chr(39) * 2)}'",
+                str(values["volumen"])]
+    for optional in ("rol", "comuna"):
+        if not pd.isna(values[optional]):
+            columns.append(optional)
+            literals.append(f"'{values[optional]}'")
+    separator = " \n" if multiline else " "
+    return f"INSERT INTO recepciones ({', '.join(columns)}){separator}VALUES ({', '.join(literals)});"
+
+
+@pytest.mark.parametrize("multiline", [True, False])
+def test_insert_statements_are_byte_identical_to_the_row_by_row_format(multiline):
+    table = TableSpec(RECEPCIONES.name, RECEPCIONES.columns, multiline=multiline)
+    expected = [legacy_statement(values, multiline) for values in frame().to_dict("records")]
+
+    assert table.insert_statements(frame()) == expected
+    assert expected[1] == "INSERT INTO recepciones (fecha, proveedor, volumen)" + (" \n" if multiline else " ") + \
+        "VALUES ('2025-03-02T00:00:00', 'O''Higgins', 3.0);"
+
+
+def test_value_rows_group_rows_by_the_optional_columns_present():
+    headers, codes, rows = RECEPCIONES.value_rows(frame())
+
+    assert headers == [
+        ["fecha", "proveedor", "volumen", "rol", "comuna"],
+        ["fecha", "proveedor", "volumen"],
+        ["fecha", "proveedor", "volumen", "rol"],
+    ]
+    assert codes == [0, 1, 2, 1, 0]
+    assert rows[2] == "('2025-03-03T00:00:00', 'Forestal A', 0.1, '4')"
+
+    # Sin columnas opcionales todas las filas comparten la lista de columnas
+    required = TableSpec("t", [Column("a"), Column("b", "number")])
+    assert required.value_rows(pd.DataFrame({"a": ["x", None], "b": [1.5, None]})) == \
+        ([["a", "b"]], None, ["('x', 1.5)", "(NULL, NULL)"])
+
+
+def test_batches_keep_each_column_signature_in_its_own_statement():
+    statements = RECEPCIONES.batch_insert_statements(frame(), 500)
+
+    assert statements == [
+        "INSERT INTO recepciones (fecha, proveedor, volumen, rol, comuna) \nVALUES "
+        "('2025-03-01T00:00:00', 'Forestal A', 12.5, '12-3', 'Chillán'),\n"
+        "('2025-03-05T00:00:00', 'C', 7.25, '5', 'Yungay');",
+        "INSERT INTO recepciones (fecha, proveedor, volumen) \nVALUES "
+        "('2025-03-02T00:00:00', 'O''Higgins', 3.0),\n"
+        "('2025-03-04T00:00:00', 'B', 1000.0);",
+        "INSERT INTO recepciones (fecha, proveedor, volumen, rol) \nVALUES "
+        "('2025-03-03T00:00:00', 'Forestal A', 0.1, '4');",
+    ]
+
+
+@pytest.mark.parametrize("batch_size, sizes", [(1, [1] * 5), (2, [2, 2, 1]), (5, [5]), (500, [5])])
+def test_batches_are_split_at_batch_size(batch_size, sizes):
+    table = TableSpec("t", [Column("a"), Column("b", "number")], multiline=False)
+    data = pd.DataFrame({"a": list("vwxyz"), "b": [1.0, 2.0, 3.0, 4.0, 5.0]})
+
+    statements = table.batch_insert_statements(data, batch_size)
+
+    assert [statement.count("(") - 1 for statement in statements] == sizes
+    assert all(statement.startswith("INSERT INTO t (a, b) VALUES (") for statement in statements)
+    # Las filas salen en orden y una sola vez
+    values = ", ".join(statement.split(" VALUES ", 1)[1].rstrip(";") for statement in statements)
+    assert values == ", ".join(table.value_rows(data)[2])
+    assert table.batch_insert_statements(data.iloc[:0], batch_size) == []
+
+
+def test_batches_of_one_row_are_the_row_by_row_statements(tmp_path):
+    relative, build = CASES["recepciones_496"]
+    path = str(tmp_path / "recepciones.xlsx")
+    build(path)
+
+    legacy = run(load(os.path.join(LEGACY, relative), "legacy_recepciones_batch"), path)
+    processor = load(os.path.join(ROOT, relative), "current_recepciones_batch").PROCESSOR
+    with contextlib.redirect_stdout(io.StringIO()):
+        batch = processor.run(path, "user-1", "sql_batch", 1)
+
+    # Mismas sentencias; solo cambia el orden (agrupadas por columnas presentes)
+    assert len({statement.split(") ", 1)[0] for statement in legacy["insert_statements"]}) > 1
+    assert Counter(batch["insert_statements"]) == Counter(legacy["insert_statements"])
+
+
+def copy_rows(payload):
+    """Encabezado y filas del CSV de un bloque COPY, leídos con el módulo csv"""
+    reader = csv.reader(io.StringIO(payload["data"], newline=""))
+    return next(reader), list(reader)
+
+
+def test_copy_csv_round_trips_commas_quotes_and_newlines():
+    table = TableSpec("t", [Column("fecha", "timestamp"), Column("texto"), Column("volumen", "number")])
+    texts = ['Forestal, "A"', "O'Higgins", "línea 1\nlínea 2", '"', ","]
+    data = pd.DataFrame({
+        "fecha": [datetime(2025, 3, 1, 10, 30), datetime(2025, 3, 2, 0, 0, 0, 500)] + [datetime(2025, 3, 3)] * 3,
+        "texto": texts,
+        "volumen": [12.5, 3.0, 0.1, 1000.0, 1234.5678],
+    })
+
+    [payload] = table.copy_payloads(data)
+    header, rows = copy_rows(payload)
+
+    assert payload["copy"] == "COPY t (fecha, texto, volumen) FROM STDIN WITH (FORMAT csv, HEADER true)"
+    assert header == payload["columns"] == ["fecha", "texto", "volumen"]
+    assert payload["records"] == len(rows) == 5
+    assert [row[1] for row in rows] == texts
+    assert [row[0] for row in rows[:2]] == ["2025-03-01T10:30:00", "2025-03-02T00:00:00.000500"]
+    assert [float(row[2]) for row in rows] == data["volumen"].tolist()
+
+
+def test_copy_csv_tells_empty_text_from_null():
+    table = TableSpec("t", [Column("a"), Column("b"), Column("n", "number"), Column("f", "timestamp")])
+    data = pd.DataFrame({"a": ["", None], "b": ["x", "y"], "n": [None, 1.0], "f": [pd.NaT, datetime(2025, 1, 1)]})
+
+    [payload] = table.copy_payloads(data)
+
+    # COPY (FORMAT csv) lee el campo vacío sin comillas como NULL y "" como texto vacío
+    assert payload["data"].splitlines() == ["a,b,n,f", '"","x",,', ',"y",1.0,2025-01-01T00:00:00']
+    assert copy_rows(payload)[1] == [["", "x", "", ""], ["", "y", "1.0", "2025-01-01T00:00:00"]]
+
+
+def test_copy_blocks_follow_the_table_column_order_per_signature():
+    payloads = RECEPCIONES.copy_payloads(frame())
+
+    assert [payload["columns"] for payload in payloads] == RECEPCIONES.value_rows(frame())[0]
+    assert [payload["records"] for payload in payloads] == [2, 2, 1]
+    for payload in payloads:
+        header, rows = copy_rows(payload)
+        assert header == payload["columns"]
+        assert header == [name for name in RECEPCIONES.column_names if name in header]
+        assert all(len(row) == len(header) for row in rows)
+
+    header, rows = copy_rows(payloads[0])
+    assert [dict(zip(header, row)) for row in rows] == [
+        {"fecha": "2025-03-01T00:00:00", "proveedor": "Forestal A", "volumen": "12.5", "rol": "12-3",
+         "comuna": "Chillán"},
+        {"fecha": "2025-03-05T00:00:00", "proveedor": "C", "volumen": "7.25", "rol": "5", "comuna": "Yungay"},
+    ]
+
+
+def test_columnar_values_are_json_ready():
+    table = TableSpec("t", [Column("fecha", "timestamp"), Column("texto"), Column("volumen", "number"),
+                            Column("rol", optional=True)])
+    data = pd.DataFrame({
+        "fecha": [datetime(2025, 3, 1, 10, 30), pd.NaT, datetime(2025, 3, 2, 0, 0, 0, 500), datetime(2025, 3, 3)],
+        "texto": ["x", "", None, "O'Higgins"],
+        "volumen": [12.5, float("inf"), float("nan"), -float("inf")],
+        "rol": [None, "12-3", None, None],
+    })
+
+    columnar = table.columnar(data)
+
+    assert columnar == {
+        "table": "t",
+        "columns": ["fecha", "texto", "volumen", "rol"],
+        "optional": ["rol"],
+        "records": 4,
+        "values": [
+            ["2025-03-01T10:30:00", None, "2025-03-02T00:00:00.000500", "2025-03-03T00:00:00"],
+            ["x", "", None, "O'Higgins"],
+            [12.5, None, None, None],
+            [None, "12-3", None, None],
+        ],
+    }
+    # Sin NaN ni infinito: es JSON estricto
+    json.dumps(columnar, allow_nan=False)
+
+
+def test_columnar_rebuilds_the_row_by_row_statements(tmp_path):
+    relative, build = CASES["recepciones_496"]
+    path = str(tmp_path / "recepciones.xlsx")
+    build(path)
+
+    legacy = run(load(os.path.join(LEGACY, relative), "legacy_recepciones_columnar"), path)
+    processor = load(os.path.join(ROOT, relative), "current_recepciones_columnar").PROCESSOR
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = processor.run(path, "user-1", "columnar")
+    [columnar] = result["columnar"]
+
+    assert columnar["optional"] == ["rol", "origen", "comuna"]
+    assert columnar["records"] == result["records_processed"] == len(legacy["insert_statements"])
+    # Los nulos de las columnas opcionales marcan las que el INSERT omite
+    present = [[name for name, value in zip(columnar["optional"], values) if value is not None]
+               for values in zip(*columnar["values"][-3:])]
+    assert [[name for name in columnar["optional"] if f", {name}" in statement.split(")", 1)[0]]
+            for statement in legacy["insert_statements"]] == present
+
+    records = pd.DataFrame(dict(zip(columnar["columns"], columnar["values"])))
+    assert processor.table.insert_statements(records) == legacy["insert_statements"]
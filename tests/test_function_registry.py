@@ -0,0 +1,121 @@
+"""Registro de funciones: validación, listados por tenant, función por defecto y ETag de /functions"""
+
+import json
+
+import pytest
+
+from function_registry import DEFAULT_REGISTRY_PATH, FunctionNotFound, FunctionRegistry, RegistryError
+
+TENANT = "tenant-a"
+
+CONFIG = {
+    "functions": {
+        "1": {"name": "Ingresos", "description": "Reportes de ingreso", "file": "functions/process_ingresos.py"},
+        "2": {"name": "Ventas", "file": "functions/process_ventas.py"},
+        "9": {"name": "Antigua", "file": "functions/process_ventas.py", "is_active": False},
+    },
+    "tenants": {
+        TENANT: {
+            "default": "1",
+            "functions": {
+                "1": {"name": "Recepciones",
+                      "file": "functions/496f6470-2f4d-40c6-9426-bb5421116a3d/process_recepciones.py"},
+                "4": {"name": "Ventas MASISA",
+                      "file": "functions/496f6470-2f4d-40c6-9426-bb5421116a3d/process_ventas_masisa.py"},
+            },
+        },
+        "tenant-b": {
+            "functions": {
+                "7": {"name": "Consumo", "file": "functions/ae6a5783-4da9-49d2-b415-af7384362b7c/process_consumo.py"},
+            },
+        },
+    },
+}
+
+
+@pytest.fixture
+def registry():
+    return FunctionRegistry(json.loads(json.dumps(CONFIG)), source="fixture.json")
+
+
+def config_with(change):
+    config = json.loads(json.dumps(CONFIG))
+    change(config)
+    return config
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda c: c.pop("functions"), "falta la sección 'functions'"),
+    (lambda c: c["functions"]["2"].pop("name"), "la función 2 no define 'name'"),
+    (lambda c: c["functions"]["2"].update(file=""), "la función 2 no define 'file'"),
+    (lambda c: c["functions"]["2"].update(file="functions/no_existe.py"),
+     "archivo de función no encontrado: functions/no_existe.py"),
+    (lambda c: c["tenants"]["tenant-b"].update(functions={}), "el tenant tenant-b no tiene funciones"),
+    (lambda c: c["tenants"][TENANT].update(default="3"), "la función por defecto 3 del tenant tenant-a no existe"),
+])
+def test_invalid_configuration_is_rejected_at_load(change, message):
+    with pytest.raises(RegistryError, match=message):
+        FunctionRegistry(config_with(change), source="fixture.json")
+
+
+def test_unreadable_file_is_a_registry_error(tmp_path):
+    path = tmp_path / "registry.json"
+    path.write_text("{ no es json", encoding="utf-8")
+
+    with pytest.raises(RegistryError, match="No se pudo leer el registro"):
+        FunctionRegistry.from_file(str(path))
+    with pytest.raises(RegistryError, match="No se pudo leer el registro"):
+        FunctionRegistry.from_file(str(tmp_path / "no_existe.json"))
+    # El registro del repositorio es válido
+    assert FunctionRegistry.from_file(DEFAULT_REGISTRY_PATH).generic
+
+
+def test_listings_show_only_the_tenant_or_the_generic_functions(registry):
+    generic, generic_etag = registry.listing()
+    tenant, tenant_etag = registry.listing(TENANT)
+
+    assert json.loads(generic)["functions"] == [
+        {"id": 1, "function_name": "Ingresos", "function_description": "Reportes de ingreso", "is_active": True},
+        {"id": 2, "function_name": "Ventas", "function_description": "", "is_active": True},
+        {"id": 9, "function_name": "Antigua", "function_description": "", "is_active": False},
+    ]
+    assert [item["function_name"] for item in json.loads(tenant)["functions"]] == ["Recepciones", "Ventas MASISA"]
+    assert registry.listing("otro-usuario") == (generic, generic_etag)
+    assert len({generic_etag, tenant_etag, registry.listing("tenant-b")[1]}) == 3
+
+
+def test_resolve_uses_the_tenant_functions_and_its_default(registry):
+    assert registry.resolve("otro-usuario", 2).name == "Ventas"
+    assert registry.resolve(TENANT, "4").name == "Ventas MASISA"
+    # Un ID que el tenant no registró cae en su función por defecto, no en la genérica
+    default = registry.resolve(TENANT, 2)
+    assert (default.name, default.tenant) == ("Recepciones", TENANT)
+
+    with pytest.raises(FunctionNotFound, match="No hay implementación para la función ID 2"):
+        registry.resolve("tenant-b", 2)
+    with pytest.raises(FunctionNotFound, match="No hay implementación para la función ID 5"):
+        registry.resolve("otro-usuario", 5)
+    with pytest.raises(FunctionNotFound, match="La función ID 9 no está activa"):
+        registry.resolve("otro-usuario", 9)
+
+
+def test_functions_endpoint_answers_304_for_a_known_etag(registry, monkeypatch):
+    app_module = pytest.importorskip("app")
+    monkeypatch.setattr(app_module, "registry", registry)
+    client = app_module.app.test_client()
+
+    response = client.get("/functions", query_string={"userId": TENANT})
+    body, etag = registry.listing(TENANT)
+    assert response.status_code == 200
+    assert response.data == body
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert response.headers["Cache-Control"] == f"private, max-age={app_module.FUNCTIONS_MAX_AGE}"
+
+    cached = client.get("/functions", query_string={"userId": TENANT}, headers={"If-None-Match": f'"{etag}"'})
+    assert cached.status_code == 304
+    assert cached.data == b""
+
+    # El ETag de otro listado no sirve
+    other = client.get("/functions", headers={"If-None-Match": f'"{etag}"'})
+    assert other.status_code == 200
+    assert other.data == registry.listing()[0]
@@ -0,0 +1,104 @@
+"""HeaderMatcher: prioridad de las reglas, exclusiones, reglas compactas, acentos y palabras superpuestas"""
+
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from pipeline.headers import HeaderMatcher, Rule, scan_header_row
+from tests.test_processor_equivalence import LEGACY, ROOT, load
+from tests.workbooks import T496
+
+
+def test_first_rule_wins_before_column_order():
+    matcher = HeaderMatcher({'fecha': [Rule('FECHA', 'VENTA'), Rule('FECHA')]})
+
+    assert matcher.resolve(['Fecha emisión', 'Fecha venta']) == {'fecha': 'Fecha venta'}
+    assert matcher.resolve(['Fecha emisión', 'Fecha pago']) == {'fecha': 'Fecha emisión'}
+    assert matcher.resolve(['Cliente']) == {}
+
+
+def test_scored_mapping_has_the_priority_of_the_rule_met():
+    matcher = HeaderMatcher({
+        'fecha': [Rule('FECHA', 'VENTA'), Rule('FECHA')],
+        'volumen': [Rule('M3'), (Rule('VOLUMEN'), Rule('CANTIDAD'))],
+    })
+
+    assert matcher.resolve(['Fecha', 'Cantidad'], scored=True) == {'fecha': ('Fecha', 1), 'volumen': ('Cantidad', 1)}
+    assert matcher.resolve(['Fecha venta', 'M3'], scored=True) == {'fecha': ('Fecha venta', 0), 'volumen': ('M3', 0)}
+
+
+def test_exclude_discards_the_cell_for_that_field_only():
+    matcher = HeaderMatcher({
+        'volumen': Rule('M3', exclude=('M3ST',)),
+        'estereo': Rule('M3ST'),
+    })
+
+    assert matcher.resolve(['M3ST', 'M3 sólidos']) == {'volumen': 'M3 sólidos', 'estereo': 'M3ST'}
+    assert matcher.resolve(['M3ST']) == {'estereo': 'M3ST'}
+
+
+def test_overlapping_keywords_are_all_found():
+    # 'm3' está dentro de 'm3st': la expresión toma la más larga y cuenta ambas
+    matcher = HeaderMatcher({'volumen': Rule('M3'), 'estereo': Rule('M3ST')})
+
+    assert matcher.keywords('Volumen m3st')[(False, False)] == {'m3', 'm3st'}
+    assert matcher.resolve(['Volumen m3st']) == {'volumen': 'Volumen m3st', 'estereo': 'Volumen m3st'}
+
+
+def test_compact_rules_ignore_spaces_underscores_and_slashes():
+    matcher = HeaderMatcher({'fecha': Rule('FCHRECEPCION', compact=True), 'origen': Rule('ORIGENPREDIO', compact=True)})
+
+    assert matcher.resolve(['FCH_RECEPCION', 'Origen / Predio']) == {'fecha': 'FCH_RECEPCION',
+                                                                     'origen': 'Origen / Predio'}
+    assert HeaderMatcher({'fecha': Rule('FCHRECEPCION')}).resolve(['FCH_RECEPCION']) == {}
+
+
+def test_accents_are_ignored_only_for_the_rule_letters():
+    every = HeaderMatcher({'fecha': Rule('FECHA', 'CONTABILIZACION', ignore_accents=True)})
+    some = HeaderMatcher({'fecha': Rule('FECHA', 'CONTABILIZACION', ignore_accents='ÓÍÁ')})
+    none = HeaderMatcher({'fecha': Rule('FECHA', 'CONTABILIZACION')})
+
+    assert every.resolve(['FÉCHA CONTABILIZACIÓN']) == {'fecha': 'FÉCHA CONTABILIZACIÓN'}
+    assert some.resolve(['FÉCHA CONTABILIZACIÓN']) == {}
+    assert some.resolve(['Fecha contabilización']) == {'fecha': 'Fecha contabilización'}
+    assert none.resolve(['Fecha contabilización']) == {}
+    # El mismo conjunto de letras en otro orden comparte la forma
+    assert Rule('A', ignore_accents='ÓÍÁ').form == Rule('A', ignore_accents='áóí').form
+
+
+def test_scan_header_row_takes_the_row_with_most_required_fields():
+    head = pd.DataFrame([["Reporte", None, None], ["Fecha", None, None], ["Fecha", "Cliente", "M3"], [1, 2, 3]])
+    matcher = HeaderMatcher({'fecha': Rule('FECHA'), 'cliente': Rule('CLIENTE'), 'volumen': Rule('M3')})
+
+    assert scan_header_row(head, matcher, ['fecha', 'volumen'], 2, optional=['cliente']) == \
+        (2, {'fecha': 0, 'volumen': 2, 'cliente': 1})
+
+
+@pytest.mark.parametrize("header", [
+    ['FÉCHA CONTABILIZACIÓN', 'FECHA', 'VOLUMEN M3'],
+    ['Fecha Contabilización', 'Fecha venta', 'Recepción'],
+    ['Fecha factura', 'Cliénte', 'Núm. Guía', 'Código producto', 'Cantidad'],
+])
+def test_masisa_columns_match_the_row_by_row_version(header, tmp_path):
+    relative = T496 + "process_ventas_masisa.py"
+    path = str(tmp_path / "masisa.xlsx")
+    workbook = Workbook()
+    workbook.active.append(header)
+    for i in range(3):
+        # Cada columna con fechas distintas: se nota cuál se tomó como fecha
+        workbook.active.append([20250710 + 3 * column + i for column in range(len(header) - 1)] + [1000 * (i + 1)])
+    workbook.save(path)
+
+    results = []
+    for module in (load(os.path.join(LEGACY, relative), "legacy_masisa_headers"),
+                   load(os.path.join(ROOT, relative), "current_masisa_headers")):
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append(module.process_excel_file(path, "user-1"))
+    legacy, current = results
+
+    assert legacy["insert_statements"]
+    assert current["insert_statements"] == legacy["insert_statements"]
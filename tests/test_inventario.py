@@ -0,0 +1,112 @@
+"""Inventario: el modo por lotes deja la tabla igual que el modo fila por fila"""
+
+import contextlib
+import io
+
+import pytest
+from openpyxl import Workbook
+
+from fake_supabase import FakeQuery, FakeSupabase
+from functions.process_inventario import process_file
+
+HEADER = ["PRODUCTO_CODIGO", "DESCRIPCION", "STOCK_ACTUAL", "STOCK_MINIMO", "UBICACION"]
+
+ROWS = [
+    ["P-1", "Tabla", 10, 2, "B1"],
+    ["P-2", "Viga", 1, 5, "B1"],            # CRITICO/BAJO
+    ["P-3", "Listón", "abc", 1, "B2"],      # stock no numérico
+    ["P-4", "Poste", -3, 1, "B2"],          # stock negativo
+    ["P-1", "Tabla repetida", 20, 2, "B3"],  # código repetido: gana la última fila
+    [None, "Sin código", 5, 1, "B1"],
+    ["P-5", None, 5, 1, "B1"],
+    ["P-6", "Pilar", "7", "x", "B4"],       # mínimo no numérico
+    ["P-7", "Tablón", 6, 5, None],
+    ["P-8", "Madera", 12.5, 0, "B5"],
+    ["P-9", "Palo", 3, 3, "B5"],
+    ["P-2", "Viga repetida", 9, 1, "B1"],
+    ["P-10", "Astilla", 0, 0, "B6"],
+]
+
+# Códigos que ya están en la tabla (se actualizan)
+EXISTING = ["P-2", "P-8", "P-99"]
+
+
+class FailingSupabase(FakeSupabase):
+    """Cliente falso en el que falla toda escritura que incluya ``code``"""
+
+    def __init__(self, code):
+        super().__init__()
+        self.code = code
+
+    def table(self, name):
+        return FailingQuery(self, name)
+
+
+class FailingQuery(FakeQuery):
+    def execute(self):
+        payload = self.payload if isinstance(self.payload, list) else [self.payload]
+        if self.action != 'select' and any(record and record.get("producto_codigo") == self.client.code
+                                           for record in payload):
+            raise ConnectionError("conexión reiniciada")
+        return super().execute()
+
+
+def workbook():
+    book = Workbook()
+    book.active.append(HEADER)
+    for row in ROWS:
+        book.active.append(row)
+    buffer = io.BytesIO()
+    book.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def run(client, mode):
+    for code in EXISTING:
+        client.add("inventario", {"producto_codigo": code, "descripcion": "anterior"})
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = process_file(workbook(), client, mode=mode, chunk_size=3)
+    assert result["success"], result
+    return result
+
+
+def table(client):
+    rows = [{key: value for key, value in row.items() if key not in ("id", "fecha_actualizacion")}
+            for row in client.tables["inventario"]]
+    return sorted(rows, key=lambda row: row["producto_codigo"])
+
+
+def test_bulk_writes_the_same_table_as_row_by_row():
+    rows_client, bulk_client = FakeSupabase(), FakeSupabase()
+    by_rows = run(rows_client, "filas")
+    bulk = run(bulk_client, "bulk")
+
+    assert table(bulk_client) == table(rows_client)
+    assert bulk["records_processed"] == by_rows["records_processed"] == 8
+    assert bulk["errors"] == by_rows["errors"]
+    assert [error.split(":")[0] for error in bulk["errors"]] == ["Error procesando fila 3",
+                                                                 "Error procesando fila 8"]
+    # Seis productos distintos: dos lotes de 3, con una consulta de los
+    # existentes y un upsert cada uno
+    assert bulk_client.requests == 2 * 2 < rows_client.requests
+
+
+@pytest.mark.parametrize("mode", ["filas", "bulk"])
+def test_failed_write_is_reported_and_the_rest_is_written(mode):
+    client = FailingSupabase("P-8")
+    result = run(client, mode)
+    written = {row["producto_codigo"] for row in table(client) if row["descripcion"] != "anterior"}
+
+    expected = {"P-1", "P-2", "P-7", "P-9", "P-10"}
+    if mode == "filas":
+        # Solo falla la fila del producto
+        assert written == expected
+        assert result["records_processed"] == 7
+        assert "Error procesando fila 10: conexión reiniciada" in result["errors"]
+    else:
+        # Falla el lote completo: P-1 (dos filas), P-7 y P-8, en el orden de la
+        # última fila de cada código
+        assert written == expected - {"P-1", "P-7"}
+        assert result["records_processed"] == 8 - 4
+        assert "Error en lote 1 (3 productos): conexión reiniciada" in result["errors"]
@@ -0,0 +1,58 @@
+"""Trabajos asíncronos: id tomado de forma atómica y barrido de trabajos activos"""
+
+import io
+import json
+import os
+import threading
+
+import pytest
+
+from pipeline import jobs, progress
+from pipeline.jobs import FINISHED, RUNNING, JobExists, JobManager, sweep_jobs
+
+
+@pytest.fixture(autouse=True)
+def job_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(progress, "PROGRESS_DIR", str(tmp_path / "progress"))
+    return tmp_path / "jobs"
+
+
+def _state(job_dir, job_id, status, age):
+    path = job_dir / f"{job_id}.json"
+    path.write_text(json.dumps({"job_id": job_id, "status": status}))
+    os.utime(path, (1000 - age, 1000 - age))
+    return path
+
+
+def test_same_job_id_is_claimed_once():
+    release = threading.Event()
+    manager = JobManager(workers=1)
+
+    def task(source):
+        release.wait(5)
+        return {"success": True}
+
+    manager.submit(task, io.BytesIO(b"libro"), job_id="dup")
+    with pytest.raises(JobExists):
+        manager.submit(task, io.BytesIO(b"libro"), job_id="dup")
+    release.set()
+    # El trabajo termina antes de que otra prueba cambie JOB_DIR
+    manager._get_executor().shutdown(wait=True)
+    assert manager.stats()["submitted"] == 1
+
+
+def test_sweep_keeps_active_jobs_until_stale(job_dir):
+    job_dir.mkdir()
+    running = _state(job_dir, "activo", RUNNING, 500)
+    upload = job_dir / "activo.upload"
+    upload.write_bytes(b"libro")
+    os.utime(upload, (0, 0))
+    finished = _state(job_dir, "listo", FINISHED, 500)
+
+    assert sweep_jobs(max_age=100, now=1000, stale_age=10_000) == 1
+    assert running.exists() and upload.exists()
+    assert not finished.exists()
+
+    assert sweep_jobs(max_age=100, now=1000, stale_age=200) == 2
+    assert list(job_dir.iterdir()) == []
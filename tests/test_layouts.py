@@ -0,0 +1,158 @@
+"""Caché de formatos: aciertos, huellas de encabezado, aislamiento, LRU y LAYOUT_CACHE_SIZE=0"""
+
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+from pipeline import Processor, core, layouts
+from pipeline.core import SheetContext
+from pipeline.layouts import LayoutCache
+from tests.test_processor_equivalence import ROOT, load
+from tests.workbooks import CASES
+
+
+class Counting(Processor):
+    """Procesador que cuenta cuántas veces se detecta el encabezado"""
+
+    def __init__(self):
+        self.detections = 0
+
+    def resolve_columns(self, columns, sheet):
+        self.detections += 1
+        if "Fecha" not in columns:
+            return None
+        return {"fecha": "Fecha", "extra": {"columnas": list(columns)}}
+
+    def scan_header(self, head, sheet):
+        self.detections += 1
+        for position, row in enumerate(head.itertuples(index=False)):
+            if "Fecha" in row:
+                return position, {"fecha": list(row).index("Fecha")}
+        return None
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = LayoutCache(max_entries=8)
+    monkeypatch.setattr(core, "layout_cache", cache)
+    return cache
+
+
+def sheet(user_id="user-1", name="Hoja1"):
+    return SheetContext(name, user_id, [])
+
+
+def head(title="REPORTE", below="dato"):
+    return pd.DataFrame([[title, None], [None, None], ["Fecha", "M3"], [below, 1]])
+
+
+def detect(processor, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        if args and isinstance(args[0], pd.DataFrame):
+            return processor.find_header(args[0], sheet(**kwargs))
+        return processor.resolve_layout(list(args[0]), sheet(**kwargs))
+
+
+def test_known_columns_skip_detection_and_return_a_copy(cache):
+    processor = Counting()
+    first = detect(processor, ["Fecha", "M3"])
+    first["extra"]["columnas"].append("cambiada")
+
+    assert detect(processor, ["Fecha", "M3"]) == {"fecha": "Fecha", "extra": {"columnas": ["Fecha", "M3"]}}
+    assert processor.detections == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_a_changed_header_cell_is_detected_again(cache):
+    processor = Counting()
+    detect(processor, ["Fecha", "M3"])
+
+    assert detect(processor, ["Fecha", "M3 sólidos"]) == {"fecha": "Fecha",
+                                                          "extra": {"columnas": ["Fecha", "M3 sólidos"]}}
+    assert processor.detections == 2
+    # Las hojas omitidas no se guardan: vuelven a pasar por el procesador
+    assert detect(processor, ["Cliente"]) is None
+    assert detect(processor, ["Cliente"]) is None
+    assert processor.detections == 4
+    assert cache.stats()["layouts_cached"] == 2
+
+
+def test_scan_mode_fingerprints_the_rows_up_to_the_header(cache):
+    processor = Counting()
+    assert detect(processor, head()) == (2, {"fecha": 0})
+
+    # Otras filas de datos: mismo formato
+    assert detect(processor, head(below="otro dato")) == (2, {"fecha": 0})
+    assert processor.detections == 1
+    # Un cambio sobre el encabezado puede mover la fila que califica
+    assert detect(processor, head(title="REPORTE 2025")) == (2, {"fecha": 0})
+    assert processor.detections == 2
+    # Una hoja más corta que el encabezado conocido no lo usa
+    assert detect(processor, pd.DataFrame([["Fecha", "M3"]])) == (0, {"fecha": 0})
+    assert processor.detections == 3
+    assert cache.header_rows("user-1", processor) == [0, 2]
+
+
+def test_entries_are_per_tenant_and_per_processor_instance(cache):
+    processor, reloaded = Counting(), Counting()
+    detect(processor, ["Fecha", "M3"])
+    detect(processor, head())
+
+    detect(processor, ["Fecha", "M3"], user_id="user-2")
+    detect(processor, head(), user_id="user-2")
+    assert processor.detections == 4
+
+    detect(reloaded, ["Fecha", "M3"])
+    detect(reloaded, head())
+    assert reloaded.detections == 2
+    assert cache.header_rows("user-2", processor) == [2]
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LayoutCache(max_entries=2)
+    owner = object()
+    cache.put("user-1", owner, ("a",), 0, {"a": 0})
+    cache.put("user-1", owner, ("b",), 3, {"b": 0})
+    assert cache.get("user-1", owner, [("a",)]) == (0, {"a": 0})
+
+    cache.put("user-1", owner, ("c",), 5, {"c": 0})
+    assert cache.get("user-1", owner, [("b",)]) is None
+    assert cache.get("user-1", owner, [("a",)]) is not None
+    assert cache.header_rows("user-1", owner) == [0, 5]
+    stats = cache.stats()
+    assert (stats["layouts_cached"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 2, 1)
+
+
+def test_size_zero_disables_the_cache(monkeypatch):
+    monkeypatch.setattr(layouts, "LAYOUT_CACHE_SIZE", 0)
+    cache = LayoutCache()
+    monkeypatch.setattr(core, "layout_cache", cache)
+    processor = Counting()
+
+    for _ in range(2):
+        detect(processor, ["Fecha", "M3"])
+        detect(processor, head())
+    assert processor.detections == 4
+    assert not cache.enabled and cache.stats()["layouts_cached"] == 0
+    assert (cache.hits, cache.misses) == (0, 0)
+
+
+def test_a_known_workbook_gives_the_same_result(cache, tmp_path):
+    relative, build = CASES["ventas"]
+    path = str(tmp_path / "ventas.xlsx")
+    build(path)
+    processor = load(os.path.join(ROOT, relative), "layouts_ventas").PROCESSOR
+
+    results, logs = [], []
+    for _ in range(2):
+        log = io.StringIO()
+        with contextlib.redirect_stdout(log):
+            results.append(processor.run(path, "user-1"))
+        logs.append(log.getvalue())
+
+    assert results[0]["insert_statements"] and results[1] == results[0]
+    assert "formato conocido" not in logs[0] and "formato conocido" in logs[1]
+    assert cache.hits > 0
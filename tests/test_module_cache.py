@@ -0,0 +1,121 @@
+"""Caché de módulos: una carga por archivo, recarga por mtime, nombres únicos y cargas concurrentes"""
+
+import contextlib
+import io
+import os
+import sys
+import threading
+
+import pytest
+
+from module_cache import ModuleCache
+
+N = 8
+
+
+@pytest.fixture
+def cache():
+    cache = ModuleCache()
+    yield cache
+    for path in list(cache._entries):
+        sys.modules.pop(cache.module_name_for(path), None)
+
+
+def processor(path, value, delay=0):
+    """Script de procesador que anota en ``<path>.log`` cada vez que se ejecuta"""
+    path.write_text(
+        "import time\n"
+        f"time.sleep({delay})\n"
+        f"with open({str(path) + '.log'!r}, 'a') as log:\n"
+        "    log.write('x')\n"
+        f"VALUE = {value!r}\n",
+        encoding="utf-8")
+    return str(path)
+
+
+def executions(path):
+    with open(path + ".log") as log:
+        return len(log.read())
+
+
+def get(cache, path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return cache.get(path)
+
+
+def test_module_is_executed_once_and_reused(cache, tmp_path):
+    path = processor(tmp_path / "process_ventas.py", 1)
+
+    first = get(cache, path)
+    assert get(cache, path) is first
+    assert get(cache, os.path.join(str(tmp_path), ".", "process_ventas.py")) is first
+
+    assert executions(path) == 1 and first.VALUE == 1
+    stats = cache.stats()
+    assert (stats["modules_cached"], stats["hits"], stats["misses"], stats["reloads"]) == (1, 2, 1, 0)
+
+
+def test_changed_mtime_reloads_the_module(cache, tmp_path):
+    path = processor(tmp_path / "process_ventas.py", 1)
+    first = get(cache, path)
+
+    mtime_ns = os.stat(path).st_mtime_ns
+    processor(tmp_path / "process_ventas.py", 2)
+    os.utime(path, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    second = get(cache, path)
+
+    assert second is not first and (first.VALUE, second.VALUE) == (1, 2)
+    assert get(cache, path) is second
+    assert executions(path) == 2
+    assert sys.modules[cache.module_name_for(os.path.realpath(path))] is second
+    assert cache.stats()["reloads"] == 1
+
+
+def test_same_file_name_in_two_folders_gets_two_modules(cache, tmp_path):
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    first = get(cache, processor(tmp_path / "a" / "process_ventas.py", "a"))
+    second = get(cache, processor(tmp_path / "b" / "process_ventas.py", "b"))
+
+    assert (first.VALUE, second.VALUE) == ("a", "b")
+    assert first.__name__ != second.__name__
+    assert first.__name__.startswith("user_function_process_ventas_")
+    assert sys.modules[first.__name__] is first and sys.modules[second.__name__] is second
+    assert cache.module_name_for(os.path.realpath(tmp_path / "a" / "process_ventas.py")) == first.__name__
+
+
+def test_failed_load_is_not_cached(cache, tmp_path):
+    path = tmp_path / "process_roto.py"
+    path.write_text("raise ValueError('sintaxis del tenant')\n", encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        get(cache, str(path))
+    assert cache.module_name_for(os.path.realpath(path)) not in sys.modules
+    assert cache.stats()["modules_cached"] == 0
+
+    processor(path, 3)
+    assert get(cache, str(path)).VALUE == 3
+
+
+def test_concurrent_first_loads_execute_the_module_once(cache, tmp_path):
+    path = processor(tmp_path / "process_lento.py", 1, delay=0.2)
+    other = processor(tmp_path / "process_otro.py", 2, delay=0.2)
+    start = threading.Barrier(N + 1)
+    modules = []
+
+    def load(target):
+        start.wait()
+        modules.append((target, cache.get(target)))
+
+    threads = [threading.Thread(target=load, args=(path if i < N else other,)) for i in range(N + 1)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+    assert len(modules) == N + 1
+    assert len({id(module) for target, module in modules if target == path}) == 1
+    assert (executions(path), executions(other)) == (1, 1)
+    stats = cache.stats()
+    assert (stats["misses"], stats["hits"]) == (2, N - 1)
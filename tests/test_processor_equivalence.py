@@ -0,0 +1,47 @@
+"""
+Equivalencia de los procesadores del pipeline con su versión fila por fila
+
+``tests/legacy`` guarda, sin cambios, los procesadores anteriores al pipeline
+(los que recorrían la hoja con ``iterrows``). Cada caso de
+``tests/workbooks.py`` se procesa con ambos y el resultado nuevo debe traer
+los mismos valores en todas las claves del anterior: sentencias, conteos,
+errores y mensaje.
+"""
+
+import contextlib
+import importlib.util
+import io
+import os
+
+import pytest
+
+from tests.conftest import ROOT
+from tests.workbooks import CASES
+
+LEGACY = os.path.join(ROOT, "tests", "legacy")
+
+
+def load(path, name):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run(module, path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return module.process_excel_file(path, "user-1")
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_same_result_as_row_by_row_version(case, tmp_path):
+    relative, build = CASES[case]
+    path = str(tmp_path / f"{case}.xlsx")
+    build(path)
+
+    legacy = run(load(os.path.join(LEGACY, relative), f"legacy_{case}"), path)
+    current = run(load(os.path.join(ROOT, relative), f"current_{case}"), path)
+
+    assert legacy["insert_statements"], "el libro de prueba no genera registros"
+    for key, value in legacy.items():
+        assert current[key] == value, key
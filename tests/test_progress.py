@@ -0,0 +1,84 @@
+"""Canal de progreso: ids desconocidos, ejecuciones sin suscriptores, ids reutilizados y cupo de suscripciones"""
+
+import contextlib
+import io
+import json
+import os
+
+import pytest
+
+from pipeline import progress
+from pipeline.progress import (FINAL_EVENT, SubscriberLimit, TooManySubscribers, UnknownJob, open_channel,
+                               progress_callback, subscribe)
+from tests.test_processor_equivalence import ROOT, load
+from tests.workbooks import CASES
+
+
+@pytest.fixture(autouse=True)
+def channel_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(progress, "PROGRESS_DIR", str(tmp_path))
+    monkeypatch.setattr(progress, "progress_subscribers", SubscriberLimit(2))
+    return tmp_path
+
+
+def _events(subscription):
+    return [message.split("\n", 1)[0].split(": ", 1)[1] for message in subscription
+            if message.startswith("event: ")]
+
+
+def test_unknown_job_is_rejected_without_creating_a_channel(channel_dir):
+    with pytest.raises(UnknownJob):
+        subscribe("nadie", wait=0)
+    assert list(channel_dir.iterdir()) == []
+    assert progress.progress_subscribers.stats()["open"] == 0
+
+
+def test_run_without_subscribers_writes_nothing(channel_dir, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("libros") / "ventas.xlsx")
+    CASES["ventas"][1](path)
+    processor = load(os.path.join(ROOT, CASES["ventas"][0]), "progress_ventas").PROCESSOR
+
+    open_channel("job9")
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert processor.run(path, "user-1", progress=progress_callback("job9"))["success"]
+
+    assert (channel_dir / "job9.events").stat().st_size == 0
+    assert not (channel_dir / "job9.subscribed").exists()
+
+
+def test_events_are_written_once_someone_subscribed(channel_dir):
+    open_channel("job8")
+    publish = progress_callback("job8")
+    publish("job_started", total_sheets=1)
+
+    subscription = subscribe("job8", wait=0)
+    publish(FINAL_EVENT, success=True)
+    assert _events(subscription) == ["subscribed", FINAL_EVENT]
+
+
+def test_reused_job_id_only_replays_the_current_run():
+    open_channel("job1", publish=True)
+    progress_callback("job1")(FINAL_EVENT, success=False)
+
+    open_channel("job1")
+    publish = progress_callback("job1")
+    publish("job_started", total_sheets=1)
+    publish(FINAL_EVENT, success=True)
+
+    messages = list(subscribe("job1", wait=0))
+    assert _events(messages) == ["subscribed", "job_started", FINAL_EVENT]
+    assert json.loads(messages[-1].split("data: ", 1)[1])["success"] is True
+
+
+def test_subscribers_are_capped_and_released_on_close():
+    open_channel("job2")
+    first = subscribe("job2", wait=0)
+    second = subscribe("job2", wait=0)
+    with pytest.raises(TooManySubscribers):
+        subscribe("job2", wait=0)
+
+    # Un cliente que se desconecta antes del primer mensaje también libera su lugar
+    first.close()
+    second.close()
+    assert progress.progress_subscribers.stats()["open"] == 0
+    subscribe("job2", wait=0).close()
@@ -0,0 +1,102 @@
+"""Lectura sin las API internas de pandas y por partes con tipos de columna mezclados"""
+
+import contextlib
+import io
+import os
+from datetime import datetime
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from pipeline import readers
+from pipeline.core import Processor
+from pipeline.readers import ChunkedWorkbook, read_sheet_data
+from tests.test_processor_equivalence import ROOT, load
+from tests.workbooks import CASES, new_workbook, scan_sheet
+
+
+def run(case, path, output=None):
+    module = load(os.path.join(ROOT, CASES[case][0]), f"readers_{case}")
+    with contextlib.redirect_stdout(output or io.StringIO()):
+        return module.process_excel_file(path, "user-1")
+
+
+def mixed_ventas(path):
+    """Ventas con columnas que cambian de tipo a mitad de hoja"""
+    workbook = new_workbook()
+    scan_sheet(workbook.create_sheet("Ventas"), ["Fecha", "Cliente", "Descripción", "Cantidad", "Material", "Guía", "Valor"],
+               [[datetime(2025, 3, 1 + i % 20) if i < 10 else "2025-01-09", "Cliente A", "Pallet 1x1",
+                 i + 1 if i < 10 else ("7.25" if i % 2 else "abc"), "FSC", 1000 + i if i < 12 else f"F-{i}",
+                 1200 if i < 10 else None] for i in range(30)])
+    workbook.save(path)
+
+
+@pytest.mark.parametrize("reader", ["pandas", "chunks"])
+@pytest.mark.parametrize("case", ["ingresos", "ventas"])
+def test_same_result_without_text_parser(case, reader, tmp_path, monkeypatch):
+    path = str(tmp_path / f"{case}.xlsx")
+    CASES[case][1](path)
+    monkeypatch.setattr(readers, "EXCEL_READER", reader)
+    expected = run(case, path)
+
+    monkeypatch.setattr(readers, "TextParser", None)
+    assert run(case, path)["insert_statements"] == expected["insert_statements"]
+
+
+def test_read_sheet_data_without_reader_internals():
+    # pd.ExcelFile sin ``_reader`` (o con un reader sin ``get_sheet_data``)
+    assert read_sheet_data(SimpleNamespace(engine='openpyxl'), "Hoja1") is None
+    assert read_sheet_data(SimpleNamespace(engine='openpyxl', _reader=object()), "Hoja1") is None
+
+
+def test_mixed_type_columns_are_read_by_parts_without_a_full_read(tmp_path, monkeypatch):
+    path = str(tmp_path / "mixed.xlsx")
+    mixed_ventas(path)
+    monkeypatch.setattr(readers, "EXCEL_READER", "pandas")
+    expected = run("ventas", path)
+
+    def full_read(*args, **kwargs):
+        raise AssertionError("la hoja se leyó completa")
+
+    monkeypatch.setattr(readers, "EXCEL_READER", "chunks")
+    monkeypatch.setattr(readers, "READ_CHUNK_ROWS", 4)
+    monkeypatch.setattr(Processor, "read_sheet", full_read)
+    output = io.StringIO()
+    result = run("ventas", path, output)
+
+    assert "tipos de la hoja completa" in output.getvalue()
+    assert expected["insert_statements"]
+    for key in ("insert_statements", "records_processed", "errors"):
+        assert result[key] == expected[key], key
+
+
+def test_normalized_chunks_match_the_full_sheet(tmp_path):
+    path = str(tmp_path / "mixed.xlsx")
+    mixed_ventas(path)
+    full = pd.read_excel(path, header=0, skiprows=3)
+
+    chunks = ChunkedWorkbook(path, chunk_rows=4).iter_chunks("Ventas", header=0, skiprows=3)
+    list(chunks)
+    assert {"Fecha", "Cantidad", "Guía", "Valor"} <= chunks.mismatched
+
+    again = chunks.normalized()
+    joined = pd.concat(list(again))
+    assert again.consistent
+    pd.testing.assert_frame_equal(joined, full, check_index_type=False)
+    for name in full.columns:
+        assert [type(value) for value in joined[name]] == [type(value) for value in full[name]], name
+
+
+def test_boolean_columns_have_no_equivalent_type_by_parts(tmp_path):
+    path = str(tmp_path / "bools.xlsx")
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Hoja1")
+    sheet.append(["A"])
+    for i in range(12):
+        sheet.append([True if i < 4 else (None if i < 8 else "x")])
+    workbook.save(path)
+
+    chunks = ChunkedWorkbook(path, chunk_rows=4).iter_chunks("Hoja1", header=0)
+    list(chunks)
+    assert chunks.mismatched == {"A"} and chunks.normalized() is None
@@ -0,0 +1,136 @@
+"""Caché de resultados: claves, qué no se guarda, LRU por bytes, nivel en disco y janitor"""
+
+import os
+import shutil
+from types import SimpleNamespace
+
+import pytest
+
+from function_registry import FunctionEntry
+from pipeline import result_cache as result_cache_module
+from pipeline.result_cache import ResultCache, sweep_result_cache
+from worker_pool import encode_result
+
+DIGEST = "ab" * 32
+
+
+def body(n=0, size=0):
+    return encode_result({"success": True, "n": n, "pad": "x" * size})
+
+
+@pytest.fixture
+def ventas():
+    return FunctionEntry("1", {"name": "ventas", "file": "functions/process_ventas.py"})
+
+
+def test_key_changes_with_user_format_batch_size_and_function_mtime(ventas, tmp_path):
+    cache = ResultCache()
+    key = cache.key_for(ventas, DIGEST, "user-1", "sql")
+
+    assert key == cache.key_for(ventas, DIGEST, "user-1", "sql")
+    others = [
+        cache.key_for(ventas, "cd" * 32, "user-1", "sql"),
+        cache.key_for(ventas, DIGEST, "user-2", "sql"),
+        cache.key_for(ventas, DIGEST, "user-1", "sql_batch"),
+        cache.key_for(ventas, DIGEST, "user-1", "sql_batch", 500),
+    ]
+    assert len({key, *others}) == 5
+    assert cache.key_for(ventas, DIGEST, "user-1", "sql_batch", 500) != \
+        cache.key_for(ventas, DIGEST, "user-1", "sql_batch", 1000)
+
+    # Misma función en otra ruta: la clave cambia cuando cambia el archivo
+    path = str(tmp_path / "process_ventas.py")
+    shutil.copy(ventas.path, path)
+    entry = SimpleNamespace(module=ventas.module, path=path)
+    before = cache.key_for(entry, DIGEST, "user-1", "sql")
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    assert cache.key_for(entry, DIGEST, "user-1", "sql") != before
+
+
+def test_artifacts_legacy_functions_and_failures_are_not_cached(ventas, tmp_path):
+    cache = ResultCache(directory=str(tmp_path))
+    inventario = FunctionEntry("2", {"name": "inventario", "file": "functions/process_inventario.py"})
+
+    assert cache.key_for(ventas, DIGEST, "user-1", "arrow") is None
+    assert cache.key_for(ventas, DIGEST, "user-1", "parquet") is None
+    assert cache.key_for(ventas, None, "user-1", "sql") is None
+    assert cache.key_for(inventario, DIGEST, "user-1", "sql") is None
+
+    cache.put("k", encode_result({"success": False, "error": "x"}))
+    assert cache.get("k") is None
+    assert list(tmp_path.iterdir()) == []
+    assert cache.stats()["stores"] == 0
+
+
+def test_memory_tier_evicts_by_bytes_in_lru_order():
+    size = len(body(0, 100))
+    cache = ResultCache(max_bytes=3 * size, directory="")
+    for n in range(3):
+        cache.put(f"k{n}", body(n, 100))
+    assert cache.get("k0") == body(0, 100)  # k1 pasa a ser el de uso más antiguo
+
+    cache.put("k3", body(3, 100))
+    assert cache.get("k1") is None
+    assert [cache.get(f"k{n}") is not None for n in (0, 2, 3)] == [True, True, True]
+
+    # Un resultado más grande que la caché no desplaza a los demás
+    cache.put("big", body(9, 4 * size))
+    assert cache.get("big") is None
+    stats = cache.stats()
+    assert (stats["results_cached"], stats["bytes"], stats["evictions"]) == (3, 3 * size, 1)
+
+
+def test_disk_tier_is_written_atomically_and_shared(tmp_path, monkeypatch):
+    first = ResultCache(max_bytes=0, directory=str(tmp_path))
+    second = ResultCache(directory=str(tmp_path))
+
+    seen = []
+    replace = os.replace
+
+    def checked_replace(src, dst):
+        # El resultado completo se escribe aparte y se renombra de una vez
+        assert os.path.basename(src).endswith(".tmp") and not os.path.exists(dst)
+        with open(src, 'rb') as tmp:
+            seen.append(tmp.read())
+        replace(src, dst)
+
+    monkeypatch.setattr(result_cache_module.os, "replace", checked_replace)
+    first.put("k", body(1, 50))
+    assert seen == [body(1, 50)]
+    assert sorted(os.listdir(tmp_path)) == ["k.json"]
+
+    assert second.get("k") == body(1, 50)
+    assert second.get("k") == body(1, 50)
+    stats = second.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 0)
+
+    def failing_replace(src, dst):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(result_cache_module.os, "replace", failing_replace)
+    first.put("otro", body(2))
+    assert second.get("otro") is None
+    assert not (tmp_path / "otro.json").exists()
+
+
+def test_janitor_removes_old_results_temporaries_and_locks(tmp_path):
+    now = 100000
+    for name, age in [("old.json", 500), ("new.json", 10), (".x.tmp", 500), (".y.tmp", 10),
+                      ("old.lock", 500), ("new.lock", 10), ("otro.txt", 500)]:
+        path = tmp_path / name
+        path.write_bytes(b"{}")
+        os.utime(path, (now - age, now - age))
+
+    assert sweep_result_cache(max_age=100, max_bytes=10**6, now=now, directory=str(tmp_path)) == 3
+    assert sorted(os.listdir(tmp_path)) == [".y.tmp", "new.json", "new.lock", "otro.txt"]
+
+
+def test_janitor_trims_the_least_recently_used_results_over_max_bytes(tmp_path):
+    now = 100000
+    for n, age in enumerate([30, 10, 20]):
+        path = tmp_path / f"r{n}.json"
+        path.write_bytes(b"x" * 100)
+        os.utime(path, (now - age, now - age))
+
+    assert sweep_result_cache(max_age=1000, max_bytes=250, now=now, directory=str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == ["r1.json", "r2.json"]
@@ -0,0 +1,138 @@
+"""Single-flight: cargas idénticas concurrentes, errores del líder y lock entre procesos"""
+
+import fcntl
+import os
+import threading
+
+import pytest
+
+from pipeline import singleflight
+from pipeline.singleflight import SingleFlight
+
+N = 8
+
+# ``fcntl.flock`` sin el aviso de ``blocking_flock`` (el del otro worker)
+FLOCK = fcntl.flock
+
+
+class CountingCalls(dict):
+    """``_calls`` que avisa cuando ``n`` cargas ya buscaron su clave"""
+
+    def __init__(self, n):
+        super().__init__()
+        self.lookups = 0
+        self.all_arrived = threading.Event()
+        self.n = n
+
+    def get(self, key, default=None):
+        self.lookups += 1
+        if self.lookups >= self.n:
+            self.all_arrived.set()
+        return super().get(key, default)
+
+
+def run_concurrently(flight, key, compute, n=N):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, compute))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results, errors
+
+
+def test_identical_calls_compute_once_and_share_the_body():
+    flight = SingleFlight()
+    flight._calls = calls = CountingCalls(N)
+    computed = []
+
+    def compute():
+        # El líder termina solo cuando todas las cargas ya llegaron
+        assert calls.all_arrived.wait(10)
+        computed.append(1)
+        return b'{"success":true}'
+
+    results, errors = run_concurrently(flight, "k", compute)
+
+    assert errors == [] and computed == [1]
+    assert {body for body, _ in results} == {b'{"success":true}'}
+    assert sorted(shared for _, shared in results) == [False] + [True] * (N - 1)
+    stats = flight.stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, N - 1, 0)
+
+
+def test_leader_error_reaches_every_waiter_and_a_retry_recomputes():
+    flight = SingleFlight()
+    flight._calls = calls = CountingCalls(N)
+
+    def compute():
+        assert calls.all_arrived.wait(10)
+        raise ValueError("libro dañado")
+
+    results, errors = run_concurrently(flight, "k", compute)
+
+    assert results == [] and len(errors) == N
+    assert all(isinstance(e, ValueError) and str(e) == "libro dañado" for e in errors)
+    assert "k" not in flight._calls
+
+    assert flight.do("k", lambda: b"ok") == (b"ok", False)
+    stats = flight.stats()
+    assert (stats["leaders"], stats["coalesced"]) == (2, N - 1)
+
+
+@pytest.fixture
+def blocking_flock(monkeypatch):
+    """Avisa cuando el líder espera el lock que tiene otro proceso"""
+    waiting = threading.Event()
+
+    def watched(file, operation):
+        if operation == fcntl.LOCK_EX:
+            waiting.set()
+        return FLOCK(file, operation)
+
+    monkeypatch.setattr(singleflight.fcntl, "flock", watched)
+    return waiting
+
+
+@pytest.mark.parametrize("left_on_disk", [b"guardado", None])
+def test_lock_dir_waits_for_the_other_worker_and_uses_recheck(tmp_path, blocking_flock, left_on_disk):
+    flight = SingleFlight(str(tmp_path))
+    computed = []
+    outcome = []
+
+    def compute():
+        computed.append(1)
+        return b"calculado"
+
+    # Otro worker tiene el lock de la misma clave (flock es por archivo abierto)
+    other = open(os.path.join(tmp_path, "k.lock"), 'a')
+    FLOCK(other, fcntl.LOCK_EX)
+    thread = threading.Thread(target=lambda: outcome.append(flight.do("k", compute, lambda: left_on_disk)))
+    thread.start()
+    assert blocking_flock.wait(10)
+    FLOCK(other, fcntl.LOCK_UN)
+    other.close()
+    thread.join(10)
+
+    if left_on_disk is None:
+        assert outcome == [(b"calculado", False)] and computed == [1]
+        assert flight.stats()["coalesced_workers"] == 0
+    else:
+        assert outcome == [(b"guardado", True)] and computed == []
+        assert flight.stats()["coalesced_workers"] == 1
+
+
+def test_lock_dir_without_contention_does_not_recheck(tmp_path):
+    flight = SingleFlight(str(tmp_path))
+    rechecks = []
+
+    assert flight.do("k", lambda: b"calculado", lambda: rechecks.append(1)) == (b"calculado", False)
+    assert rechecks == []
+    assert os.path.exists(tmp_path / "k.lock")
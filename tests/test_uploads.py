@@ -0,0 +1,103 @@
+"""Archivos subidos: buffer en memoria o en disco, huella SHA-256 y janitor de temporales"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+from pipeline import uploads
+from pipeline.uploads import HashingSpool, open_upload, sweep_temp_files, upload_digest
+
+
+class Stream(io.RawIOBase):
+    """Stream de una carga que no admite ``seek`` (como el de un proxy)"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self.data.readinto(buffer)
+
+
+@pytest.fixture
+def temp_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_TEMP_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_paths_and_seekable_streams_are_used_as_they_are(tmp_path):
+    with open_upload("libro.xlsx") as source:
+        assert source == "libro.xlsx"
+
+    buffer = io.BytesIO(b"libro")
+    buffer.read()
+    with open_upload(buffer) as source:
+        assert source is buffer and source.tell() == 0
+
+
+@pytest.mark.parametrize("size, on_disk", [(100, False), (5000, True)])
+def test_unseekable_streams_spill_to_disk_over_the_limit(size, on_disk, temp_dir, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_SPOOL_MAX_BYTES", 1000)
+    data = os.urandom(size)
+
+    with open_upload(Stream(data)) as source:
+        assert source._rolled is on_disk
+        assert source.read() == data
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_hashing_spool_digest_and_spill_threshold():
+    data = os.urandom(700 * 1024)
+    spool = HashingSpool()
+    spool.write(data[:1000])
+    assert not spool._rolled
+    spool.writelines([data[1000:400 * 1024], data[400 * 1024:]])
+    assert spool._rolled
+
+    assert spool.hexdigest() == hashlib.sha256(data).hexdigest()
+    assert upload_digest(spool) == hashlib.sha256(data).hexdigest()
+    spool.seek(0)
+    assert spool.read() == data
+
+
+def test_digest_of_a_buffer_keeps_its_position():
+    buffer = io.BytesIO(b"contenido del libro")
+    buffer.seek(4)
+    assert upload_digest(buffer) == hashlib.sha256(b"contenido del libro").hexdigest()
+    assert buffer.tell() == 4
+    assert upload_digest(Stream(b"x")) is None
+
+
+def test_sweep_removes_only_old_upload_temporaries(temp_dir):
+    now = 2_000_000_000
+    names = {
+        # Temporales de esta versión y de las anteriores, antiguos: se eliminan
+        "balance_upload_ab12_x9z.xlsx": 7200,
+        "upload_gen_sales_user-1_1754000000.xlsx": 7200,
+        "cons_upload_5f1c_1754000000.xlsx": 7200,
+        "prod_upload_5f1c_1754000000.xlsx": 7200,
+        "upload_5f1c_1754000000.xlsx": 7200,
+        # Recientes: pueden estar en uso
+        "balance_upload_cd34_y8w.xlsx": 60,
+        "upload_5f1c_1754000001.xlsx": 60,
+        # Otros archivos del directorio temporal, aunque se parezcan
+        "upload_informe.xlsx": 7200,
+        "upload_5f1c_1754000000.csv": 7200,
+        "balance_upload_otro_nombre.xlsx": 7200,
+        "tmpab12cd34.xlsx": 7200,
+    }
+    for name, age in names.items():
+        path = temp_dir / name
+        path.write_bytes(b"x")
+        os.utime(path, (now - age, now - age))
+    (temp_dir / "upload_dir_1754000000.xlsx").mkdir()
+
+    assert sweep_temp_files(max_age=3600, now=now) == 5
+    assert sorted(os.listdir(temp_dir)) == sorted(
+        ["balance_upload_cd34_y8w.xlsx", "upload_5f1c_1754000001.xlsx", "upload_informe.xlsx",
+         "upload_5f1c_1754000000.csv", "balance_upload_otro_nombre.xlsx", "tmpab12cd34.xlsx",
+         "upload_dir_1754000000.xlsx"])
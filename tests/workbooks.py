@@ -0,0 +1,194 @@
+"""
+Libros de prueba para comparar los procesadores con su versión fila por fila
+
+Cada constructor escribe un libro chico y determinista con los casos que
+cada procesador trata distinto: celdas vacías, textos con espacios, números
+guardados como texto, fechas inválidas, volúmenes <= 0 y hojas sin las
+columnas requeridas. ``CASES`` asocia cada caso con el procesador que lo lee;
+lo usan ``tests/test_processor_equivalence.py`` y ``bench_processors.py``.
+"""
+
+from datetime import datetime, timedelta
+
+from openpyxl import Workbook
+
+BASE = datetime(2025, 3, 1)
+
+T496 = "functions/496f6470-2f4d-40c6-9426-bb5421116a3d/"
+TAE6 = "functions/ae6a5783-4da9-49d2-b415-af7384362b7c/"
+
+
+def date(i):
+    return BASE + timedelta(days=i % 200, hours=(i * 7) % 24 if i % 5 == 0 else 0)
+
+
+def pick(i, options):
+    return options[i % len(options)]
+
+
+def volume(i):
+    return pick(i, [12.5, 3, 0, -2, None, "abc", "7.25", 1000.0, 0.1, 2.54, 1234.5678])
+
+
+def new_workbook():
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    return workbook
+
+
+def scan_sheet(worksheet, header, rows):
+    """Hoja con título y encabezado en la cuarta fila (procesadores en modo 'scan')"""
+    worksheet.append(["REPORTE MENSUAL"])
+    worksheet.append([])
+    worksheet.append(["Empresa X", None, None, "2025"])
+    worksheet.append(header)
+    for row in rows:
+        worksheet.append(row)
+
+
+def consumo_ae6(path, rows=40):
+    workbook = new_workbook()
+    scan_sheet(workbook.create_sheet("Enero"), ["Día", "Stock inicial", "Consumo Madera (m3)", "Observación"],
+               [[pick(i, [date(i), None, "2025-01-09", "nope"]), 10, volume(i), pick(i, ["o1", None])]
+                for i in range(rows)])
+    workbook.create_sheet("Vacía").append(["nada"])
+    workbook.save(path)
+
+
+def produccion_ae6(path, rows=40):
+    workbook = new_workbook()
+    scan_sheet(workbook.create_sheet("Prod"), ["Fecha", "Producto", "Volumen", "Detalle"],
+               [[pick(i, [date(i), None, "2025-01-09", "nope"]), pick(i, ["Pallet estándar", "W5.2 madera", None, "  "]),
+                 volume(i), pick(i, ["d1", None])] for i in range(rows)])
+    workbook.save(path)
+
+
+def ventas_ae6(path, rows=40):
+    workbook = new_workbook()
+    scan_sheet(workbook.create_sheet("Ventas"),
+               ["Fecha", "Cliente", "Producto", "M3 total", "Certificación", "N° Factura", "Precio Unitario"],
+               [[pick(i, [date(i), None, "2025-01-09", "nope"]), pick(i, ["Cliente A", None, "Cli B"]),
+                 pick(i, ["Pallet 1x1", "W3.1 Astilla", None, ""]), volume(i), pick(i, ["FSC", None]),
+                 pick(i, [1001, None, "F-9"]), pick(i, [1200.5, None, "n/a", 300])] for i in range(rows)])
+    notes = workbook.create_sheet("Notas")
+    for i in range(8):
+        notes.append(["nota", i])
+    workbook.save(path)
+
+
+def ventas(path, rows=40):
+    workbook = new_workbook()
+    scan_sheet(workbook.create_sheet("Ventas"), ["Fecha", "Cliente", "Descripción", "Cantidad", "Material", "Guía", "Valor"],
+               [[pick(i, [date(i), None, "2025-01-09", "nope"]), pick(i, ["Cliente A", None, "Cli B"]),
+                 pick(i, ["Pallet 1x1", "W3.1 Astilla", None, "aserrín fino", "w5.2", "w7.1 otro", "Madera", "x"]),
+                 volume(i), pick(i, ["FSC", None]), pick(i, [1001, None, "F-9"]), pick(i, [1200.5, None, "n/a", 300])]
+                for i in range(rows)])
+    workbook.save(path)
+
+
+def ingresos(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("ENERO")
+    sheet.append(["NOMBRE PROVEEDOR ", "ROL", "Descripción de material código FSC", "M3 o m3st", "FECHA"])
+    for i in range(rows):
+        sheet.append([pick(i, ["Prov A", "Prov B", None, "", "None", "Forestal Sur"]), pick(i, [101, "R-12", None, 7.0]),
+                      pick(i, ["FSC 100%", None, "Controlado"]), volume(i),
+                      pick(i, [date(i), None, "2025-02-03", "xx/yy", date(i + 3)])])
+    sheet = workbook.create_sheet("FEBRERO")
+    sheet.append(["NOMBRE PROVEEDOR", "M3"])
+    for i in range(rows):
+        sheet.append([pick(i, ["Prov C", None, "Otro"]), volume(i + 1)])
+    workbook.create_sheet("Resumen").append(["Total", "Valor"])
+    workbook.save(path)
+
+
+def recepciones_496(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Datos")
+    sheet.append(["NUM_GUIA", "RUT_PROVEEDOR", "NOMBRE_PROVEEDOR", "FECHA_RECEPCION", "VOLUMEN_M3", "ROL",
+                  "ORIGEN/PREDIO", "COMUNA"])
+    for i in range(rows):
+        sheet.append([pick(i, [1234.0, 55, None, "abc", "778", 99.9, "inf"]), "76.123.456-7",
+                      pick(i, ["Forestal A", None, "Aserradero B", "None"]), pick(i, [date(i), date(i + 1), "2025-01-05"]),
+                      pick(i, [12500, 300.5, 0, None, "x", 45000, -3]), pick(i, ["12-3", None, "O'Higgins 4", 88]),
+                      pick(i, [None, "Predio El Roble", "Fundo X"]), pick(i, ["Chillán", None, "Yungay", "Los Ángeles"])])
+    other = workbook.create_sheet("Otra")
+    other.append(["A", "B"])
+    other.append([1, 2])
+    workbook.save(path)
+
+
+def recepciones_ae6(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Recepciones")
+    sheet.append(["Fecha", "Proveedor", "Guía", "M3", "Categoría Proveedor", "ROL", "Comuna", "Tipo de material"])
+    for i in range(rows):
+        sheet.append([pick(i, [date(i), None, "2025-01-07", date(i + 2)]), pick(i, ["Prov A", None, "  ", "Prov B"]),
+                      pick(i, [123, "G-1", None, 45.0]), volume(i), pick(i, ["FSC Mix", None]), pick(i, ["R1", None, 33]),
+                      pick(i, ["Yumbel", None]), pick(i, ["W1.1 Trozo de pinus radiata", None, "   ", "W3.2"])])
+    workbook.create_sheet("Faltan").append(["Fecha", "Proveedor"])
+    workbook.save(path)
+
+
+def consumos_ae6(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Consumos")
+    sheet.append(["Fecha Consumo", "Producto Consumido", "Volumen M3", "descripcion "])
+    for i in range(rows):
+        sheet.append([pick(i, [date(i), None, "2025-01-07", date(i + 2)]),
+                      pick(i, ["W1.1 Trozos de pino", None, "  ", "W3.2"]), volume(i), pick(i, ["Obs 1", None])])
+    workbook.save(path)
+
+
+def ventas_masisa(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Hoja1")
+    sheet.append(["Fecha contabiliz.", "Cliente", "Núm. Factura", "Descripción Material", "Código Producto", "Recepción"])
+    for i in range(rows):
+        sheet.append([pick(i, [20250728, 20250101.0, None, "2025-02-03", 2025011, 20251301, date(i)]), "X",
+                      pick(i, [123.0, "F-77", None, 456, "inf"]),
+                      pick(i, ["ASTILLA VERDE (TS)", "MATERIAL VERDE VALOR. COMB. COGENERACION", None,
+                               "otro astilla verde (ts) x"]),
+                      pick(i, [None, None, None, "W2.1", "W9.9"]), volume(i)])
+    workbook.save(path)
+
+
+def astilla_masisa(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Hoja1")
+    sheet.append(["Fecha contabiliz.", "Guía Flete", "Descripción Material", "Recepción", "Otra"])
+    for i in range(rows):
+        sheet.append([pick(i, [20250728, 20250101.0, None, "abc", 2025011, 20251301, 20240229]),
+                      pick(i, [123.0, "G-77", None, 456, 1e3, "-inf"]),
+                      pick(i, ["ASTILLA VERDE (TS)", "MATERIAL VERDE VALOR. COMB. COGENERACION", None, "Otro",
+                               "x material verde valor. comb. cogeneracion"]),
+                      volume(i), "z"])
+    workbook.create_sheet("Sin columnas").append(["Fecha", "Otro"])
+    workbook.save(path)
+
+
+def ventas_arauco(path, rows=40):
+    workbook = new_workbook()
+    sheet = workbook.create_sheet("Proforma")
+    sheet.append(["FCH_RECEPCION", "NUM_GUIA_SERIE_C", "VOLUMEN_M3_RECEPCION", "COD_ADICIONAL", "OTRO"])
+    for i in range(rows):
+        sheet.append([pick(i, [date(i), None, "2025-02-30", "2025-04-01", date(i + 9)]),
+                      pick(i, [5566.0, "A-12", None, 778, " 12.0 ", "inf"]), volume(i),
+                      pick(i, ["ASCM", "asti", None, "XXX", " ASTI "]), 1])
+    workbook.save(path)
+
+
+# Caso -> (procesador, relativo a la raíz del repositorio; constructor del libro)
+CASES = {
+    "consumo_ae6": (TAE6 + "process_consumo.py", consumo_ae6),
+    "produccion_ae6": (TAE6 + "process_produccion.py", produccion_ae6),
+    "ventas_ae6": (TAE6 + "process_ventas.py", ventas_ae6),
+    "ventas": ("functions/process_ventas.py", ventas),
+    "ingresos": ("functions/process_ingresos.py", ingresos),
+    "recepciones_496": (T496 + "process_recepciones.py", recepciones_496),
+    "recepciones_ae6": (TAE6 + "process_recepciones.py", recepciones_ae6),
+    "consumos_ae6": (TAE6 + "process_consumos.py", consumos_ae6),
+    "ventas_masisa": (T496 + "process_ventas_masisa.py", ventas_masisa),
+    "astilla_masisa": (T496 + "process_venta_astilla_masisa.py", astilla_masisa),
+    "ventas_arauco": (T496 + "process_ventas_arauco.py", ventas_arauco),
+}
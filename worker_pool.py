@@ -0,0 +1,267 @@
+"""
+Pool de procesos para ejecutar los procesadores
+
+Leer planillas con pandas/openpyxl es trabajo de CPU en Python: con los
+threads de gunicorn (gthread) las cargas simultáneas de un worker compiten
+por el GIL. Con ``PROCESS_POOL_WORKERS`` > 0 cada worker de gunicorn levanta
+ese número de procesos hijos (``spawn``) que ya importaron pandas, openpyxl y
+los procesadores del registro; los threads HTTP solo reciben el archivo y
+devuelven la respuesta.
+
+El archivo subido llega al hijo como ruta en disco (``pipeline.uploads.upload_file``),
+no como bytes: su contenido nunca se copia entero a memoria para enviarlo.
+
+El hijo entrega el resultado ya serializado como JSON (bytes), igual al que
+produciría ``jsonify``: viaja como un solo objeto en vez de miles de strings
+pickleados y el worker lo envía tal cual, sin volver a serializarlo.
+"""
+
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from module_cache import module_cache
+
+# Procesos hijos por worker de gunicorn (0 = procesar en el thread del request).
+# Desactivado por defecto: cada hijo carga pandas (~100 MB residentes) y se
+# multiplica por la cantidad de workers de gunicorn
+PROCESS_POOL_WORKERS = int(os.getenv('PROCESS_POOL_WORKERS', '0'))
+
+
+def call_function(module, function_id, source, user_id, output_format='sql', batch_size=None,
+                  progress=None):
+    """
+    Ejecuta el procesador de un módulo de ``functions/``
+
+    Args:
+        module: Módulo del procesador (``FunctionEntry.module``)
+        function_id: ID de la función (para los mensajes de error)
+        source: Archivo subido o buffer binario
+        user_id: ID del usuario autenticado
+        output_format: Formato de salida (solo los procesadores del pipeline
+            admiten otro distinto de 'sql')
+        batch_size: Registros por sentencia en 'sql_batch'
+        progress: Callback de progreso (``pipeline.progress``) o None
+
+    Returns:
+        dict: Resultado del procesamiento
+    """
+    # Se importa aquí: los hijos del pool cargan este módulo antes que el pipeline
+    from pipeline import Processor
+    from pipeline.progress import FINAL_EVENT
+
+    try:
+        # Funciones del pipeline compartido: admiten otros formatos y progreso
+        processor = getattr(module, 'PROCESSOR', None)
+        if isinstance(processor, Processor):
+            if output_format not in processor.output_formats:
+                return {
+                    "success": False,
+                    "error": f"La función {function_id} no soporta el formato '{output_format}'"
+                }
+            return processor.process_file(source, user_id, output_format, batch_size, progress)
+
+        if output_format != 'sql':
+            return {
+                "success": False,
+                "error": f"La función {function_id} no soporta el formato '{output_format}'"
+            }
+
+        # Ejecutar la función principal del módulo CON EL USER_ID
+        if hasattr(module, 'process_file'):
+            result = module.process_file(source, user_id)
+            if progress is not None:
+                progress(FINAL_EVENT, success=result.get("success", False),
+                         records_processed=result.get("records_processed", 0))
+            return result
+        else:
+            return {
+                "success": False,
+                "error": "La función no tiene un método 'process_file' implementado"
+            }
+
+    except Exception as e:
+        return {
+            "success": False,
+            "error": f"Error ejecutando la función: {str(e)}"
+        }
+
+
+def encode_result(result):
+    """
+    Serializa un resultado como lo hace ``jsonify`` fuera de modo debug
+    (claves ordenadas, ASCII, sin espacios)
+
+    Returns:
+        bytes: JSON del resultado
+    """
+    return json.dumps(result, ensure_ascii=True, sort_keys=True, separators=(",", ":"),
+                      default=_json_default).encode('utf-8')
+
+
+def _json_default(value):
+    # Escalares de numpy que un procesador haya dejado en el resultado
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def _init_worker(paths):
+    """Inicializa un hijo: importa las dependencias pesadas y los procesadores"""
+    import openpyxl  # noqa: F401
+    import pandas  # noqa: F401
+
+    import pipeline  # noqa: F401
+
+    for path in paths:
+        try:
+            module_cache.get(path)
+        except Exception as e:
+            # Se reintentará en la primera ejecución que lo use
+            print(f"⚠️ No se pudo precargar {path} en el proceso {os.getpid()}: {e}")
+
+
+def _warm():
+    return os.getpid()
+
+
+def _execute(path, function_id, source_path, user_id, output_format, batch_size, job_id):
+    """
+    Tarea del hijo: ejecuta el procesador y devuelve el resultado en JSON,
+    junto con el pid y las métricas de la caché de formatos del hijo
+    """
+    from pipeline.layouts import layout_cache
+    from pipeline.progress import progress_callback
+
+    module = module_cache.get(path)
+    result = call_function(module, function_id, source_path, user_id, output_format, batch_size,
+                           progress_callback(job_id))
+    return encode_result(result), os.getpid(), layout_cache.stats()
+
+
+class ProcessPool:
+    """
+    Pool de procesos de un worker de gunicorn
+
+    Args:
+        workers: Cantidad de procesos hijos (por defecto PROCESS_POOL_WORKERS)
+    """
+
+    def __init__(self, workers=None):
+        self.workers = PROCESS_POOL_WORKERS if workers is None else workers
+        self._executor = None
+        self._paths = ()
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.in_flight = 0
+        self.restarts = 0
+        self.task_time_total = 0.0
+        self._layout_stats = {}  # pid del hijo -> métricas de su caché de formatos
+
+    @property
+    def enabled(self):
+        return self.workers > 0
+
+    def start(self, paths=()):
+        """
+        Levanta los procesos hijos y espera a que terminen de importar
+
+        Args:
+            paths: Rutas de los procesadores que cada hijo precarga
+        """
+        if not self.enabled:
+            return
+        self._paths = tuple(dict.fromkeys(paths))
+        start = time.perf_counter()
+        executor = self._get_executor()
+        # Una tarea por hijo: con spawn, cada submit sin hijos libres crea uno
+        pids = {future.result() for future in [executor.submit(_warm) for _ in range(self.workers)]}
+        print(f"🧵 Pool de procesos listo: {len(pids)} hijos en "
+              f"{time.perf_counter() - start:.1f}s")
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self._paths,),
+                )
+            return self._executor
+
+    def _restart(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.restarts += 1
+                self._layout_stats.clear()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def execute(self, entry, source, user_id, output_format='sql', batch_size=None, job_id=None):
+        """
+        Ejecuta una función del registro en un proceso hijo
+
+        Args:
+            entry: ``FunctionEntry`` resuelta por el registro
+            source: Archivo subido, buffer binario o ruta de archivo
+            user_id: ID del usuario autenticado
+            output_format: Formato de salida
+            batch_size: Registros por sentencia en 'sql_batch'
+            job_id: Id del trabajo para publicar el progreso, o None
+
+        Returns:
+            bytes: Resultado en JSON (ver ``encode_result``)
+        """
+        # Se importa aquí: los hijos del pool cargan este módulo antes que el pipeline
+        from pipeline.uploads import upload_file
+
+        executor = self._get_executor()
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            # El hijo recibe la ruta del archivo, no su contenido
+            with upload_file(source) as path:
+                body, pid, layout_stats = executor.submit(_execute, entry.path, entry.function_id, path, user_id,
+                                                          output_format, batch_size, job_id).result()
+            with self._lock:
+                self._layout_stats[pid] = layout_stats
+            return body
+        except BrokenProcessPool as e:
+            # Un hijo murió (por ejemplo, sin memoria): se levanta un pool nuevo
+            print(f"❌ Pool de procesos caído, se reinicia: {e}")
+            self._restart(executor)
+            return encode_result({
+                "success": False,
+                "error": "Error ejecutando la función: el proceso de trabajo terminó inesperadamente"
+            })
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.tasks += 1
+                self.task_time_total += time.perf_counter() - start
+
+    def stats(self):
+        """Métricas del pool para el endpoint /metrics"""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "tasks": self.tasks,
+                "in_flight": self.in_flight,
+                "restarts": self.restarts,
+                "task_time_total_ms": round(self.task_time_total * 1000, 3),
+            }
+
+    def layout_stats(self):
+        """Últimas métricas de la caché de formatos informadas por cada hijo"""
+        with self._lock:
+            return list(self._layout_stats.values())
+
+
+# Instancia compartida por todo el proceso
+process_pool = ProcessPool()